@@ -1,196 +1,57 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
-from ceneo import ekstrakcja_opinii_po_ean, _analiza_statystyczna, pobierz_opinie, wyswietl_wykresy
-import json
-import csv
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, abort, session, g
+from ceneo import ocena_liczbowa, ADRES_CENEO, FRAGMENTY
+from magazyn import domyslny_magazyn, Filtr
+from zadania import kolejka
+from wykresy import domyslna_usluga, dane_kompaktowe, FORMATY
+from metryki import rejestr, profiluj, ODSTEP_PROBEK
+import datetime
+import os
+import time
+import zlib
 
 app = Flask(__name__, template_folder=".")
 app.secret_key = b'_5#y2L"F4Q8z\n\xec]/'
 #app.config['STATIC_FOLDER'] = 'static'
-
-def ekstrakcja_opinii_po_ean(ean, zapisz_wykresy=False):
-    """
-    Ekstrahuje opinie na podstawie kodu EAN.
-
-    Args:
-        ean: Kod EAN produktu.
-
-    Returns:
-        Lista opinii na temat produktu.
-    """
-    url = f"https://www.ceneo.pl/{ean}"
-    opinie = pobierz_opinie(url)
-
-    # Iterowanie po stronach do momentu powtórzenia pierwszej strony
-    liczba_stron = 1
-    while opinie:
-        liczba_stron += 1
-        opinie.extend(pobierz_opinie(f"{url}/opinie-{liczba_stron}"))
-        if opinie == pobierz_opinie(url):
-            break
-    
-    if opinie:
-        zapisz_do_json(opinie, "opinie.json")
-        if request.form.get("zapisz_wykresy") == "True":
-            wyniki_analizy = _analiza_statystyczna(opinie)
-            if isinstance(wyniki_analizy, dict):
-                oceny = wyniki_analizy.get("średnia_ocena")
-                dystrybucja_ocen = wyniki_analizy.get("dystrybucja_ocen")
-                wyswietl_wykresy(oceny, dystrybucja_ocen)
-        return opinie
-    else:
-        return None
-
-def zapisz_do_json(opinie, nazwa_pliku):
-    """
-    Zapisuje opinie do pliku JSON.
-
-    Args:
-        opinie: Lista opinii w formacie BeautifulSoup.
-        nazwa_pliku: Nazwa pliku JSON.
-    """
-    with open(nazwa_pliku, "w", encoding="utf-8") as f:
-        json.dump([_konwertuj_do_json(opinia) for opinia in opinie], f, indent=4)
-
-def _konwertuj_do_json(opinia):
-    """
-    Konwertuje obiekt Tag do formatu JSON.
-
-    Args:
-        opinia: Obiekt BeautifulSoup Tag.
-
-    Returns:
-        Słownik JSON z danymi z opinii.
-    """
-    id_opinii_element = opinia.get("data-entry-id")
-    id_opinii = id_opinii_element if id_opinii_element else "Brak ID"
-
-    autor_element = opinia.find("span", class_="user-post__author-name")
-    autor = autor_element.text.strip() if autor_element else "Brak autora"
-
-    rekomendacja_element = opinia.find("span", class_="user-post__author-recomendation")
-    rekomendacja = rekomendacja_element.text.strip() if rekomendacja_element else "Brak rekomendacji"
-
-    gwiazdki_element = opinia.find("span", class_="user-post__score-count")
-    gwiazdki = gwiazdki_element.text.strip() if gwiazdki_element else "Brak gwiazdek"
-    
-    data_wystawienia_element = opinia.find_all("time", {"datetime": True})
-    data_wystawienia = data_wystawienia_element[0].text.strip() if data_wystawienia_element else "Brak danych"
-
-    czas_od_zakupu = "Brak danych"
-    if len(data_wystawienia_element) > 1:
-        czas_od_zakupu = data_wystawienia_element[1].text.strip()
-
-    potwierdzony_zakup = "Nie zakupiono"
-    if czas_od_zakupu != "Brak danych":
-        potwierdzony_zakup = "Potwierdzone zakupem"
-
-    pomocna_element = opinia.find("button", class_="vote-yes js_product-review-vote js_vote-yes")
-    pomocna = pomocna_element.text.strip() if pomocna_element else "Brak danych"
-
-    nie_pomocna_element = opinia.find("button", class_="vote-no js_product-review-vote js_vote-no")
-    nie_pomocna = nie_pomocna_element.text.strip() if nie_pomocna_element else "Brak danych"
-
-    tresc_element = opinia.find("div", class_="user-post__text")
-    tresc = tresc_element.text.strip() if tresc_element else "Brak treści"
-
-    wady_element = opinia.find("div", class_="review-feature__title--negatives")
-    wady = []
-    if wady_element:
-        wady = [wada.text.strip() for wada in wady_element.find_next_sibling("div", class_="review-feature__item")]
-
-    zalety_element = opinia.find("div", class_="review-feature__title--positives")
-    zalety = []
-    if zalety_element:
-        zalety = [zaleta.text.strip() for zaleta in zalety_element.find_next_sibling("div", class_="review-feature__item")]
-
-    return {
-        "id": id_opinii,
-        "autor": autor,
-        "rekomendacja": rekomendacja,
-        "gwiazdki": gwiazdki,
-        "data_wystawienia": data_wystawienia,
-        "czas_od_zakupu": czas_od_zakupu,
-        "potwierdzony_zakup": potwierdzony_zakup,
-        "pomocna": pomocna,
-        "nie_pomocna": nie_pomocna,
-        "tresc": tresc,
-        "wady": wady,
-        "zalety": zalety,
-    }
-
-def zapisz_do_csv(opinie, nazwa_pliku):
-    """
-    Zapisuje opinie do pliku CSV.
-
-    Args:
-        opinie: Lista opinii w formacie BeautifulSoup.
-        nazwa_pliku: Nazwa pliku CSV.
-    """
-    with open(nazwa_pliku, "w", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["ID", "Autor", "Rekomendacja", "Liczba gwiazdek", "Data wystawienia", "Czas od zakupu", "Potwierdzony zakup", "Pomocna", "Niepomocna", "Treść", "Wady", "Zalety"])
-        
-        # Pobranie danych z opinii
-        for opinia in opinie:
-            # Zabezpieczenie przed brakiem ID
-            id_opinii = opinia.get("data-entry-id", "Brak ID")
-
-            # Zabezpieczenie przed brakiem autora
-            autor_element = opinia.find("span", class_="user-post__author-name")
-            autor = autor_element.text.strip() if autor_element else "Brak autora"
-
-            # Zabezpieczenie przed brakiem rekomendacji
-            rekomendacja_element = opinia.find("span", class_="user-post__author-recomendation")
-            rekomendacja = rekomendacja_element.text.strip() if rekomendacja_element else "Brak rekomendacji"
-
-            # Zabezpieczenie przed brakiem gwiazdek
-            gwiazdki_element = opinia.find("span", class_="user-post__score-count")
-            gwiazdki = gwiazdki_element.text.strip() if gwiazdki_element else "Brak gwiazdek"
-
-            # Zabezpieczenie przed brakiem daty
-            data_element = opinia.find("span", class_="user-post__published")
-            data = data_element.text.strip() if data_element else "Brak daty"
-
-            # Zabezpieczenie przed brakiem daty wystawienia i czasu od zakupu
-            czas_od_zakupu_element = opinia.find_all("time", {"datetime": True})
-            data_wystawienia = "Brak danych"
-            czas_od_zakupu = "Brak danych"
-            if len(czas_od_zakupu_element) > 1:
-                data_wystawienia = czas_od_zakupu_element[0].text.strip()
-                czas_od_zakupu = czas_od_zakupu_element[1].text.strip()
-
-            # Potwierdzenie zakupu
-            potwierdzony_zakup = "Nie zakupiono"
-            if czas_od_zakupu != "Brak danych":
-                potwierdzony_zakup = "Potwierdzone zakupem"
-
-            # Punktacja pomocna i niepomocna
-            pomocna_element = opinia.find("button", class_="vote-yes js_product-review-vote js_vote-yes")
-            pomocna = pomocna_element.text.strip() if pomocna_element else "Brak danych"
-            nie_pomocna_element = opinia.find("button", class_="vote-no js_product-review-vote js_vote-no")
-            nie_pomocna = nie_pomocna_element.text.strip() if nie_pomocna_element else "Brak danych"
-
-            # Zabezpieczenie przed brakiem treści
-            tresc_element = opinia.find("div", class_="user-post__text")
-            tresc = tresc_element.text.strip() if tresc_element else "Brak treści"
-
-            # Wady
-            wady_element = opinia.find("div", class_="review-feature__title--negatives")
-            wady = []
-            if wady_element:
-                for item in wady_element.find_all_next("div", class_="review-feature__item"):
-                    wady.append(item.text.strip())
-            wady_str = ", ".join(wady)
-
-            # Zalety
-            zalety_element = opinia.find("div", class_="review-feature__title--positives")
-            zalety = []
-            if zalety_element:
-                for item in zalety_element.find_all_next("div", class_="review-feature__item"):
-                    zalety.append(item.text.strip())
-            zalety_str = ", ".join(zalety)
-
-            writer.writerow([id_opinii, autor, rekomendacja, gwiazdki, data, data_wystawienia, czas_od_zakupu, potwierdzony_zakup, pomocna, nie_pomocna, tresc, wady_str, zalety_str])
+# Profiler na żądanie zajmuje wątek serwera na czas profilowania, więc jest domyślnie wyłączony
+app.config['PROFILER'] = os.environ.get("CENEO_PROFILER") == "1"
+
+# Liczba produktów na stronie listy produktów
+ROZMIAR_LISTY = 100
+# Typy plików eksportu opinii i przybliżony rozmiar wysyłanych porcji (przed kompresją)
+FORMATY_EKSPORTU = {'json': 'application/json', 'jsonl': 'application/x-ndjson', 'csv': 'text/csv'}
+ROZMIAR_PORCJI_EKSPORTU = 64 * 1024
+
+ZADANIA_HTTP = rejestr.licznik("ceneo_http_zadania_total", "Liczba obsłużonych żądań według widoku, metody i kodu odpowiedzi.",
+                               ("widok", "metoda", "kod"))
+CZAS_ZADAN_HTTP = rejestr.histogram("ceneo_http_czas_sekundy", "Czas obsługi żądań według widoku.", ("widok",))
+
+@app.before_request
+def poczatek_pomiaru():
+    g.poczatek_zadania = time.perf_counter()
+
+@app.after_request
+def koniec_pomiaru(odpowiedz):
+    # Po wyjątku Flask też przekazuje tu odpowiedź z kodem 500, więc błędy są liczone w kodach odpowiedzi
+    widok = request.endpoint or "brak"
+    if "poczatek_zadania" in g:
+        CZAS_ZADAN_HTTP.obserwuj(time.perf_counter() - g.poczatek_zadania, widok=widok)
+    ZADANIA_HTTP.zwieksz(widok=widok, metoda=request.method, kod=str(odpowiedz.status_code))
+    return odpowiedz
+
+@app.route("/metrics")
+def metryki():
+    return app.response_class(rejestr.tekst(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route("/metrics/profil")
+def profil():
+    # Profiler próbkujący na żądanie: stosy wszystkich wątków przez podany czas (tylko z CENEO_PROFILER=1)
+    if not app.config['PROFILER']:
+        abort(404)
+    sekundy = request.args.get("sekundy", 10, type=float)
+    odstep = request.args.get("odstep", ODSTEP_PROBEK, type=float)
+    if sekundy <= 0 or odstep <= 0:
+        abort(400)
+    return app.response_class(profiluj(sekundy, odstep), mimetype="text/plain")
 
 @app.route("/")
 def index():
@@ -203,101 +64,220 @@ def ekstrakcja_opinii():
         if ean.strip() == '':
             flash('Pole kodu EAN nie może być puste!', 'error')
         else:
-            opinie = ekstrakcja_opinii_po_ean(ean)
-            if opinie is None:
-                flash('Błędny kod EAN!', 'error')
-            else:
-                zapisz_do_json(opinie, "opinie.json")
-                return redirect(url_for('ekstrakcja_opinii'))
+            # Wykresy nie są rysowane przy pobieraniu, tylko przy pierwszym wyświetleniu
+            zadanie = kolejka.zglos(ean.strip())
+            return redirect(url_for('zadanie', id_zadania=zadanie.id))
     return render_template("ekstrakcja.html")
 
+@app.route("/zadania/<id_zadania>")
+def zadanie(id_zadania):
+    zadanie = kolejka.pobierz(id_zadania)
+    if zadanie is None:
+        abort(404)
+    return render_template("zadanie.html", zadanie=zadanie)
+
+@app.route("/api/zadania/<id_zadania>")
+def status_zadania(id_zadania):
+    zadanie = kolejka.pobierz(id_zadania)
+    if zadanie is None:
+        abort(404)
+    return jsonify(zadanie.do_slownika())
+
 @app.route("/ekstrakcja_opinii", methods=['GET', 'POST'])
 def ekstrakcja():
+    ean = wybrany_ean()
+    if ean is None:
+        flash('Najpierw pobierz opinie produktu!', 'error')
+        return redirect(url_for('ekstrakcja_opinii'))
     if request.method == 'POST':
-        # Kod obsługujący filtrowanie opinii po dowolnej kolumnie
+        # Filtrowanie po jednej kolumnie z formularza POST zamieniane na parametry zapytania
         filtr = request.form.get('filtr')
-        wartosc_filtru = request.form.get('wartosc_filtru')
-        opinie = filtruj_opinie(filtr, wartosc_filtru)
-    else:
-        # Pobranie opinii
-        with open("opinie.json", "r") as f:
-            opinie = json.load(f)
-    return render_template("ekstrakcja_opinii.html", opinie=opinie)
-
-def filtruj_opinie(filtr, wartosc):
-    with open("opinie.json", "r") as f:
-        opinie = json.load(f)
-    
-    if filtr == 'autor':
-        return [opinia for opinia in opinie if opinia['autor'].lower() == wartosc.lower()]
-    elif filtr == 'rekomendacja':
-        return [opinia for opinia in opinie if opinia['rekomendacja'].lower() == wartosc.lower()]
-    elif filtr == 'liczba_gwiazdek':
-        return [opinia for opinia in opinie if opinia['gwiazdki'].lower() == wartosc.lower()]
-    else:
-        return opinie
-
-@app.route("/wykresy", methods=['POST'])
+        wartosc_filtru = request.form.get('wartosc_filtru', '')
+        parametry = {}
+        if filtr in ('autor', 'rekomendacja'):
+            parametry[filtr] = wartosc_filtru
+        elif filtr == 'liczba_gwiazdek':
+            ocena = ocena_liczbowa(wartosc_filtru)
+            if ocena is None:
+                # Jak w /eksport: nieprawidłowy filtr to błąd, a nie pominięcie filtrowania
+                flash('Nieprawidłowe parametry filtrowania!', 'error')
+                return redirect(url_for('ekstrakcja', ean=ean))
+            parametry['ocena_od'] = parametry['ocena_do'] = ocena
+        return redirect(url_for('ekstrakcja', ean=ean, **parametry))
+
+    sortuj = request.args.get('sortuj', 'pozycja')
+    malejaco = request.args.get('kierunek') == 'malejaco'
+    try:
+        wynik = domyslny_magazyn().zapytanie(ean, filtr_z_zapytania(request.args), sortuj, malejaco, po=request.args.get('po'))
+    except ValueError:
+        flash('Nieprawidłowe parametry filtrowania!', 'error')
+        return redirect(url_for('ekstrakcja', ean=ean))
+
+    def adres(**zmiany):
+        # Adres bieżącego widoku ze zmienionymi parametrami; zmiana filtra lub sortowania wraca na pierwszą stronę
+        parametry = request.args.to_dict()
+        parametry.pop('po', None)
+        parametry.update(zmiany)
+        parametry['ean'] = ean
+        return url_for('ekstrakcja', **{klucz: wartosc for klucz, wartosc in parametry.items() if wartosc not in (None, '')})
+
+    def adres_eksportu(format):
+        # Plik z opiniami pasującymi do bieżących filtrów, w bieżącej kolejności i w całości (bez stronicowania)
+        parametry = {klucz: wartosc for klucz, wartosc in request.args.items() if klucz not in ('ean', 'po') and wartosc != ''}
+        return url_for('eksport', ean=ean, format=format, **parametry)
+
+    return render_template("ekstrakcja_opinii.html", opinie=wynik.opinie, wynik=wynik, ean=ean,
+                           sortuj=sortuj, malejaco=malejaco, parametry=request.args, adres=adres,
+                           adres_eksportu=adres_eksportu)
+
+def wybrany_ean():
+    # EAN z parametru żądania, a gdy go brak - ostatnio oglądany produkt
+    ean = request.values.get('ean') or session.get('ean')
+    if ean:
+        session['ean'] = ean
+    return ean
+
+def filtr_z_zapytania(parametry):
+    """
+    Tworzy filtr opinii z parametrów zapytania; puste pola są pomijane.
+    Nieprawidłowe wartości powodują ValueError.
+    """
+    def wartosc(nazwa, typ):
+        tekst = parametry.get(nazwa, '').strip()
+        return typ(tekst) if tekst else None
+
+    def data(tekst):
+        return datetime.date.fromisoformat(tekst).isoformat()
+
+    potwierdzone = parametry.get('potwierdzone')
+    return Filtr(
+        ocena_od=wartosc('ocena_od', float),
+        ocena_do=wartosc('ocena_do', float),
+        data_od=wartosc('data_od', data),
+        data_do=wartosc('data_do', data),
+        potwierdzone={'tak': True, 'nie': False}.get(potwierdzone),
+        min_pomocnych=wartosc('min_pomocnych', int),
+        autor=wartosc('autor', str),
+        rekomendacja=wartosc('rekomendacja', str),
+        bez_duplikatow=True if parametry.get('bez_duplikatow') else None,
+    )
+
+@app.route("/szukaj")
+def szukaj():
+    fraza, ean, pola, limit = parametry_wyszukiwania()
+    trafienia = domyslny_magazyn().szukaj(fraza, ean, pola, limit) if fraza else []
+    return render_template("szukaj.html", trafienia=trafienia, fraza=fraza, ean=ean, pola=pola or [])
+
+@app.route("/api/szukaj")
+def szukaj_api():
+    fraza, ean, pola, limit = parametry_wyszukiwania()
+    trafienia = domyslny_magazyn().szukaj(fraza, ean, pola, limit)
+    return jsonify([dict(trafienie.opinia.do_slownika(), ean=trafienie.ean, trafnosc=trafienie.trafnosc)
+                    for trafienie in trafienia])
+
+def parametry_wyszukiwania():
+    # Fraza, EAN, pola i limit wyników z parametrów zapytania
+    pola = [pole for pole in request.args.getlist('pole') if pole in ('tresc', 'wady', 'zalety')]
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return request.args.get('q', '').strip(), request.args.get('ean') or None, pola or None, limit
+
+@app.route("/wykresy", methods=['GET', 'POST'])
 def wykresy():
-    return render_template("wykresy.html")
-
-@app.route("/zapisz_do_json", methods=['POST'])
-def zapisz_do_json_view():
-    opinie = json.loads(request.form['opinie'])
-    zapisz_do_json(opinie, "opinie.json")
-    flash('Opinie zostały zapisane do pliku JSON!', 'success')
-    return redirect(url_for('ekstrakcja_opinii'))
-
-@app.route("/zapisz_do_csv", methods=['POST'])
-def zapisz_do_csv_view():
-    opinie = json.loads(request.form['opinie'])
-    zapisz_do_csv(opinie, "opinie.csv")
-    flash('Opinie zostały zapisane do pliku CSV!', 'success')
-    return redirect(url_for('ekstrakcja_opinii'))
-
-"""
+    ean = wybrany_ean()
+    if ean is None:
+        flash('Najpierw pobierz opinie produktu!', 'error')
+        return redirect(url_for('ekstrakcja_opinii'))
+    return render_template("wykresy.html", ean=ean)
+
+@app.route("/wykresy/<ean>/<rodzaj>.<format>")
+def wykres(ean, rodzaj, format):
+    try:
+        wynik = domyslna_usluga().wykres(ean, rodzaj, format)
+    except ValueError:
+        abort(404)
+    if wynik is None:
+        abort(404)
+    obraz, skrot = wynik
+    return z_pamiecia(app.response_class(obraz, mimetype=FORMATY[format]), f"{skrot}-{rodzaj}-{format}")
+
+@app.route("/api/wykresy/<ean>")
+def dane_wykresow(ean):
+    wpis = domyslna_usluga().dane(ean)
+    if wpis is None:
+        abort(404)
+    dane, skrot = wpis
+    return z_pamiecia(jsonify(dane_kompaktowe(dane)), skrot)
+
+def z_pamiecia(odpowiedz, etag):
+    # Skrót danych jako ETag: przeglądarka rewaliduje odpowiedź i dostaje 304, dopóki dane się nie zmienią
+    odpowiedz.set_etag(etag)
+    odpowiedz.cache_control.public = True
+    odpowiedz.cache_control.max_age = 300
+    return odpowiedz.make_conditional(request)
+
+@app.route("/eksport/<ean>.<format>")
+def eksport(ean, format):
+    # Plik z opiniami wysyłany porcjami prosto z magazynu, z filtrami i sortowaniem jak w widoku opinii;
+    # ani lista opinii, ani cały plik nie są budowane w pamięci
+    if format not in FORMATY_EKSPORTU:
+        abort(404)
+    magazyn = domyslny_magazyn()
+    if magazyn.produkt(ean) is None:
+        abort(404)
+    try:
+        opinie = magazyn.strumien(ean, filtr_z_zapytania(request.args), request.args.get('sortuj', 'pozycja'),
+                                  request.args.get('kierunek') == 'malejaco')
+    except ValueError:
+        abort(400)
+    porcje = w_porcjach(FRAGMENTY[format](opinie))
+    # Bez Content-Length serwer wysyła odpowiedź kawałkami (chunked); gzip tylko dla klientów, które go akceptują
+    gzip = request.accept_encodings['gzip'] > 0
+    odpowiedz = app.response_class(skompresowane(porcje) if gzip else porcje, mimetype=FORMATY_EKSPORTU[format])
+    odpowiedz.headers.set('Content-Disposition', 'attachment', filename=f"opinie-{ean}.{format}")
+    odpowiedz.vary.add('Accept-Encoding')
+    if gzip:
+        odpowiedz.content_encoding = 'gzip'
+    return odpowiedz
+
+def w_porcjach(fragmenty, rozmiar=ROZMIAR_PORCJI_EKSPORTU):
+    # Łączy krótkie fragmenty (np. pojedyncze wiersze CSV) w porcje bajtów, żeby nie wysyłać kawałka na każdą opinię
+    porcja, dlugosc = [], 0
+    for fragment in fragmenty:
+        dane = fragment.encode('utf-8')
+        porcja.append(dane)
+        dlugosc += len(dane)
+        if dlugosc >= rozmiar:
+            yield b''.join(porcja)
+            porcja, dlugosc = [], 0
+    if porcja:
+        yield b''.join(porcja)
+
+def skompresowane(porcje):
+    # Kompresja gzip w locie (wbits=31 dodaje nagłówek i sumę kontrolną gzip)
+    kompresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for porcja in porcje:
+        dane = kompresor.compress(porcja)
+        if dane:
+            yield dane
+    yield kompresor.flush()
+
 @app.route("/lista_produktow")
 def lista_produktow():
-    # Inicjalizacja listy produktów
-    produkty = []
-
-    # Pobranie opinii
-    with open("opinie.json", "r", encoding="utf-8") as f:
-        opinie = json.load(f)
-
-    if request.method == "POST":
-        akcja = request.form.get("akcja")
-        if akcja == "zapisz_json":
-            # Pobranie opinii
-            with open("opinie.json", "r", encoding="utf-8") as f:
-                opinie = json.load(f)
-
-            # Zapisanie opinii do pliku JSON
-            zapisz_do_json(opinie, "opinie.json")
-
-        elif akcja == "zapisz_csv":
-            # Pobranie opinii
-            with open("opinie.json", "r", encoding="utf-8") as f:
-                opinie = json.load(f)
-
-            # Zapisanie opinii do pliku CSV
-            zapisz_do_csv(opinie, "opinie.csv")
-
-    # Tworzenie obiektów produktów
-    for opinia in opinie:
-        ean = opinia.get['ean'] 
-        produkt = Produkt(ean)
-        produkt.nazwa = 'Nazwa Produktu'  # Pobierz nazwę produktu z serwisu Ceneo lub innej platformy
-        produkt.liczba_opinii = len(opinie)
-        produkt.liczba_wad = sum(len(opinia['wady']) for opinia in opinie)
-        produkt.liczba_zalet = sum(len(opinia['zalety']) for opinia in opinie)
-        oceny = [float(opinia['gwiazdki'].replace(',', '.')) for opinia in opinie]
-        produkt.srednia_ocena = sum(oceny) / len(oceny)
-        produkt.url = f"https://www.ceneo.pl/{ean}"  # Ustawienie URL do produktu
-        produkty.append(produkt)
-
-    return render_template("lista_produktow.html", produkty=produkty)
-"""
+    # Jeden odczyt z tabeli zestawień, bez przeglądania opinii produktów
+    sortuj = request.args.get('sortuj', 'pobrano')
+    malejaco = request.args.get('kierunek', 'malejaco') == 'malejaco'
+    przesuniecie = max(request.args.get('przesuniecie', 0, type=int), 0)
+    try:
+        lista = domyslny_magazyn().lista_produktow(sortuj, malejaco, ROZMIAR_LISTY, przesuniecie)
+    except ValueError:
+        abort(400)
+    return render_template("lista_produktow.html", produkty=lista.produkty, liczba=lista.liczba, sortuj=sortuj,
+                           malejaco=malejaco, przesuniecie=przesuniecie, rozmiar=ROZMIAR_LISTY, adres_ceneo=ADRES_CENEO)
+
+@app.template_filter("czas")
+def czas(chwila):
+    # Czas w sekundach od początku epoki jako data i godzina
+    return datetime.datetime.fromtimestamp(chwila).strftime('%Y-%m-%d %H:%M') if chwila else ''
 
 @app.route("/o_autorze")
 def about():
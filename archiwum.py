@@ -0,0 +1,292 @@
+import argparse
+import gzip
+import hashlib
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from urllib.parse import urlsplit
+from ceneo import opinie_ze_strony, _najnowsza_data, WYODREBNIONE
+from magazyn import domyslny_magazyn
+
+DOMYSLNY_KATALOG = "archiwum"
+# Rozszerzenia plików obiektów według rodzaju kompresji
+KOMPRESJE = ("zst", "gz")
+POZIOM_ZSTD = 10
+POZIOM_GZIP = 6
+
+# Adresy stron z opiniami mają postać /<ean> albo /<ean>/opinie-<numer strony>
+_WZORZEC_ADRESU = re.compile(r"/([^/]+)(?:/opinie-(\d+))?/?")
+
+Strona = namedtuple("Strona", ["url", "numer", "skrot", "kompresja", "pobrano"])
+
+class Archiwum:
+    """
+    Archiwum surowych stron z opiniami, adresowane treścią.
+
+    Każda pobrana strona trafia do pliku obiekty/<xx>/<sha256>.<kompresja>,
+    więc ta sama treść pobrana wielokrotnie (albo pod różnymi adresami) jest
+    zapisywana raz. Indeks w bazie SQLite pamięta wszystkie wersje stron
+    każdego produktu wraz z czasem ostatniego pobrania, co pozwala odtworzyć
+    opinie bez dostępu do sieci (ponownie_wyodrebnij).
+
+    Domyślna kompresja to zstd, gdy dostępny jest pakiet zstandard,
+    a w przeciwnym razie gzip.
+    """
+
+    def __init__(self, katalog=DOMYSLNY_KATALOG, kompresja=None):
+        if kompresja is None:
+            kompresja = "zst" if _zstandard() is not None else "gz"
+        if kompresja not in KOMPRESJE:
+            raise ValueError(f"Nieznana kompresja: {kompresja!r} (dostępne: {', '.join(KOMPRESJE)})")
+        if kompresja == "zst" and _zstandard() is None:
+            raise ImportError("Kompresja zstd wymaga pakietu zstandard (pip install zstandard).")
+        self.katalog = katalog
+        self.kompresja = kompresja
+        self._blokada = threading.Lock()
+
+        os.makedirs(os.path.join(katalog, "obiekty"), exist_ok=True)
+        self._polaczenie = sqlite3.connect(os.path.join(katalog, "indeks.sqlite"), check_same_thread=False, isolation_level=None)
+        self._polaczenie.execute("PRAGMA journal_mode=WAL")
+        self._polaczenie.execute(
+            "CREATE TABLE IF NOT EXISTS strony ("
+            " url TEXT NOT NULL,"
+            " ean TEXT NOT NULL,"
+            " numer INTEGER NOT NULL,"
+            " skrot TEXT NOT NULL,"
+            " kompresja TEXT NOT NULL,"
+            " rozmiar INTEGER NOT NULL,"
+            " pobrano REAL NOT NULL,"
+            " PRIMARY KEY (url, skrot))"
+        )
+        self._polaczenie.execute("CREATE INDEX IF NOT EXISTS strony_ean ON strony (ean, numer)")
+
+    def zapisz(self, url, tresc):
+        """
+        Zapisuje pobraną stronę z opiniami w archiwum.
+
+        Args:
+            url: Adres URL strony.
+            tresc: Treść strony w postaci bajtów.
+
+        Returns:
+            Skrót SHA-256 treści albo None, gdy adres nie jest adresem strony
+            z opiniami produktu.
+        """
+        dopasowanie = _WZORZEC_ADRESU.fullmatch(urlsplit(url).path)
+        if dopasowanie is None:
+            return None
+        ean, numer = dopasowanie.group(1), int(dopasowanie.group(2) or 1)
+        skrot = hashlib.sha256(tresc).hexdigest()
+        sciezka = sciezka_obiektu(self.katalog, skrot, self.kompresja)
+        if os.path.exists(sciezka):
+            rozmiar = os.path.getsize(sciezka)
+        else:
+            os.makedirs(os.path.dirname(sciezka), exist_ok=True)
+            skompresowana = kompresuj(tresc, self.kompresja)
+            # Zapis do pliku tymczasowego i zmiana nazwy, żeby nie zostawić niepełnego obiektu
+            tymczasowa = f"{sciezka}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tymczasowa, "wb") as f:
+                f.write(skompresowana)
+            os.replace(tymczasowa, sciezka)
+            rozmiar = len(skompresowana)
+        with self._blokada:
+            self._polaczenie.execute(
+                "INSERT INTO strony VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (url, skrot) DO UPDATE SET "
+                "kompresja = excluded.kompresja, rozmiar = excluded.rozmiar, pobrano = excluded.pobrano",
+                (url, ean, numer, skrot, self.kompresja, rozmiar, time.time()),
+            )
+        return skrot
+
+    def odczytaj(self, strona):
+        """
+        Odczytuje treść zapisanej strony.
+
+        Args:
+            strona: Obiekt Strona zwrócony przez strony().
+
+        Returns:
+            Treść strony w postaci bajtów.
+        """
+        return odczytaj_obiekt(self.katalog, strona.skrot, strona.kompresja)
+
+    def strony(self, ean):
+        """
+        Zwraca wszystkie zapisane wersje stron produktu.
+
+        Args:
+            ean: Kod EAN produktu.
+
+        Returns:
+            Lista obiektów Strona według numeru strony, a dla tego samego
+            numeru od ostatnio pobranej wersji.
+        """
+        with self._blokada:
+            wiersze = self._polaczenie.execute(
+                "SELECT url, numer, skrot, kompresja, pobrano FROM strony WHERE ean = ? ORDER BY numer, pobrano DESC", (ean,)
+            ).fetchall()
+        return [Strona(*wiersz) for wiersz in wiersze]
+
+    def produkty(self):
+        """
+        Zwraca kody EAN produktów, których strony są w archiwum.
+
+        Returns:
+            Posortowana lista kodów EAN.
+        """
+        with self._blokada:
+            return [ean for ean, in self._polaczenie.execute("SELECT DISTINCT ean FROM strony ORDER BY ean")]
+
+    def statystyki(self):
+        """
+        Zwraca liczbę produktów, wersji stron i obiektów oraz rozmiar archiwum.
+
+        Returns:
+            Słownik z licznikami i łącznym rozmiarem obiektów w bajtach.
+        """
+        with self._blokada:
+            produkty, strony, obiekty = self._polaczenie.execute(
+                "SELECT COUNT(DISTINCT ean), COUNT(*), COUNT(DISTINCT skrot || kompresja) FROM strony"
+            ).fetchone()
+            rozmiar = self._polaczenie.execute(
+                "SELECT COALESCE(SUM(rozmiar), 0) FROM (SELECT MAX(rozmiar) AS rozmiar FROM strony GROUP BY skrot, kompresja)"
+            ).fetchone()[0]
+        return {"produkty": produkty, "strony": strony, "obiekty": obiekty, "rozmiar": rozmiar}
+
+    def zamknij(self):
+        """
+        Zamyka połączenie z indeksem archiwum.
+        """
+        with self._blokada:
+            self._polaczenie.close()
+
+def _zstandard():
+    try:
+        # Import na miejscu, bo zstandard jest zależnością opcjonalną
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+def sciezka_obiektu(katalog, skrot, kompresja):
+    return os.path.join(katalog, "obiekty", skrot[:2], f"{skrot}.{kompresja}")
+
+def kompresuj(tresc, kompresja):
+    if kompresja == "zst":
+        return _zstandard().ZstdCompressor(level=POZIOM_ZSTD).compress(tresc)
+    # mtime=0, żeby ta sama treść zawsze dawała ten sam plik
+    return gzip.compress(tresc, compresslevel=POZIOM_GZIP, mtime=0)
+
+def odczytaj_obiekt(katalog, skrot, kompresja):
+    with open(sciezka_obiektu(katalog, skrot, kompresja), "rb") as f:
+        dane = f.read()
+    if kompresja == "zst":
+        return _zstandard().ZstdDecompressor().decompress(dane)
+    return gzip.decompress(dane)
+
+def wyodrebnij_produkt(katalog, ean, strony):
+    """
+    Wyodrębnia opinie produktu z zapisanych w archiwum stron; wywoływana
+    w procesach puli, więc dostaje katalog archiwum zamiast obiektu Archiwum.
+
+    Opinia występująca w kilku wersjach stron jest brana z wersji pobranej
+    najpóźniej, a kolejność opinii odpowiada kolejności ich pierwszego
+    wystąpienia na stronach (według numeru strony, od najnowszej wersji).
+
+    Args:
+        katalog: Katalog archiwum.
+        ean: Kod EAN produktu.
+        strony: Lista obiektów Strona produktu w kolejności z Archiwum.strony().
+
+    Returns:
+        Krotka (ean, lista obiektów Opinia od najnowszej, najnowsza data opinii,
+        liczba opinii wyodrębnionych ze wszystkich wersji stron).
+    """
+    najnowsze = {}
+    najnowsza_data = None
+    wyodrebnione = 0
+    for strona in strony:
+        html = odczytaj_obiekt(katalog, strona.skrot, strona.kompresja)
+        opinie = opinie_ze_strony(html)
+        wyodrebnione += len(opinie)
+        for opinia in opinie:
+            poprzednia = najnowsze.get(opinia.id_opinii)
+            if poprzednia is None or strona.pobrano > poprzednia[0]:
+                # Nadpisanie wartości nie zmienia kolejności kluczy słownika
+                najnowsze[opinia.id_opinii] = (strona.pobrano, opinia)
+        data = _najnowsza_data(html)
+        if data and (najnowsza_data is None or data > najnowsza_data):
+            najnowsza_data = data
+    return ean, [opinia for _, opinia in najnowsze.values()], najnowsza_data, wyodrebnione
+
+def ponownie_wyodrebnij(archiwum, eany=None, procesy=None, magazyn=None):
+    """
+    Odtwarza opinie produktów ze stron w archiwum, bez dostępu do sieci,
+    i zapisuje je w magazynie w miejsce dotychczasowych.
+
+    Produkty są przetwarzane równolegle w puli procesów, a zapis do
+    magazynu odbywa się w procesie wywołującym.
+
+    Args:
+        archiwum: Obiekt Archiwum.
+        eany: Kody EAN produktów; domyślnie wszystkie produkty z archiwum.
+        procesy: Liczba procesów; domyślnie liczba rdzeni, a 0 oznacza
+            przetwarzanie w bieżącym procesie.
+        magazyn: Obiekt Magazyn; domyślnie współdzielony magazyn.
+
+    Returns:
+        Słownik z liczbą produktów, stron, opinii i czasem w sekundach.
+    """
+    magazyn = magazyn or domyslny_magazyn()
+    eany = archiwum.produkty() if eany is None else eany
+    zadania = [(archiwum.katalog, ean, archiwum.strony(ean)) for ean in eany]
+    wynik = {"produkty": 0, "strony": sum(len(strony) for _, _, strony in zadania), "opinie": 0}
+
+    def zapisz(ean, opinie, najnowsza_data):
+        # Produkt bez opinii w archiwum zachowuje opinie zapisane wcześniej
+        if opinie:
+            magazyn.zapisz_opinie(ean, opinie, najnowsza_data)
+            wynik["produkty"] += 1
+            wynik["opinie"] += len(opinie)
+
+    start = time.perf_counter()
+    if procesy == 0:
+        for zadanie in zadania:
+            ean, opinie, najnowsza_data, _ = wyodrebnij_produkt(*zadanie)
+            zapisz(ean, opinie, najnowsza_data)
+    else:
+        # Procesy uruchamiane od nowa, a nie przez fork, jak w wsadowe.py: proces ma już wątki i otwarte
+        # połączenia SQLite, których potomek nie może bezpiecznie odziedziczyć
+        with ProcessPoolExecutor(max_workers=procesy, mp_context=multiprocessing.get_context("spawn")) as pula:
+            for przyszlosc in as_completed([pula.submit(wyodrebnij_produkt, *zadanie) for zadanie in zadania]):
+                ean, opinie, najnowsza_data, wyodrebnione = przyszlosc.result()
+                # Licznik zwiększony w procesie puli zostaje w jego rejestrze
+                WYODREBNIONE.zwieksz(wyodrebnione)
+                zapisz(ean, opinie, najnowsza_data)
+    wynik["czas"] = time.perf_counter() - start
+    return wynik
+
+def main():
+    parser = argparse.ArgumentParser(description="Ponowne wyodrębnienie opinii ze stron zapisanych w archiwum.")
+    parser.add_argument("eany", nargs="*", help="kody EAN produktów; domyślnie wszystkie z archiwum")
+    parser.add_argument("--katalog", default=os.environ.get("CENEO_ARCHIWUM") or DOMYSLNY_KATALOG, help="katalog archiwum")
+    parser.add_argument("--procesy", type=int, default=None, help="liczba procesów (0 - w bieżącym procesie)")
+    parser.add_argument("--statystyki", action="store_true", help="wyświetl tylko rozmiar archiwum")
+    argumenty = parser.parse_args()
+
+    archiwum = Archiwum(argumenty.katalog)
+    statystyki = archiwum.statystyki()
+    print(f"Archiwum {argumenty.katalog}: {statystyki['produkty']} produktów, {statystyki['strony']} wersji stron, "
+          f"{statystyki['obiekty']} obiektów, {statystyki['rozmiar'] / 1024 / 1024:.1f} MB")
+    if not argumenty.statystyki:
+        wynik = ponownie_wyodrebnij(archiwum, argumenty.eany or None, argumenty.procesy)
+        print(f"Produkty: {wynik['produkty']}, strony: {wynik['strony']}, opinie: {wynik['opinie']}, "
+              f"czas: {wynik['czas']:.1f} s")
+    archiwum.zamknij()
+
+if __name__ == "__main__":
+    main()
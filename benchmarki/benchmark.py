@@ -0,0 +1,246 @@
+"""
+Testy wydajności pobierania, parsowania, wyodrębniania, zapisu i statystyk
+opinii na stronach serwowanych lokalnie (bez dostępu do serwisu Ceneo).
+
+Mierzone są produkty ze stronami nagranymi z serwisu (benchmarki/nagrane/)
+oraz, do pomiaru skalowania, produkty z 10, 500 i 5000 opinii na stronach
+generowanych (szczegóły w strony.py).
+
+Uruchomienie z katalogu głównego projektu:
+
+    python benchmarki/benchmark.py                          # strony nagrane oraz 10, 500 i 5000 opinii
+    python benchmarki/benchmark.py --rozmiary --nagrane sluchawki   # tylko strony nagrane
+    python benchmarki/benchmark.py --rozmiary 500 --parser lxml
+    python benchmarki/benchmark.py --porownaj benchmarki/wyniki/poprzedni.json
+    python benchmarki/benchmark.py --awarie 0.05 --limit-rownoleglych 4   # serwis przeciążony
+
+Każdy rozmiar produktu jest mierzony w osobnym procesie, dzięki czemu
+szczytowe zużycie pamięci (RSS) dotyczy tylko tego produktu. Wyniki trafiają
+do pliku JSON w benchmarki/wyniki/; z opcją --porownaj skrypt kończy się
+kodem 1, gdy któryś etap jest wyraźnie wolniejszy niż w porównywanym pliku.
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+KATALOG_PROJEKTU = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, KATALOG_PROJEKTU)
+
+from strony import SerwerStron, nagrane_produkty, przygotuj_strony
+
+KATALOG_WYNIKOW = os.path.join(KATALOG_PROJEKTU, "benchmarki", "wyniki")
+ROZMIARY = (10, 500, 5000)
+POWTORZENIA = 3
+# Dopuszczalny względny spadek przepustowości przy porównaniu z poprzednim wynikiem
+TOLERANCJA = 0.15
+
+class Pomiar:
+    """
+    Zbiera czasy pojedynczych operacji etapu i liczbę przetworzonych jednostek.
+    """
+
+    def __init__(self, jednostka):
+        self.jednostka = jednostka
+        self.czasy = []
+        self.jednostki = 0
+        self.czas_calkowity = 0.0
+
+    def dodaj(self, czas, jednostki=1):
+        self.dodaj_opoznienie(czas)
+        self.dodaj_okres(czas, jednostki)
+
+    def dodaj_opoznienie(self, czas):
+        # Czas pojedynczej operacji (do percentyli)
+        self.czasy.append(czas)
+
+    def dodaj_okres(self, czas, jednostki):
+        # Czas, w którym przetworzono podaną liczbę jednostek (do przepustowości)
+        self.jednostki += jednostki
+        self.czas_calkowity += czas
+
+    def wynik(self):
+        czasy = sorted(self.czasy)
+        return {
+            "jednostka": self.jednostka,
+            "przepustowosc": self.jednostki / self.czas_calkowity if self.czas_calkowity else None,
+            "operacje": len(czasy),
+            "p50_ms": _percentyl(czasy, 50) * 1000,
+            "p90_ms": _percentyl(czasy, 90) * 1000,
+            "p99_ms": _percentyl(czasy, 99) * 1000,
+            "maks_ms": czasy[-1] * 1000,
+        }
+
+def _percentyl(posortowane, procent):
+    indeks = min(len(posortowane) - 1, round(procent / 100 * (len(posortowane) - 1)))
+    return posortowane[indeks]
+
+def zmierz_produkt(ean, powtorzenia):
+    """
+    Mierzy wszystkie etapy dla jednego produktu; wywoływana w osobnym procesie.
+
+    Args:
+        ean: Kod produktu serwowanego przez SerwerStron.
+        powtorzenia: Liczba powtórzeń każdego etapu.
+
+    Returns:
+        Słownik z wynikami etapów, liczbą stron i opinii oraz szczytowym RSS.
+    """
+    import ceneo
+    from pobieranie import Pobieracz
+    # Moduły wczytywane przez ceneo leniwie są importowane przed pomiarem
+    import statystyki
+
+    etapy = {nazwa: Pomiar(jednostka) for nazwa, jednostka in (
+        ("pobieranie", "stron/s"), ("parsowanie", "stron/s"), ("wyodrebnianie", "opinii/s"),
+        ("zapis_json", "opinii/s"), ("zapis_csv", "opinii/s"), ("statystyki", "opinii/s"),
+    )}
+    parser = ceneo._aktywny_parser()
+    url = ceneo.adres_produktu(ean)
+
+    for _ in range(powtorzenia):
+        # Pobieranie: czas każdego zapytania, bez limitu tempa i bez pamięci podręcznej
+        pobieracz = Pobieracz(zapytan_na_sekunde=0)
+        pobierz = pobieracz.pobierz
+
+        def pobierz_z_pomiarem(adres):
+            start = time.perf_counter()
+            tresc = pobierz(adres)
+            etapy["pobieranie"].dodaj_opoznienie(time.perf_counter() - start)
+            return tresc
+
+        pobieracz.pobierz = pobierz_z_pomiarem
+        start = time.perf_counter()
+        strony = list(ceneo.strony_html(url, pobieracz))
+        # Zapytania idą równolegle, więc przepustowość liczona jest względem czasu całego pobierania
+        etapy["pobieranie"].dodaj_okres(time.perf_counter() - start, len(strony))
+        pobieracz.zamknij()
+
+        opinie = []
+        for html in strony:
+            start = time.perf_counter()
+            dokument = parser.parsuj(html)
+            elementy = parser.opinie(dokument)
+            etapy["parsowanie"].dodaj(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            opinie_strony = [ceneo.wyodrebnij_opinie(element) for element in elementy]
+            etapy["wyodrebnianie"].dodaj(time.perf_counter() - start, len(opinie_strony))
+            parser.zwolnij(dokument)
+            opinie.extend(opinie_strony)
+
+        with tempfile.TemporaryDirectory() as katalog:
+            for etap, zapisz, nazwa_pliku in (("zapis_json", ceneo.zapisz_do_json, "opinie.json"),
+                                             ("zapis_csv", ceneo.zapisz_do_csv, "opinie.csv")):
+                start = time.perf_counter()
+                zapisz(opinie, os.path.join(katalog, nazwa_pliku))
+                etapy[etap].dodaj(time.perf_counter() - start, len(opinie))
+
+        start = time.perf_counter()
+        ceneo._analiza_statystyczna(opinie)
+        etapy["statystyki"].dodaj(time.perf_counter() - start, len(opinie))
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "strony": len(strony),
+        "opinie": len(opinie),
+        "parser": parser.nazwa,
+        # ru_maxrss jest w kilobajtach na Linuksie, a w bajtach na macOS
+        "szczytowy_rss_mb": rss / 1024 / (1024 if sys.platform == "darwin" else 1),
+        "etapy": {nazwa: pomiar.wynik() for nazwa, pomiar in etapy.items()},
+    }
+
+def porownaj(wyniki, poprzednie, tolerancja=TOLERANCJA):
+    """
+    Wyszukuje etapy, których przepustowość spadła bardziej niż o tolerancję.
+
+    Args:
+        wyniki: Bieżące wyniki (słownik zapisywany do JSON).
+        poprzednie: Wcześniejsze wyniki w tym samym formacie.
+        tolerancja: Dopuszczalny względny spadek przepustowości.
+
+    Returns:
+        Lista opisów regresji (pusta, gdy ich brak).
+    """
+    regresje = []
+    for klucz, produkt in wyniki["produkty"].items():
+        poprzedni_produkt = poprzednie["produkty"].get(klucz)
+        if poprzedni_produkt is None:
+            continue
+        for etap, wynik in produkt["etapy"].items():
+            poprzedni = poprzedni_produkt["etapy"].get(etap, {}).get("przepustowosc")
+            if poprzedni and wynik["przepustowosc"] is not None:
+                zmiana = wynik["przepustowosc"] / poprzedni - 1
+                if zmiana < -tolerancja:
+                    regresje.append(f"{klucz}, {etap}: {wynik['przepustowosc']:.1f} {wynik['jednostka']} "
+                                    f"zamiast {poprzedni:.1f} ({zmiana:+.0%})")
+    return regresje
+
+def main():
+    parser = argparse.ArgumentParser(description="Testy wydajności na stronach serwowanych lokalnie.")
+    parser.add_argument("--nagrane", nargs="*", default=nagrane_produkty(), help="produkty ze stronami nagranymi z serwisu")
+    parser.add_argument("--rozmiary", type=int, nargs="*", default=ROZMIARY, help="liczby opinii produktów na stronach generowanych")
+    parser.add_argument("--powtorzenia", type=int, default=POWTORZENIA)
+    parser.add_argument("--parser", help="parser HTML (selectolax, lxml, html.parser); domyślnie jak w ceneo")
+    parser.add_argument("--wyjscie", help="plik JSON na wyniki; domyślnie benchmarki/wyniki/<data>.json")
+    parser.add_argument("--porownaj", help="plik JSON z wcześniejszymi wynikami do porównania")
+    parser.add_argument("--tolerancja", type=float, default=TOLERANCJA, help="dopuszczalny względny spadek przepustowości")
+    parser.add_argument("--awarie", type=float, default=0.0, help="udział zapytań, na które serwer odpowiada błędem 500/503")
+    parser.add_argument("--limit-rownoleglych", type=int, help="liczba równoległych zapytań, powyżej której serwer odpowiada 429")
+    argumenty = parser.parse_args()
+
+    wyniki = {
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "system": platform.platform(),
+        "powtorzenia": argumenty.powtorzenia,
+        "awarie": argumenty.awarie,
+        "limit_rownoleglych": argumenty.limit_rownoleglych,
+        "produkty": {},
+    }
+    with SerwerStron(awarie=argumenty.awarie, limit_rownoleglych=argumenty.limit_rownoleglych) as serwer:
+        # Zmienne środowiskowe są dziedziczone przez procesy pomiarowe
+        os.environ["CENEO_ADRES"] = serwer.adres
+        os.environ["CENEO_PAMIEC"] = ""
+        if argumenty.parser:
+            os.environ["CENEO_PARSER"] = argumenty.parser
+        kontekst = multiprocessing.get_context("spawn")
+        produkty = [(nazwa, nazwa) for nazwa in argumenty.nagrane]
+        for rozmiar in argumenty.rozmiary:
+            ean = f"benchmark-{rozmiar}"
+            przygotuj_strony(ean, rozmiar)
+            produkty.append((str(rozmiar), ean))
+        for klucz, ean in produkty:
+            with kontekst.Pool(1) as pula:
+                produkt = pula.apply(zmierz_produkt, (ean, argumenty.powtorzenia))
+            wyniki["produkty"][klucz] = produkt
+            print(f"{klucz} ({produkt['opinie']} opinii, {produkt['strony']} stron, parser {produkt['parser']}, "
+                  f"szczytowy RSS {produkt['szczytowy_rss_mb']:.0f} MB)")
+            for etap, wynik in produkt["etapy"].items():
+                print(f"    {etap:<14} {wynik['przepustowosc']:10.1f} {wynik['jednostka']:<9} "
+                      f"p50 {wynik['p50_ms']:8.2f} ms  p90 {wynik['p90_ms']:8.2f} ms  p99 {wynik['p99_ms']:8.2f} ms")
+        wyniki["odpowiedzi_serwera"] = {str(kod): liczba for kod, liczba in sorted(serwer.odpowiedzi.items())}
+        print(f"Odpowiedzi serwera: {wyniki['odpowiedzi_serwera']}")
+
+    wyjscie = argumenty.wyjscie or os.path.join(KATALOG_WYNIKOW, f"benchmark-{wyniki['data'].replace(':', '')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(wyjscie)), exist_ok=True)
+    with open(wyjscie, "w", encoding="utf-8") as f:
+        json.dump(wyniki, f, indent=4)
+    print(f"Zapisano wyniki: {wyjscie}")
+
+    if argumenty.porownaj:
+        with open(argumenty.porownaj, "r", encoding="utf-8") as f:
+            regresje = porownaj(wyniki, json.load(f), argumenty.tolerancja)
+        for regresja in regresje:
+            print(f"REGRESJA: {regresja}", file=sys.stderr)
+        if regresje:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
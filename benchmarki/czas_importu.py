@@ -0,0 +1,112 @@
+"""
+Pomiar czasu importu modułów projektu na podstawie raportu python -X importtime.
+
+Uruchomienie z katalogu głównego projektu:
+
+    python benchmarki/czas_importu.py                 # pomiar i porównanie z wzorcem
+    python benchmarki/czas_importu.py --zapisz        # zapis bieżących wyników jako wzorca
+
+Skrypt kończy się kodem 1, gdy import trwa dłużej niż wzorzec powiększony
+o tolerancję albo gdy moduł wczytuje którąś z ciężkich bibliotek, które
+powinny być importowane dopiero w miejscu użycia.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+KATALOG_PROJEKTU = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Wzorzec jest śledzony w repozytorium, żeby każdy porównywał wyniki z tym samym punktem odniesienia
+DOMYSLNY_WZORZEC = os.path.join(KATALOG_PROJEKTU, "benchmarki", "czas_importu_wzorzec.json")
+
+# Mierzone moduły i biblioteki, których nie mogą wczytywać przy imporcie
+MODULY = {
+    "ceneo": ("bs4", "lxml", "selectolax", "requests", "numpy", "matplotlib", "pyarrow"),
+    "app": ("bs4", "lxml", "selectolax", "requests", "numpy", "matplotlib", "pyarrow"),
+    "magazyn": ("bs4", "requests", "numpy", "matplotlib", "pyarrow"),
+    "wsadowe": ("numpy", "matplotlib", "pyarrow"),
+}
+POWTORZENIA = 5
+TOLERANCJA = 0.25
+
+_WZORZEC_WIERSZA = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def zmierz(modul, powtorzenia=POWTORZENIA):
+    """
+    Importuje moduł w osobnym procesie z opcją -X importtime.
+
+    Args:
+        modul: Nazwa modułu.
+        powtorzenia: Liczba uruchomień; wynikiem jest mediana.
+
+    Returns:
+        Słownik z medianą czasu importu w milisekundach, listą
+        zaimportowanych modułów i najwolniejszymi importami.
+    """
+    czasy = []
+    for _ in range(powtorzenia):
+        wynik = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {modul}"],
+            cwd=KATALOG_PROJEKTU, capture_output=True, text=True, check=True,
+        )
+        wiersze = [_WZORZEC_WIERSZA.match(wiersz) for wiersz in wynik.stderr.splitlines()]
+        importy = [(dopasowanie.group(4), int(dopasowanie.group(1)), int(dopasowanie.group(2)), len(dopasowanie.group(3)))
+                   for dopasowanie in wiersze if dopasowanie]
+        czasy.append(next(lacznie for nazwa, _, lacznie, _ in importy if nazwa == modul))
+
+    najwolniejsze = sorted(importy, key=lambda wpis: wpis[1], reverse=True)[:10]
+    return {
+        "czas_ms": statistics.median(czasy) / 1000,
+        "moduly": sorted(nazwa for nazwa, *_ in importy),
+        "najwolniejsze": [{"modul": nazwa, "wlasny_ms": wlasny / 1000, "lacznie_ms": lacznie / 1000}
+                          for nazwa, wlasny, lacznie, _ in najwolniejsze],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Pomiar czasu importu modułów projektu.")
+    parser.add_argument("--zapisz", action="store_true", help="zapisz wyniki jako nowy wzorzec")
+    parser.add_argument("--wzorzec", default=DOMYSLNY_WZORZEC, help="plik JSON z wynikami wzorcowymi")
+    parser.add_argument("--powtorzenia", type=int, default=POWTORZENIA)
+    parser.add_argument("--tolerancja", type=float, default=TOLERANCJA, help="dopuszczalny względny wzrost czasu importu")
+    argumenty = parser.parse_args()
+
+    try:
+        with open(argumenty.wzorzec, "r", encoding="utf-8") as f:
+            wzorzec = json.load(f)
+    except FileNotFoundError:
+        wzorzec = {}
+
+    wyniki = {}
+    problemy = []
+    for modul, zakazane in MODULY.items():
+        wynik = zmierz(modul, argumenty.powtorzenia)
+        wyniki[modul] = {"czas_ms": wynik["czas_ms"]}
+        porownanie = ""
+        if modul in wzorzec:
+            poprzedni = wzorzec[modul]["czas_ms"]
+            porownanie = f" (wzorzec {poprzedni:.1f} ms, {wynik['czas_ms'] / poprzedni - 1:+.0%})"
+            if wynik["czas_ms"] > poprzedni * (1 + argumenty.tolerancja):
+                problemy.append(f"{modul}: import wolniejszy niż wzorzec{porownanie}")
+        print(f"{modul}: {wynik['czas_ms']:.1f} ms{porownanie}")
+        for wpis in wynik["najwolniejsze"][:5]:
+            print(f"    {wpis['modul']:<40} {wpis['wlasny_ms']:8.1f} ms  (łącznie {wpis['lacznie_ms']:.1f} ms)")
+        wczytane = sorted(nazwa for nazwa in zakazane if nazwa in wynik["moduly"])
+        if wczytane:
+            problemy.append(f"{modul}: przy imporcie wczytywane są {', '.join(wczytane)}")
+
+    if argumenty.zapisz:
+        os.makedirs(os.path.dirname(argumenty.wzorzec), exist_ok=True)
+        with open(argumenty.wzorzec, "w", encoding="utf-8") as f:
+            json.dump(wyniki, f, indent=4)
+            f.write("\n")
+        print(f"Zapisano wzorzec: {argumenty.wzorzec}")
+
+    for problem in problemy:
+        print(f"REGRESJA: {problem}", file=sys.stderr)
+    sys.exit(1 if problemy else 0)
+
+if __name__ == "__main__":
+    main()
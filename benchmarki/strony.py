@@ -0,0 +1,299 @@
+"""
+Strony z opiniami do testów wydajności bez dostępu do serwisu Ceneo.
+
+Strony są serwowane przez lokalny serwer HTTP pod adresami takimi jak
+w serwisie (/<ean> i /<ean>/opinie-<numer>) z plików <katalog>/<ean>/<numer>.html.
+Pierwszeństwo mają strony z katalogu benchmarki/nagrane/, śledzonego
+w repozytorium, więc każdy mierzy parsowanie na tych samych znacznikach.
+Strony zapisuje się tam poleceniem:
+
+    python benchmarki/strony.py --nagraj <ean> [--nazwa <nazwa>]
+
+które pobiera wszystkie strony z opiniami produktu i przed zapisem
+zastępuje nazwy autorów oraz adresy awatarów (anonimizuj).
+
+Produkty o zadanej liczbie opinii (np. 5000), których nie ma wśród stron
+nagranych, są generowane z ustalonym ziarnem losowania do nieśledzonego
+katalogu benchmarki/strony/; to zastępstwo pozwala mierzyć skalowanie,
+ale nie odwzorowuje dokładnie znaczników serwisu.
+
+Serwer potrafi też udawać przeciążony serwis: odpowiadać losowo błędami
+500/503, odmawiać kodem 429 ponad limit równoległych zapytań i podawać
+nagłówek Retry-After, co pozwala sprawdzić ponowienia i regulację
+współbieżności pobieracza bez dostępu do sieci.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+KATALOG_NAGRANYCH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nagrane")
+KATALOG_STRON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "strony")
+OPINII_NA_STRONIE = 10
+# Liczba kolejnych stron widocznych w pagerze, jak w serwisie
+OKNO_PAGERA = 5
+
+_SLOWA = ("bateria", "ekran", "dźwięk", "obudowa", "cena", "jakość", "wentylator", "głośny", "cichy", "szybki",
+          "wolny", "działa", "polecam", "nie", "bardzo", "dobry", "słaby", "wydajność", "ładowanie", "aparat",
+          "zdjęcia", "kolor", "wykonanie", "solidny", "lekki", "ciężki", "długo", "krótko", "zakup", "produkt")
+_CECHY = ("cena", "jakość wykonania", "bateria", "ekran", "głośność", "wydajność", "waga", "wygląd", "aparat", "dźwięk")
+_REKOMENDACJE = ("Polecam", "Nie polecam")
+
+def _opinia(los, ean, numer):
+    ocena = f"{los.randint(1, 10) / 2:g}".replace(".", ",")
+    miesiac, dzien = los.randint(1, 12), los.randint(1, 28)
+    potwierdzona = los.random() < 0.7
+    zakup = f'<time datetime="2023-{miesiac:02d}-{dzien:02d} 09:00:00">kupiono {los.randint(1, 30)} dni wcześniej</time>' if potwierdzona else ""
+    zalety = "".join(f'<div class="review-feature__item">{cecha}</div>' for cecha in los.sample(_CECHY, los.randint(0, 4)))
+    wady = "".join(f'<div class="review-feature__item">{cecha}</div>' for cecha in los.sample(_CECHY, los.randint(0, 3)))
+    tresc = " ".join(los.choice(_SLOWA) for _ in range(los.randint(5, 120)))
+    return (
+        f'<div class="user-post user-post__card js_product-review" data-entry-id="{ean}{numer:06d}">'
+        f'<div class="user-post__header"><span class="user-post__author-name">Użytkownik {numer}</span>'
+        f'<span class="user-post__author-recomendation"><em>{los.choice(_REKOMENDACJE)}</em></span></div>'
+        f'<div class="user-post__content"><span class="user-post__score-count">{ocena}/5</span>'
+        f'<span class="user-post__published"><time datetime="2024-{miesiac:02d}-{dzien:02d} 12:00:00">{los.randint(1, 11)} miesięcy temu</time>{zakup}</span>'
+        f'<div class="user-post__text">{tresc}</div>'
+        f'<div class="review-feature"><div class="review-feature__col">'
+        f'<div class="review-feature__title review-feature__title--positives">Zalety</div>{zalety}</div>'
+        f'<div class="review-feature__col"><div class="review-feature__title review-feature__title--negatives">Wady</div>{wady}</div></div>'
+        f'<button class="vote-yes js_product-review-vote js_vote-yes"><span>{los.randint(0, 200)}</span></button>'
+        f'<button class="vote-no js_product-review-vote js_vote-no"><span>{los.randint(0, 40)}</span></button>'
+        f'</div></div>'
+    )
+
+def _strona(los, ean, numer, liczba_stron, opinie):
+    pager = "".join(
+        f'<a class="pagination__item" href="/{ean}/opinie-{strona}">{strona}</a>'
+        for strona in range(2, min(liczba_stron, numer + OKNO_PAGERA) + 1)
+    )
+    # Nawigacja, skrypty i opisy, które w serwisie stanowią większość strony
+    otoczenie = "".join(f'<li class="cat-{i}"><a href="/kategoria-{i}">{los.choice(_SLOWA)}</a></li>' for i in range(400))
+    skrypt = "var dane = {" + ",".join(f'"k{i}": {i}' for i in range(1500)) + "};"
+    return (
+        f'<!DOCTYPE html><html lang="pl"><head><meta charset="utf-8"><title>Opinie {ean}</title>'
+        f'<script>{skrypt}</script></head><body><nav><ul>{otoczenie}</ul></nav>'
+        f'<div class="js_product-reviews">{"".join(opinie)}</div>'
+        f'<div class="pagination">{pager}</div><footer>{otoczenie}</footer></body></html>'
+    )
+
+def przygotuj_strony(ean, liczba_opinii, katalog=KATALOG_STRON):
+    """
+    Generuje strony z opiniami produktu, o ile nie ma ich jeszcze w katalogu.
+
+    Args:
+        ean: Kod produktu, pod którym strony będą serwowane.
+        liczba_opinii: Liczba opinii produktu.
+        katalog: Katalog ze stronami.
+
+    Returns:
+        Liczba stron produktu.
+    """
+    katalog_produktu = os.path.join(katalog, ean)
+    if os.path.isdir(katalog_produktu) and os.listdir(katalog_produktu):
+        return len(os.listdir(katalog_produktu))
+    os.makedirs(katalog_produktu, exist_ok=True)
+    los = random.Random(f"{ean}-{liczba_opinii}")
+    liczba_stron = max(1, -(-liczba_opinii // OPINII_NA_STRONIE))
+    for numer in range(1, liczba_stron + 1):
+        poczatek = (numer - 1) * OPINII_NA_STRONIE
+        opinie = [_opinia(los, ean, i) for i in range(poczatek, min(liczba_opinii, poczatek + OPINII_NA_STRONIE))]
+        with open(os.path.join(katalog_produktu, f"{numer}.html"), "w", encoding="utf-8") as f:
+            f.write(_strona(los, ean, numer, liczba_stron, opinie))
+    return liczba_stron
+
+def nagrane_produkty(katalog=KATALOG_NAGRANYCH):
+    """
+    Zwraca nazwy produktów ze stronami nagranymi z serwisu.
+
+    Args:
+        katalog: Katalog ze stronami nagranymi.
+
+    Returns:
+        Posortowana lista nazw katalogów produktów.
+    """
+    if not os.path.isdir(katalog):
+        return []
+    return sorted(nazwa for nazwa in os.listdir(katalog) if os.path.isfile(os.path.join(katalog, nazwa, "1.html")))
+
+_WZORZEC_AUTORA = re.compile(rb'(<span class="user-post__author-name">)(.*?)(</span>)', re.DOTALL)
+_WZORZEC_AWATARA = re.compile(rb'(<span class="user-post__author-avatar">\s*<img[^>]*?\ssrc=")[^"]*(")')
+
+def anonimizuj(html):
+    """
+    Usuwa ze strony dane pozwalające rozpoznać autorów opinii.
+
+    Nazwy autorów są zastępowane kolejnymi "Użytkownik <n>" (ta sama nazwa
+    na stronie dostaje ten sam numer), a adresy awatarów - pustym obrazkiem.
+    Reszta znaczników zostaje bez zmian, żeby parsowanie kosztowało tyle
+    samo co na stronie z serwisu.
+
+    Args:
+        html: Treść strony w postaci bajtów.
+
+    Returns:
+        Treść strony bez nazw autorów i awatarów.
+    """
+    numery = {}
+
+    def autor(dopasowanie):
+        numer = numery.setdefault(dopasowanie.group(2).strip(), len(numery) + 1)
+        return dopasowanie.group(1) + f"Użytkownik {numer}".encode() + dopasowanie.group(3)
+
+    html = _WZORZEC_AUTORA.sub(autor, html)
+    return _WZORZEC_AWATARA.sub(rb"\1data:,\2", html)
+
+def nagraj_strony(ean, nazwa=None, katalog=KATALOG_NAGRANYCH):
+    """
+    Pobiera z serwisu wszystkie strony z opiniami produktu i zapisuje je
+    po anonimizacji jako strony nagrane.
+
+    Args:
+        ean: Kod EAN produktu.
+        nazwa: Nazwa katalogu produktu; domyślnie kod EAN.
+        katalog: Katalog ze stronami nagranymi.
+
+    Returns:
+        Liczba zapisanych stron.
+    """
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import ceneo
+    from pobieranie import Pobieracz
+
+    katalog_produktu = os.path.join(katalog, nazwa or ean)
+    os.makedirs(katalog_produktu, exist_ok=True)
+    pobieracz = Pobieracz()
+    try:
+        liczba = 0
+        for liczba, html in enumerate(ceneo.strony_html(ceneo.adres_produktu(ean), pobieracz), 1):
+            with open(os.path.join(katalog_produktu, f"{liczba}.html"), "wb") as f:
+                f.write(anonimizuj(html))
+    finally:
+        pobieracz.zamknij()
+    return liczba
+
+class _ObslugaStron(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    katalogi = (KATALOG_NAGRANYCH, KATALOG_STRON)
+    serwer_stron = None
+
+    def log_message(self, format, *argumenty):
+        pass
+
+    def do_GET(self):
+        kod = self.serwer_stron._rozpocznij()
+        try:
+            if self.serwer_stron.opoznienie:
+                time.sleep(self.serwer_stron.opoznienie)
+            if kod is None:
+                kod = self._wyslij_strone()
+            else:
+                self._wyslij_blad(kod)
+        finally:
+            self.serwer_stron._zakoncz(kod)
+
+    def _wyslij_blad(self, kod):
+        self.send_response(kod)
+        if self.serwer_stron.retry_after is not None:
+            self.send_header("Retry-After", str(self.serwer_stron.retry_after))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _wyslij_strone(self):
+        dopasowanie = re.fullmatch(r"/([^/]+)(?:/opinie-(\d+))?", self.path)
+        if dopasowanie is None:
+            self.send_error(404)
+            return 404
+        ean, numer = dopasowanie.group(1), dopasowanie.group(2) or "1"
+        katalog = next((katalog for katalog in self.katalogi if os.path.isdir(os.path.join(katalog, ean))), self.katalogi[-1])
+        sciezka = os.path.join(katalog, ean, f"{numer}.html")
+        if not os.path.exists(sciezka):
+            # Serwis przekierowuje numer strony spoza zakresu na pierwszą stronę
+            sciezka = os.path.join(katalog, ean, "1.html")
+        try:
+            with open(sciezka, "rb") as f:
+                tresc = f.read()
+        except FileNotFoundError:
+            self.send_error(404)
+            return 404
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(tresc)))
+        self.end_headers()
+        self.wfile.write(tresc)
+        return 200
+
+class SerwerStron:
+    """
+    Lokalny serwer HTTP udający serwis Ceneo, działający w wątku w tle.
+
+    Args:
+        katalogi: Katalogi ze stronami; produkt jest szukany w nich po kolei.
+        awarie: Udział zapytań, na które serwer odpowiada losowo kodem 500 albo 503.
+        limit_rownoleglych: Liczba równoległych zapytań, powyżej której serwer
+            odpowiada kodem 429; None wyłącza limit.
+        retry_after: Wartość nagłówka Retry-After w odpowiedziach z błędem;
+            None pomija nagłówek.
+        opoznienie: Czas obsługi każdego zapytania w sekundach.
+        ziarno: Ziarno losowania awarii.
+
+    Attributes:
+        odpowiedzi: Licznik wysłanych odpowiedzi według kodu.
+        maks_rownoleglych: Największa zaobserwowana liczba równoległych zapytań.
+    """
+
+    def __init__(self, katalogi=(KATALOG_NAGRANYCH, KATALOG_STRON), awarie=0.0, limit_rownoleglych=None, retry_after=None, opoznienie=0.0, ziarno=0):
+        self.awarie = awarie
+        self.limit_rownoleglych = limit_rownoleglych
+        self.retry_after = retry_after
+        self.opoznienie = opoznienie
+        self.odpowiedzi = Counter()
+        self.maks_rownoleglych = 0
+        self._w_toku = 0
+        self._los = random.Random(ziarno)
+        self._blokada = threading.Lock()
+        obsluga = type("ObslugaStron", (_ObslugaStron,), {"katalogi": tuple(katalogi), "serwer_stron": self})
+        self._serwer = ThreadingHTTPServer(("127.0.0.1", 0), obsluga)
+        self._serwer.daemon_threads = True
+        self.adres = f"http://127.0.0.1:{self._serwer.server_address[1]}"
+
+    def _rozpocznij(self):
+        # Zwraca kod błędu, którym trzeba odpowiedzieć, albo None dla zwykłej strony
+        with self._blokada:
+            self._w_toku += 1
+            self.maks_rownoleglych = max(self.maks_rownoleglych, self._w_toku)
+            if self.limit_rownoleglych is not None and self._w_toku > self.limit_rownoleglych:
+                return 429
+            if self.awarie and self._los.random() < self.awarie:
+                return self._los.choice((500, 503))
+        return None
+
+    def _zakoncz(self, kod):
+        with self._blokada:
+            self._w_toku -= 1
+            self.odpowiedzi[kod] += 1
+
+    def __enter__(self):
+        threading.Thread(target=self._serwer.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, typ, wartosc, slad):
+        self._serwer.shutdown()
+        self._serwer.server_close()
+        return False
+
+def main():
+    parser = argparse.ArgumentParser(description="Nagrywanie stron z opiniami produktu do testów wydajności.")
+    parser.add_argument("--nagraj", required=True, metavar="EAN", help="kod EAN produktu do nagrania")
+    parser.add_argument("--nazwa", help="nazwa katalogu produktu; domyślnie kod EAN")
+    argumenty = parser.parse_args()
+    liczba = nagraj_strony(argumenty.nagraj, argumenty.nazwa)
+    print(f"Zapisano stron: {liczba} ({os.path.join(KATALOG_NAGRANYCH, argumenty.nazwa or argumenty.nagraj)})")
+
+if __name__ == "__main__":
+    main()
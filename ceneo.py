@@ -1,259 +1,918 @@
-from bs4 import BeautifulSoup
-import requests
+import hashlib
+import importlib.util
+import os
 import json
 import csv
+import io
 from collections import Counter
 from fractions import Fraction
+from functools import lru_cache
+import datetime
 import re
-import matplotlib.pyplot as plt
+from metryki import etap, rejestr
 
-def pobierz_opinie(url):
+# Odnośniki pagera mają postać /<id produktu>/opinie-<numer strony>
+_WZORZEC_STRONY = re.compile(rb"/opinie-(\d+)")
+_WZORZEC_ID_OPINII = re.compile(rb'data-entry-id="([^"]+)"')
+_WZORZEC_DATY = re.compile(rb'<time[^>]*\sdatetime="([^"]+)"')
+
+# Adres serwisu; zmienna środowiskowa pozwala podstawić np. lokalny serwer testowy
+ADRES_CENEO = os.environ.get("CENEO_ADRES", "https://www.ceneo.pl")
+
+# Procesy puli (wsadowe.py, archiwum.py) mają własne rejestry metryk, więc opinie wyodrębnione w nich dolicza
+# proces wywołujący; czasy etapów parsowania i wyodrębniania z tych procesów nie trafiają do /metrics
+WYODREBNIONE = rejestr.licznik("ceneo_wyodrebnione_opinie_total", "Liczba opinii wyodrębnionych ze stron.")
+
+def adres_produktu(ean):
+    """
+    Zwraca adres pierwszej strony z opiniami produktu.
+
+    Args:
+        ean: Kod EAN produktu.
+
+    Returns:
+        Adres URL strony produktu w serwisie Ceneo.
+    """
+    return f"{ADRES_CENEO}/{ean}"
+
+def pobierz_opinie(url, pobieracz=None):
     """
     Pobiera opinie z podanego adresu URL.
 
     Args:
         url: Adres URL strony z opiniami.
+        pobieracz: Obiekt Pobieracz; domyślnie współdzielony pobieracz modułu.
+
+    Returns:
+        Lista elementów z opiniami w postaci zwracanej przez aktywny parser
+        (dla BeautifulSoup są to obiekty Tag).
+    """
+    parser = _aktywny_parser()
+    html = _pobieracz(pobieracz).pobierz(url)
+    with etap("parsowanie"):
+        return parser.opinie(parser.parsuj(html))
+
+def opinie_ze_strony(html):
+    """
+    Wyodrębnia opinie z treści pobranej strony.
+
+    Drzewo dokumentu jest zwalniane zaraz po wyodrębnieniu danych, więc
+    w pamięci zostają wyłącznie obiekty Opinia.
+
+    Args:
+        html: Treść strony w postaci bajtów.
 
     Returns:
-        Lista elementów BeautifulSoup zawierających opinie.
+        Lista obiektów Opinia.
+    """
+    parser = _aktywny_parser()
+    with etap("parsowanie"):
+        dokument = parser.parsuj(html)
+        elementy = parser.opinie(dokument)
+    try:
+        with etap("wyodrebnianie"):
+            opinie = [wyodrebnij_opinie(opinia) for opinia in elementy]
+        WYODREBNIONE.zwieksz(len(opinie))
+        return opinie
+    finally:
+        parser.zwolnij(dokument)
+
+class _ParserBeautifulSoup:
     """
-    response = requests.get(url)
-    soup = BeautifulSoup(response.content, "html.parser")
-    opinie = soup.find_all("div", class_="user-post user-post__card js_product-review")
-    return opinie
+    Parser oparty na BeautifulSoup ("html.parser" albo "lxml").
+
+    Dzięki SoupStrainer budowane są wyłącznie poddrzewa opinii, a reszta
+    dokumentu jest pomijana już podczas parsowania.
+    """
+
+    _KLASA_OPINII = "user-post user-post__card js_product-review"
+
+    def __init__(self, nazwa):
+        from bs4 import BeautifulSoup, SoupStrainer
+        self.nazwa = nazwa
+        self._beautiful_soup = BeautifulSoup
+        self._tylko_opinie = SoupStrainer("div", class_=self._KLASA_OPINII)
 
-def ekstrakcja_opinii_po_ean(ean, zapisz_wykresy=False):
+    def parsuj(self, html):
+        return self._beautiful_soup(html, self.nazwa, parse_only=self._tylko_opinie)
+
+    def opinie(self, dokument):
+        return dokument.find_all("div", class_=self._KLASA_OPINII)
+
+    def zwolnij(self, dokument):
+        # Drzewo BeautifulSoup ma cykliczne referencje, decompose() zwalnia je od razu
+        dokument.decompose()
+
+    def elementy(self, opinia):
+        for element in opinia.descendants:
+            if element.name is not None:
+                yield element.name, element.get("class", ()), element
+
+    @staticmethod
+    def tekst(element):
+        return element.get_text().strip()
+
+    @staticmethod
+    def atrybut(element, nazwa):
+        return element.get(nazwa)
+
+class _ParserSelectolax:
+    """
+    Parser oparty na selectolax (silnik Lexbor) i selektorach CSS.
+    """
+
+    nazwa = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self._parser_html = LexborHTMLParser
+
+    def parsuj(self, html):
+        return self._parser_html(html)
+
+    def opinie(self, dokument):
+        return dokument.css("div.user-post.user-post__card.js_product-review")
+
+    def zwolnij(self, dokument):
+        # Drzewo Lexbor jest zwalniane razem z obiektem dokumentu
+        pass
+
+    def elementy(self, opinia):
+        for element in opinia.traverse():
+            yield element.tag, (element.attributes.get("class") or "").split(), element
+
+    @staticmethod
+    def tekst(element):
+        return element.text().strip()
+
+    @staticmethod
+    def atrybut(element, nazwa):
+        if nazwa not in element.attributes:
+            return None
+        return element.attributes[nazwa] or ""
+
+# Kolejność preferencji przy automatycznym wyborze parsera
+PARSERY = ("selectolax", "lxml", "html.parser")
+
+def ustaw_parser(nazwa=None):
+    """
+    Wybiera parser HTML używany do wyodrębniania opinii.
+
+    Args:
+        nazwa: "selectolax", "lxml" albo "html.parser". Domyślnie wartość
+            zmiennej środowiskowej CENEO_PARSER, a gdy jej brak - pierwszy
+            dostępny parser z PARSERY.
+
+    Returns:
+        Nazwa wybranego parsera.
+    """
+    global _parser
+    nazwa = nazwa or os.environ.get("CENEO_PARSER")
+    if nazwa is None:
+        nazwa = next(kandydat for kandydat in PARSERY if kandydat == "html.parser" or importlib.util.find_spec(kandydat))
+    if nazwa == "selectolax":
+        _parser = _ParserSelectolax()
+    elif nazwa in ("lxml", "html.parser"):
+        _parser = _ParserBeautifulSoup(nazwa)
+    else:
+        raise ValueError(f"Nieznany parser HTML: {nazwa}")
+    return nazwa
+
+# Parser jest tworzony przy pierwszym użyciu, żeby import modułu nie wczytywał bibliotek HTML
+_parser = None
+
+def _aktywny_parser():
+    if _parser is None:
+        ustaw_parser()
+    return _parser
+
+def _pobieracz(pobieracz):
+    # Domyślny pobieracz (a z nim requests) jest wczytywany dopiero przy pierwszym pobraniu
+    if pobieracz is None:
+        from pobieranie import domyslny_pobieracz
+        pobieracz = domyslny_pobieracz()
+    return pobieracz
+
+def _liczba_stron(html):
+    """
+    Odczytuje numer ostatniej strony widocznej w pagerze.
+
+    Args:
+        html: Treść strony z opiniami.
+
+    Returns:
+        Najwyższy numer strony z pagera (co najmniej 1).
+    """
+    return max((int(numer) for numer in _WZORZEC_STRONY.findall(html)), default=1)
+
+def _id_opinii(html):
+    """
+    Odczytuje identyfikatory opinii bez parsowania całej strony.
+
+    Args:
+        html: Treść strony z opiniami.
+
+    Returns:
+        Zbiór identyfikatorów (data-entry-id) opinii na stronie.
+    """
+    return {identyfikator.decode() for identyfikator in _WZORZEC_ID_OPINII.findall(html)}
+
+def _najnowsza_data(html):
+    """
+    Odczytuje najnowszą datę z atrybutów datetime na stronie.
+
+    Args:
+        html: Treść strony z opiniami.
+
+    Returns:
+        Najnowsza data w postaci tekstu (np. "2024-01-15 10:00:00") albo None.
+    """
+    return max((data.decode() for data in _WZORZEC_DATY.findall(html)), default=None)
+
+def strony_html(url, pobieracz=None):
+    """
+    Generator kolejnych stron z opiniami produktu.
+
+    Każda strona jest pobierana dokładnie raz. Ostatnia strona jest ustalana
+    z pagera, a gdy pager pokazuje tylko część stron, zakres jest rozszerzany
+    na podstawie pagera kolejnych stron. Ceneo dla numeru spoza zakresu zwraca
+    pierwszą stronę, dlatego strona bez nowych identyfikatorów opinii również
+    kończy przeglądanie.
+
+    Args:
+        url: Adres URL pierwszej strony z opiniami.
+        pobieracz: Obiekt Pobieracz; domyślnie współdzielony pobieracz modułu.
+
+    Yields:
+        Treść kolejnych stron w postaci bajtów.
+    """
+    pobieracz = _pobieracz(pobieracz)
+    html = pobieracz.pobierz(url)
+    widziane = _id_opinii(html)
+    if not widziane:
+        return
+    yield html
+
+    pobrane_do = 1
+    ostatnia = _liczba_stron(html)
+    while ostatnia > pobrane_do:
+        adresy = [f"{url}/opinie-{numer}" for numer in range(pobrane_do + 1, ostatnia + 1)]
+        pobrane_do = ostatnia
+        for _, html in pobieracz.pobierz_wiele(adresy):
+            identyfikatory = _id_opinii(html)
+            if identyfikatory <= widziane:
+                return
+            widziane |= identyfikatory
+            ostatnia = max(ostatnia, _liczba_stron(html))
+            yield html
+
+def nowe_strony_html(url, znane, najnowsza_data=None, pobieracz=None):
+    """
+    Generator stron z opiniami nowszymi niż zapisane przy poprzednim pobraniu.
+
+    Strony są pobierane po kolei, od najnowszych opinii. Przeglądanie kończy
+    się na pierwszej stronie, na której pojawia się znana już opinia albo
+    wszystkie daty są nie nowsze niż najnowsza zapisana data.
+
+    Args:
+        url: Adres URL pierwszej strony z opiniami.
+        znane: Zbiór identyfikatorów opinii zapisanych wcześniej.
+        najnowsza_data: Najnowsza data zapisana przy poprzednim pobraniu.
+        pobieracz: Obiekt Pobieracz; domyślnie współdzielony pobieracz modułu.
+
+    Yields:
+        Treść kolejnych stron w postaci bajtów.
+    """
+    pobieracz = _pobieracz(pobieracz)
+    widziane = set()
+    numer = 1
+    ostatnia = 1
+    while numer <= ostatnia:
+        html = pobieracz.pobierz(url if numer == 1 else f"{url}/opinie-{numer}")
+        identyfikatory = _id_opinii(html)
+        if identyfikatory <= widziane:
+            return
+        widziane |= identyfikatory
+        yield html
+
+        data = _najnowsza_data(html)
+        if identyfikatory & znane or (najnowsza_data and data and data <= najnowsza_data):
+            return
+        ostatnia = max(ostatnia, _liczba_stron(html))
+        numer += 1
+
+def strony_opinii(url, pobieracz=None):
+    """
+    Generator opinii pogrupowanych według stron.
+
+    Args:
+        url: Adres URL pierwszej strony z opiniami.
+        pobieracz: Obiekt Pobieracz; domyślnie współdzielony pobieracz modułu.
+
+    Yields:
+        Listy obiektów Opinia z kolejnych stron.
+    """
+    for html in strony_html(url, pobieracz):
+        yield opinie_ze_strony(html)
+
+def strumien_opinii(url, pobieracz=None):
+    """
+    Generator pojedynczych opinii ze wszystkich stron produktu.
+
+    W pamięci jest naraz co najwyżej kilka stron w toku pobierania
+    i opinie z jednej strony, niezależnie od liczby opinii produktu.
+
+    Args:
+        url: Adres URL pierwszej strony z opiniami.
+        pobieracz: Obiekt Pobieracz; domyślnie współdzielony pobieracz modułu.
+
+    Yields:
+        Obiekty Opinia.
+    """
+    for strona in strony_opinii(url, pobieracz):
+        yield from strona
+
+def pobierz_wszystkie_opinie(url, pobieracz=None):
+    """
+    Pobiera opinie ze wszystkich stron produktu.
+
+    Args:
+        url: Adres URL pierwszej strony z opiniami.
+        pobieracz: Obiekt Pobieracz; domyślnie współdzielony pobieracz modułu.
+
+    Returns:
+        Lista obiektów Opinia.
+    """
+    return list(strumien_opinii(url, pobieracz))
+
+def ekstrakcja_opinii_po_ean(ean, zapisz_wykresy=False, pobieracz=None, przyrostowo=False, postep=None):
     """
     Ekstrahuje opinie na podstawie kodu EAN.
 
     Args:
         ean: Kod EAN produktu.
+        zapisz_wykresy: Czy zapisać wykresy z analizy statystycznej do plików
+            w bieżącym katalogu (zapisz_wykresy_produktu).
+        pobieracz: Obiekt Pobieracz z własnym limitem połączeń i zapytań.
+        przyrostowo: Czy pobrać tylko opinie nowsze niż przy poprzednim
+            pobraniu i dołączyć je do zapisanych.
+        postep: Funkcja wywoływana po każdej stronie z liczbą przetworzonych
+            dotąd stron i opinii.
 
     Returns:
-        Lista opinii na temat produktu.
-    """
-    url = f"https://www.ceneo.pl/{ean}"
-    opinie = pobierz_opinie(url)
-
-    # Iterowanie po stronach do momentu powtórzenia pierwszej strony
-    liczba_stron = 1
-    while opinie:
-        liczba_stron += 1
-        opinie.extend(pobierz_opinie(f"{url}/opinie-{liczba_stron}"))
-        if opinie == pobierz_opinie(url):
-            break
-    
+        Lista obiektów Opinia albo None, gdy produkt nie ma opinii.
+    """
+    parsuj = None
+    if postep is not None:
+        liczniki = {"strony": 0, "opinie": 0}
+
+        def parsuj(html):
+            opinie_strony = opinie_ze_strony(html)
+            liczniki["strony"] += 1
+            liczniki["opinie"] += len(opinie_strony)
+            postep(liczniki["strony"], liczniki["opinie"])
+            return opinie_strony
+
+    opinie = aktualizuj_opinie(ean, pobieracz, tylko_nowe=przyrostowo, parsuj=parsuj)
+
     if opinie:
-        zapisz_do_json(opinie, "opinie.json")
         if zapisz_wykresy:
             wyniki_analizy = _analiza_statystyczna(opinie)
             if isinstance(wyniki_analizy, dict):
                 oceny = wyniki_analizy.get("średnia_ocena")
                 dystrybucja_ocen = wyniki_analizy.get("dystrybucja_ocen")
-                wyswietl_wykresy(oceny, dystrybucja_ocen)
+                zapisz_wykresy_produktu(ean, oceny, dystrybucja_ocen)
         return opinie
     else:
         return None
 
+def aktualizuj_opinie(ean, pobieracz=None, tylko_nowe=True, parsuj=None, magazyn=None):
+    """
+    Pobiera opinie produktu i zapisuje je w magazynie.
+
+    Args:
+        ean: Kod EAN produktu.
+        pobieracz: Obiekt Pobieracz; domyślnie współdzielony pobieracz modułu.
+        tylko_nowe: Czy pobrać tylko opinie nowsze niż zapisane i dołączyć je
+            do zapisanych. Bez zapisanych opinii pobierane są wszystkie strony.
+        parsuj: Funkcja zamieniająca treść strony na listę obiektów Opinia;
+            domyślnie opinie_ze_strony.
+        magazyn: Obiekt Magazyn; domyślnie współdzielony magazyn.
+
+    Returns:
+        Lista wszystkich zapisanych obiektów Opinia produktu, od najnowszej.
+
+    Raises:
+        requests.RequestException: Gdy nie udało się pobrać którejś ze stron;
+            zapisane wcześniej opinie pozostają wtedy bez zmian.
+    """
+    if magazyn is None:
+        # Import na miejscu, bo magazyn korzysta z klasy Opinia z tego modułu
+        from magazyn import domyslny_magazyn
+        magazyn = domyslny_magazyn()
+    parsuj = parsuj or opinie_ze_strony
+    url = adres_produktu(ean)
+    znane, najnowsza_data = magazyn.stan(ean) if tylko_nowe else (set(), None)
+    if znane:
+        strony = nowe_strony_html(url, znane, najnowsza_data, pobieracz)
+    else:
+        strony = strony_html(url, pobieracz)
+
+    nowe = []
+    # Opinia przesunięta między pobraniem kolejnych stron pojawia się na nich dwukrotnie
+    pominiete = set(znane)
+    for html in strony:
+        for opinia in parsuj(html):
+            if opinia.id_opinii not in pominiete:
+                pominiete.add(opinia.id_opinii)
+                nowe.append(opinia)
+        data = _najnowsza_data(html)
+        if data and (najnowsza_data is None or data > najnowsza_data):
+            najnowsza_data = data
+
+    # Magazyn jest zmieniany dopiero po pobraniu wszystkich stron: błąd pobierania przerywa pętlę wyjątkiem,
+    # zanim zapisz_opinie zastąpi zapisane opinie niepełnym zestawem
+    if nowe and znane:
+        magazyn.dodaj_opinie(ean, nowe, najnowsza_data)
+    elif nowe:
+        magazyn.zapisz_opinie(ean, nowe, najnowsza_data)
+    return magazyn.opinie(ean)
+
+def ekstrakcja_strumieniowa(ean, nazwa_pliku, format="jsonl", zapisz_wykresy=False, pobieracz=None):
+    """
+    Ekstrahuje opinie na podstawie kodu EAN, zapisując je na bieżąco do pliku.
+
+    Opinie trafiają do pliku pojedynczo, zaraz po wyodrębnieniu ze strony,
+    więc zużycie pamięci nie zależy od liczby opinii produktu.
+
+    Args:
+        ean: Kod EAN produktu.
+        nazwa_pliku: Nazwa pliku wynikowego.
+        format: "jsonl", "json" albo "csv".
+        zapisz_wykresy: Czy zapisać wykresy z analizy statystycznej do plików
+            w bieżącym katalogu (zapisz_wykresy_produktu).
+        pobieracz: Obiekt Pobieracz z własnym limitem połączeń i zapytań.
+
+    Returns:
+        Liczba zapisanych opinii.
+    """
+    zapisz = ZAPIS[format]
+    url = adres_produktu(ean)
+    dystrybucja_ocen = Counter()
+    liczba = zapisz(_zliczaj_oceny(strumien_opinii(url, pobieracz), dystrybucja_ocen), nazwa_pliku)
+
+    if zapisz_wykresy:
+        wyniki_analizy = _wyniki_analizy(dystrybucja_ocen)
+        if isinstance(wyniki_analizy, dict):
+            zapisz_wykresy_produktu(ean, wyniki_analizy["średnia_ocena"], wyniki_analizy["dystrybucja_ocen"])
+    return liczba
+
+@etap("zapis_json")
 def zapisz_do_json(opinie, nazwa_pliku):
     """
     Zapisuje opinie do pliku JSON.
 
+    Opinie są zapisywane pojedynczo, w miarę odczytywania ich z kolekcji,
+    więc można tu przekazać także generator.
+
     Args:
-        opinie: Lista opinii w formacie BeautifulSoup.
+        opinie: Obiekty Opinia (lub elementy BeautifulSoup, lub słowniki).
         nazwa_pliku: Nazwa pliku JSON.
+
+    Returns:
+        Liczba zapisanych opinii.
     """
+    opinie = _Policzone(opinie)
     with open(nazwa_pliku, "w", encoding="utf-8") as f:
-        json.dump([_konwertuj_do_json(opinia) for opinia in opinie], f, indent=4)
+        f.writelines(fragmenty_json(opinie))
+    return opinie.liczba
 
-def _konwertuj_do_json(opinia):
+@etap("zapis_jsonl")
+def zapisz_do_jsonl(opinie, nazwa_pliku):
     """
-    Konwertuje obiekt Tag do formatu JSON.
+    Zapisuje opinie do pliku JSON Lines (jedna opinia w wierszu).
 
     Args:
-        opinia: Obiekt BeautifulSoup Tag.
+        opinie: Obiekty Opinia (lub elementy BeautifulSoup, lub słowniki).
+        nazwa_pliku: Nazwa pliku JSONL.
 
     Returns:
-        Słownik JSON z danymi z opinii.
+        Liczba zapisanych opinii.
     """
-    id_opinii_element = opinia.get("data-entry-id")
-    id_opinii = id_opinii_element if id_opinii_element else "Brak ID"
+    opinie = _Policzone(opinie)
+    with open(nazwa_pliku, "w", encoding="utf-8") as f:
+        f.writelines(fragmenty_jsonl(opinie))
+    return opinie.liczba
 
-    autor_element = opinia.find("span", class_="user-post__author-name")
-    autor = autor_element.text.strip() if autor_element else "Brak autora"
+def fragmenty_json(opinie):
+    """
+    Zamienia opinie na kolejne fragmenty tekstu dokumentu JSON (lista opinii).
 
-    rekomendacja_element = opinia.find("span", class_="user-post__author-recomendation")
-    rekomendacja = rekomendacja_element.text.strip() if rekomendacja_element else "Brak rekomendacji"
+    Każda opinia jest serializowana osobno, więc ani opinie, ani cały
+    dokument nie muszą naraz mieścić się w pamięci.
 
-    gwiazdki_element = opinia.find("span", class_="user-post__score-count")
-    gwiazdki = gwiazdki_element.text.strip() if gwiazdki_element else "Brak gwiazdek"
-    
-    data_wystawienia_element = opinia.find_all("time", {"datetime": True})
-    data_wystawienia = data_wystawienia_element[0].text.strip() if data_wystawienia_element else "Brak danych"
+    Args:
+        opinie: Obiekty Opinia (lub elementy BeautifulSoup, lub słowniki).
 
-    czas_od_zakupu = "Brak danych"
-    if len(data_wystawienia_element) > 1:
-        czas_od_zakupu = data_wystawienia_element[1].text.strip()
+    Yields:
+        Napisy, których złączenie daje dokument JSON.
+    """
+    pierwsza = True
+    yield "["
+    for opinia in opinie:
+        # Wcięcie jak przy json.dump(lista, indent=4)
+        yield ("\n    " if pierwsza else ",\n    ") + json.dumps(_jako_opinia(opinia).do_slownika(daty=False), indent=4).replace("\n", "\n    ")
+        pierwsza = False
+    yield "]" if pierwsza else "\n]"
 
-    potwierdzony_zakup = "Nie zakupiono"
-    if czas_od_zakupu != "Brak danych":
-        potwierdzony_zakup = "Potwierdzone zakupem"
+def fragmenty_jsonl(opinie):
+    """
+    Zamienia opinie na wiersze JSON Lines.
 
-    pomocna_element = opinia.find("button", class_="vote-yes js_product-review-vote js_vote-yes")
-    pomocna = pomocna_element.text.strip() if pomocna_element else "Brak danych"
+    Args:
+        opinie: Obiekty Opinia (lub elementy BeautifulSoup, lub słowniki).
+
+    Yields:
+        Wiersze z jedną opinią każdy, zakończone znakiem nowego wiersza.
+    """
+    for opinia in opinie:
+        yield json.dumps(_jako_opinia(opinia).do_slownika(daty=False), ensure_ascii=False) + "\n"
 
-    nie_pomocna_element = opinia.find("button", class_="vote-no js_product-review-vote js_vote-no")
-    nie_pomocna = nie_pomocna_element.text.strip() if nie_pomocna_element else "Brak danych"
+class _Policzone:
+    """
+    Kolekcja przekazująca elementy dalej i liczącą je w trakcie przeglądania.
+    """
 
-    tresc_element = opinia.find("div", class_="user-post__text")
-    tresc = tresc_element.text.strip() if tresc_element else "Brak treści"
+    def __init__(self, elementy):
+        self.elementy = elementy
+        self.liczba = 0
 
-    wady_element = opinia.find("div", class_="review-feature__title--negatives")
-    wady = []
-    if wady_element:
-        wady = [wada.text.strip() for wada in wady_element.find_next_sibling("div", class_="review-feature__item")]
+    def __iter__(self):
+        for element in self.elementy:
+            self.liczba += 1
+            yield element
+
+def _konwertuj_do_json(opinia):
+    """
+    Konwertuje obiekt Tag do formatu JSON.
 
-    zalety_element = opinia.find("div", class_="review-feature__title--positives")
+    Args:
+        opinia: Obiekt BeautifulSoup Tag.
+
+    Returns:
+        Słownik JSON z danymi z opinii.
+    """
+    return wyodrebnij_opinie(opinia).do_slownika(daty=False)
+
+# Klasy elementów opinii odpowiadające polom obiektu Opinia
+_POLA_OPINII = {
+    "user-post__author-name": "autor",
+    "user-post__author-recomendation": "rekomendacja",
+    "user-post__score-count": "gwiazdki",
+    "user-post__text": "tresc",
+    "vote-yes": "pomocna",
+    "vote-no": "nie_pomocna",
+}
+
+def wyodrebnij_opinie(opinia):
+    """
+    Wyodrębnia dane z elementu opinii w jednym przejściu po jego drzewie.
+
+    Args:
+        opinia: Element z opinią w postaci zwracanej przez aktywny parser.
+
+    Returns:
+        Obiekt Opinia.
+    """
+    parser = _aktywny_parser()
+    pola = {}
+    czasy = []
+    daty = []
+    wady = []
     zalety = []
-    if zalety_element:
-        zalety = [zaleta.text.strip() for zaleta in zalety_element.find_next_sibling("div", class_="review-feature__item")]
+    cechy = None
+
+    for nazwa, klasy, element in parser.elementy(opinia):
+        if nazwa == "time":
+            data = parser.atrybut(element, "datetime")
+            if data is not None:
+                czasy.append(parser.tekst(element))
+                daty.append(data or None)
+            continue
+        for klasa in klasy:
+            if klasa in _POLA_OPINII:
+                # Jak przy find(): liczy się pierwszy pasujący element
+                pola.setdefault(_POLA_OPINII[klasa], parser.tekst(element))
+                break
+            if klasa == "review-feature__title--positives":
+                cechy = zalety
+                break
+            if klasa == "review-feature__title--negatives":
+                cechy = wady
+                break
+            if klasa == "review-feature__item":
+                if cechy is not None:
+                    cechy.append(parser.tekst(element))
+                break
+
+    data_wystawienia = czasy[0] if czasy else "Brak danych"
+    czas_od_zakupu = czasy[1] if len(czasy) > 1 else "Brak danych"
+    potwierdzony_zakup = "Potwierdzone zakupem" if len(czasy) > 1 else "Nie zakupiono"
+
+    return Opinia(
+        parser.atrybut(opinia, "data-entry-id") or _zastepcze_id(pola.get("autor"), daty[0] if daty else None, pola.get("tresc")),
+        pola.get("autor") or "Brak autora",
+        pola.get("rekomendacja") or "Brak rekomendacji",
+        pola.get("gwiazdki") or "Brak gwiazdek",
+        potwierdzony_zakup,
+        data_wystawienia,
+        czas_od_zakupu,
+        pola.get("pomocna") or "Brak danych",
+        pola.get("nie_pomocna") or "Brak danych",
+        pola.get("tresc") or "Brak treści",
+        wady,
+        zalety,
+        daty[0] if daty else None,
+        daty[1] if len(daty) > 1 else None,
+    )
+
+def _zastepcze_id(autor, data, tresc):
+    """
+    Tworzy identyfikator opinii bez atrybutu data-entry-id.
 
-    return {
-        "id": id_opinii,
-        "autor": autor,
-        "rekomendacja": rekomendacja,
-        "gwiazdki": gwiazdki,
-        "data_wystawienia": data_wystawienia,
-        "czas_od_zakupu": czas_od_zakupu,
-        "potwierdzony_zakup": potwierdzony_zakup,
-        "pomocna": pomocna,
-        "nie_pomocna": nie_pomocna,
-        "tresc": tresc,
-        "wady": wady,
-        "zalety": zalety,
-    }
+    Identyfikator zależy tylko od autora, daty i treści, więc przy każdym
+    pobraniu jest ten sam, a różne opinie bez identyfikatora nie zlewają się
+    w magazynie w jedną.
+    """
+    skrot = hashlib.sha1("\0".join((autor or "", data or "", tresc or "")).encode("utf-8")).hexdigest()
+    return f"brak-id-{skrot[:16]}"
+
+def _jako_opinia(opinia):
+    """
+    Zamienia opinię w dowolnej obsługiwanej postaci na obiekt Opinia.
 
+    Args:
+        opinia: Obiekt Opinia, słownik w formacie JSON lub obiekt BeautifulSoup Tag.
+
+    Returns:
+        Obiekt Opinia.
+    """
+    if isinstance(opinia, Opinia):
+        return opinia
+    if isinstance(opinia, dict):
+        return Opinia.z_slownika(opinia)
+    return wyodrebnij_opinie(opinia)
+
+@etap("zapis_csv")
 def zapisz_do_csv(opinie, nazwa_pliku):
     """
     Zapisuje opinie do pliku CSV.
 
     Args:
-        opinie: Lista opinii w formacie BeautifulSoup.
+        opinie: Obiekty Opinia (lub elementy BeautifulSoup, lub słowniki).
         nazwa_pliku: Nazwa pliku CSV.
+
+    Returns:
+        Liczba zapisanych opinii.
     """
+    opinie = _Policzone(opinie)
     with open(nazwa_pliku, "w", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["ID", "Autor", "Rekomendacja", "Liczba gwiazdek", "Data wystawienia", "Czas od zakupu", "Potwierdzony zakup", "Pomocna", "Niepomocna", "Treść", "Wady", "Zalety"])
-        
-        # Pobranie danych z opinii
-        for opinia in opinie:
-            # Zabezpieczenie przed brakiem ID
-            id_opinii = opinia.get("data-entry-id", "Brak ID")
-
-            # Zabezpieczenie przed brakiem autora
-            autor_element = opinia.find("span", class_="user-post__author-name")
-            autor = autor_element.text.strip() if autor_element else "Brak autora"
-
-            # Zabezpieczenie przed brakiem rekomendacji
-            rekomendacja_element = opinia.find("span", class_="user-post__author-recomendation")
-            rekomendacja = rekomendacja_element.text.strip() if rekomendacja_element else "Brak rekomendacji"
-
-            # Zabezpieczenie przed brakiem gwiazdek
-            gwiazdki_element = opinia.find("span", class_="user-post__score-count")
-            gwiazdki = gwiazdki_element.text.strip() if gwiazdki_element else "Brak gwiazdek"
-
-            # Zabezpieczenie przed brakiem daty
-            data_element = opinia.find("span", class_="user-post__published")
-            data = data_element.text.strip() if data_element else "Brak daty"
-
-            # Zabezpieczenie przed brakiem daty wystawienia i czasu od zakupu
-            czas_od_zakupu_element = opinia.find_all("time", {"datetime": True})
-            data_wystawienia = "Brak danych"
-            czas_od_zakupu = "Brak danych"
-            if len(czas_od_zakupu_element) > 1:
-                data_wystawienia = czas_od_zakupu_element[0].text.strip()
-                czas_od_zakupu = czas_od_zakupu_element[1].text.strip()
-
-            # Potwierdzenie zakupu
-            potwierdzony_zakup = "Nie zakupiono"
-            if czas_od_zakupu != "Brak danych":
-                potwierdzony_zakup = "Potwierdzone zakupem"
-
-            # Punktacja pomocna i niepomocna
-            pomocna_element = opinia.find("button", class_="vote-yes js_product-review-vote js_vote-yes")
-            pomocna = pomocna_element.text.strip() if pomocna_element else "Brak danych"
-            nie_pomocna_element = opinia.find("button", class_="vote-no js_product-review-vote js_vote-no")
-            nie_pomocna = nie_pomocna_element.text.strip() if nie_pomocna_element else "Brak danych"
-
-            # Zabezpieczenie przed brakiem treści
-            tresc_element = opinia.find("div", class_="user-post__text")
-            tresc = tresc_element.text.strip() if tresc_element else "Brak treści"
-
-            # Wady
-            wady_element = opinia.find("div", class_="review-feature__title--negatives")
-            wady = []
-            if wady_element:
-                for item in wady_element.find_all_next("div", class_="review-feature__item"):
-                    wady.append(item.text.strip())
-            wady_str = ", ".join(wady)
-
-            # Zalety
-            zalety_element = opinia.find("div", class_="review-feature__title--positives")
-            zalety = []
-            if zalety_element:
-                for item in zalety_element.find_all_next("div", class_="review-feature__item"):
-                    zalety.append(item.text.strip())
-            zalety_str = ", ".join(zalety)
-
-            writer.writerow([id_opinii, autor, rekomendacja, gwiazdki, data, data_wystawienia, czas_od_zakupu, potwierdzony_zakup, pomocna, nie_pomocna, tresc, wady_str, zalety_str])
-
-def _analiza_statystyczna(opinie):
+        f.writelines(fragmenty_csv(opinie))
+    return opinie.liczba
+
+def fragmenty_csv(opinie):
+    """
+    Zamienia opinie na kolejne wiersze pliku CSV, poprzedzone nagłówkiem.
+
+    Args:
+        opinie: Obiekty Opinia (lub elementy BeautifulSoup, lub słowniki).
+
+    Yields:
+        Wiersze CSV zakończone znakami końca wiersza jak przy csv.writer.
+    """
+    bufor = io.StringIO()
+    writer = csv.writer(bufor)
+    writer.writerow(NAGLOWKI_CSV)
+    for opinia in opinie:
+        yield bufor.getvalue()
+        bufor.seek(0)
+        bufor.truncate()
+        writer.writerow(_jako_opinia(opinia).do_wiersza())
+    yield bufor.getvalue()
+
+NAGLOWKI_CSV = ["ID", "Autor", "Rekomendacja", "Liczba gwiazdek", "Data wystawienia", "Czas od zakupu", "Potwierdzony zakup", "Pomocna", "Niepomocna", "Treść", "Wady", "Zalety"]
+
+_WZORZEC_OCENY = re.compile(r"\d+(?:[.,]\d+)?")
+# Okres w tekście typu "2 miesiące temu" albo "kupiono dzień wcześniej"
+_WZORZEC_OKRESU = re.compile(r"(\d+)?\s*(godzin|dzie|dni|tydz|tygod|miesi|rok|lat)", re.IGNORECASE)
+_DNI_W_JEDNOSTCE = {"godzin": 1 / 24, "dzie": 1, "dni": 1, "tydz": 7, "tygod": 7, "miesi": 30, "rok": 365, "lat": 365}
+
+@lru_cache(maxsize=256)
+def ocena_liczbowa(gwiazdki):
+    """
+    Zamienia ocenę w postaci tekstu (np. "4,5/5") na liczbę.
+
+    Args:
+        gwiazdki: Ocena w postaci tekstu.
+
+    Returns:
+        Ocena jako float albo None, gdy tekst nie zawiera oceny.
+    """
+    dopasowanie = _WZORZEC_OCENY.search(gwiazdki or "")
+    if dopasowanie is None:
+        return None
+    return float(Fraction(dopasowanie.group().replace(",", ".")))
+
+@lru_cache(maxsize=65536)
+def data_z_atrybutu(tekst):
+    """
+    Zamienia wartość atrybutu datetime (np. "2024-01-15 10:00:00") na datetime.
+
+    Args:
+        tekst: Wartość atrybutu albo None.
+
+    Returns:
+        Obiekt datetime.datetime albo None, gdy brak daty lub ma zły format.
+    """
+    if not tekst:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(tekst)
+    except ValueError:
+        return None
+
+@lru_cache(maxsize=1024)
+def okres(tekst):
+    """
+    Zamienia opis okresu ze strony (np. "2 miesiące temu") na timedelta.
+
+    Miesiąc liczony jest jako 30 dni, a rok jako 365 dni; słowo bez liczby
+    ("dzień", "miesiąc") oznacza jedną jednostkę.
+
+    Args:
+        tekst: Opis okresu.
+
+    Returns:
+        Obiekt datetime.timedelta albo None, gdy tekst nie zawiera okresu.
+    """
+    dopasowanie = _WZORZEC_OKRESU.search(tekst or "")
+    if dopasowanie is None:
+        return None
+    liczba, jednostka = dopasowanie.groups()
+    return datetime.timedelta(days=int(liczba or 1) * _DNI_W_JEDNOSTCE[jednostka.lower()])
+
+def liczba_glosow(tekst):
+    """
+    Zamienia liczbę głosów w postaci tekstu na int.
+
+    Args:
+        tekst: Liczba głosów w postaci tekstu.
+
+    Returns:
+        Liczba głosów (0, gdy brak danych).
+    """
+    return int(tekst) if tekst and tekst.isdigit() else 0
+
+def _analiza_statystyczna(opinie, bez_duplikatow=False):
     """
     Przeprowadza analizę statystyczną pobranych opinii.
 
     Args:
-        opinie: Lista opinii w formacie BeautifulSoup.
+        opinie: Obiekty Opinia (lub elementy BeautifulSoup, lub słowniki).
+        bez_duplikatow: Czy pominąć opinie oznaczone w magazynie jako kopie
+            innych opinii.
 
     Returns:
-        Słownik z wynikami analizy.
+        Słownik z wynikami analizy (średnia_ocena i dystrybucja_ocen oraz
+        pozostałe statystyki z statystyki.analiza) albo napis
+        "Brak ocen do analizy", gdy żadna opinia nie ma oceny.
+    """
+    # Import na miejscu, bo moduł statystyki korzysta z funkcji tego modułu
+    from statystyki import TabelaOpinii, analiza
+
+    opinie = (_jako_opinia(opinia) for opinia in opinie)
+    if bez_duplikatow:
+        opinie = (opinia for opinia in opinie if opinia.duplikat is None)
+    wynik = analiza(TabelaOpinii.z_opinii(opinie))
+    if not wynik["liczba_ocen"]:
+        return "Brak ocen do analizy"
+    wynik["średnia_ocena"] = wynik["srednia"]
+    wynik["dystrybucja_ocen"] = Counter(wynik["histogram"])
+    return wynik
+
+def _zliczaj_oceny(opinie, dystrybucja_ocen):
+    """
+    Przepuszcza opinie dalej, zliczając po drodze ich oceny.
+
+    Args:
+        opinie: Obiekty Opinia (lub elementy BeautifulSoup, lub słowniki).
+        dystrybucja_ocen: Counter uzupełniany o oceny kolejnych opinii.
+
+    Yields:
+        Obiekty Opinia.
+    """
+    for opinia in opinie:
+        opinia = _jako_opinia(opinia)
+        if opinia.ocena is not None:
+            dystrybucja_ocen[opinia.ocena] += 1
+        yield opinia
+
+def _wyniki_analizy(dystrybucja_ocen):
     """
+    Wylicza wyniki analizy statystycznej z dystrybucji ocen.
 
-    # Obliczanie średniej oceny
-    oceny = [float(Fraction(re.search(r'\d+(?:[.,]\d+)?', opinia.find("span", class_="user-post__score-count").text.replace(",", ".")).group())) for opinia in opinie]
-    if len(oceny) > 0:
-        średnia_ocena = sum(oceny) / len(oceny)
+    Args:
+        dystrybucja_ocen: Counter z liczbą opinii dla każdej oceny.
+
+    Returns:
+        Słownik z wynikami analizy.
+    """
+    liczba_ocen = sum(dystrybucja_ocen.values())
+    if liczba_ocen > 0:
+        średnia_ocena = sum(ocena * ilosc for ocena, ilosc in dystrybucja_ocen.items()) / liczba_ocen
     else:
         return "Brak ocen do analizy"
 
-    # Dystrybucja ocen
-    dystrybucja_ocen = Counter(oceny)
-
     return {
         "średnia_ocena": średnia_ocena,
         "dystrybucja_ocen": dystrybucja_ocen,
     }
 
-def wyswietl_wykresy(oceny, dystrybucja_ocen):
-    # Wykres średniej oceny
-    plt.figure(figsize=(8, 6))
-    plt.pie([oceny], labels=["Średnia ocena"], colors=['skyblue'], autopct='%1.1f%%', startangle=140)
-    plt.title("Średnia ocena")
-    plt.axis('equal')  # Equal aspect ratio to ensure that pie is drawn as a circle
-    plt.savefig('static/srednia_ocena.jpg')  # Zapisz wykres jako JPG
-    plt.close()  # Zamknij bieżący wykres
-
-    # Wykres dystrybucji ocen
-    plt.figure(figsize=(8, 6))
-    oceny = list(dystrybucja_ocen.keys())
-    ilosci = list(dystrybucja_ocen.values())
-    plt.bar(oceny, ilosci, color='lightgreen')
-    plt.title("Dystrybucja ocen")
-    plt.xlabel("Ocena")
-    plt.ylabel("Ilość opinii")
-    plt.xticks(range(1, 6))
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.savefig('static/dystrybucja_ocen.jpg')  # Zapisz wykres jako JPG
-    plt.close()  # Zamknij bieżący wykres
+@etap("zapis_parquet")
+def zapisz_do_parquet(opinie, nazwa_pliku):
+    """
+    Zapisuje opinie do pliku Parquet z kolumnami z typami (wymaga pyarrow).
+
+    Args:
+        opinie: Obiekty Opinia (lub elementy BeautifulSoup, lub słowniki).
+        nazwa_pliku: Nazwa pliku Parquet.
+
+    Returns:
+        Liczba zapisanych opinii.
+    """
+    # Import na miejscu, bo pyarrow jest zależnością opcjonalną
+    from kolumnowe import zapisz_kolumnowo
+    return zapisz_kolumnowo(opinie, nazwa_pliku, "parquet")
+
+@etap("zapis_arrow")
+def zapisz_do_arrow(opinie, nazwa_pliku):
+    """
+    Zapisuje opinie do pliku Arrow IPC z kolumnami z typami (wymaga pyarrow).
+
+    Args:
+        opinie: Obiekty Opinia (lub elementy BeautifulSoup, lub słowniki).
+        nazwa_pliku: Nazwa pliku Arrow.
+
+    Returns:
+        Liczba zapisanych opinii.
+    """
+    from kolumnowe import zapisz_kolumnowo
+    return zapisz_kolumnowo(opinie, nazwa_pliku, "arrow")
+
+# Funkcje zamieniające opinie na fragmenty tekstu według formatu (formaty tekstowe)
+FRAGMENTY = {
+    "json": fragmenty_json,
+    "jsonl": fragmenty_jsonl,
+    "csv": fragmenty_csv,
+}
+
+# Funkcje zapisu opinii według formatu pliku
+ZAPIS = {
+    "json": zapisz_do_json,
+    "jsonl": zapisz_do_jsonl,
+    "csv": zapisz_do_csv,
+    "parquet": zapisz_do_parquet,
+    "arrow": zapisz_do_arrow,
+}
+
+def zapisz_wykresy_produktu(ean, oceny, dystrybucja_ocen, katalog="."):
+    """
+    Zapisuje wykresy średniej oceny i dystrybucji ocen produktu do plików JPG.
+
+    Nazwy plików zawierają kod EAN, więc wykresy różnych produktów zapisywane
+    naraz nie nadpisują się nawzajem. Aplikacja WWW nie korzysta z plików,
+    tylko rysuje wykresy na żądanie (/wykresy/<ean>/<rodzaj>.<format>).
+
+    Args:
+        ean: Kod EAN produktu.
+        oceny: Średnia ocena.
+        dystrybucja_ocen: Słownik {ocena: liczba opinii}.
+        katalog: Katalog na pliki <ean>-srednia_ocena.jpg i <ean>-dystrybucja_ocen.jpg.
+
+    Returns:
+        Lista ścieżek zapisanych plików.
+    """
+    # Import na miejscu, bo matplotlib jest potrzebny tylko przy rysowaniu
+    from wykresy import narysuj
+
+    dane = {"srednia": oceny, "histogram": dystrybucja_ocen}
+    sciezki = []
+    for rodzaj in ("srednia_ocena", "dystrybucja_ocen"):
+        sciezka = os.path.join(katalog, f"{ean}-{rodzaj}.jpg")
+        with open(sciezka, "wb") as f:
+            f.write(narysuj(rodzaj, dane, "jpg"))
+        sciezki.append(sciezka)
+    return sciezki
 
 class Produkt:
     def __init__(self, ean):
@@ -264,7 +923,10 @@ class Produkt:
         self.opinie.extend(opinie)
 
 class Opinia:
-    def __init__(self, id_opinii, autor, rekomendacja, gwiazdki, potwierdzony_zakup, data_wystawienia, czas_od_zakupu, pomocna, nie_pomocna, tresc, wady, zalety):
+    __slots__ = ("id_opinii", "autor", "rekomendacja", "gwiazdki", "potwierdzony_zakup", "data_wystawienia", "czas_od_zakupu", "pomocna", "nie_pomocna", "tresc", "wady", "zalety", "data", "data_zakupu",
+                 "duplikat", "ocena", "pomocne", "niepomocne", "potwierdzony", "wystawiono", "kupiono", "po_zakupie")
+
+    def __init__(self, id_opinii, autor, rekomendacja, gwiazdki, potwierdzony_zakup, data_wystawienia, czas_od_zakupu, pomocna, nie_pomocna, tresc, wady, zalety, data=None, data_zakupu=None, duplikat=None):
         self.id_opinii = id_opinii
         self.autor = autor
         self.rekomendacja = rekomendacja
@@ -277,6 +939,63 @@ class Opinia:
         self.tresc = tresc
         self.wady = wady
         self.zalety = zalety
+        # Daty z atrybutu datetime (np. "2024-01-15 10:00:00"), obok tekstu widocznego na stronie
+        self.data = data
+        self.data_zakupu = data_zakupu
+        # "<ean>/<id opinii>" oryginału, gdy magazyn rozpoznał opinię jako kopię innej opinii
+        self.duplikat = duplikat
+        # Wartości z typami wyliczane raz, przy tworzeniu opinii
+        self.ocena = ocena_liczbowa(gwiazdki)
+        self.pomocne = liczba_glosow(pomocna)
+        self.niepomocne = liczba_glosow(nie_pomocna)
+        self.potwierdzony = potwierdzony_zakup == "Potwierdzone zakupem"
+        self.wystawiono = data_z_atrybutu(data)
+        self.kupiono = data_z_atrybutu(data_zakupu)
+        if self.wystawiono and self.kupiono:
+            self.po_zakupie = self.wystawiono - self.kupiono
+        else:
+            self.po_zakupie = okres(czas_od_zakupu) if self.potwierdzony else None
+
+    def do_slownika(self, daty=True):
+        """
+        Zwraca opinię jako słownik w formacie zapisywanym do JSON.
+
+        Args:
+            daty: Czy dołączyć pola data i data_zakupu (wartości atrybutu
+                datetime). Pliki eksportu ich nie zawierają, żeby zachować
+                dotychczasowy zestaw kluczy.
+        """
+        slownik = {
+            "id": self.id_opinii,
+            "autor": self.autor,
+            "rekomendacja": self.rekomendacja,
+            "gwiazdki": self.gwiazdki,
+            "data_wystawienia": self.data_wystawienia,
+            "czas_od_zakupu": self.czas_od_zakupu,
+            "potwierdzony_zakup": self.potwierdzony_zakup,
+            "pomocna": self.pomocna,
+            "nie_pomocna": self.nie_pomocna,
+            "tresc": self.tresc,
+            "wady": self.wady,
+            "zalety": self.zalety,
+        }
+        if daty:
+            slownik["data"] = self.data
+            slownik["data_zakupu"] = self.data_zakupu
+        return slownik
+
+    def do_wiersza(self):
+        """
+        Zwraca opinię jako wiersz pliku CSV (kolumny jak w NAGLOWKI_CSV).
+        """
+        return [self.id_opinii, self.autor, self.rekomendacja, self.gwiazdki, self.data_wystawienia, self.czas_od_zakupu, self.potwierdzony_zakup, self.pomocna, self.nie_pomocna, self.tresc, ", ".join(self.wady), ", ".join(self.zalety)]
+
+    @classmethod
+    def z_slownika(cls, dane):
+        """
+        Tworzy opinię ze słownika w formacie zapisywanym do JSON.
+        """
+        return cls(dane["id"], dane["autor"], dane["rekomendacja"], dane["gwiazdki"], dane["potwierdzony_zakup"], dane["data_wystawienia"], dane["czas_od_zakupu"], dane["pomocna"], dane["nie_pomocna"], dane["tresc"], dane["wady"], dane["zalety"], dane.get("data"), dane.get("data_zakupu"))
 
 def main():
     # Kod EAN produktu
@@ -285,169 +1004,29 @@ def main():
     # Tworzenie obiektu produktu
     produkt = Produkt(ean)
 
-    # Pobieranie i parsowanie strony produktu
-    url = f"https://www.ceneo.pl/{ean}"
-    soup = BeautifulSoup(requests.get(url).content, "html.parser")
+    # Pobieranie opinii ze wszystkich stron
+    url = adres_produktu(ean)
+    opinie = pobierz_wszystkie_opinie(url)
 
-    # Pobieranie opinii z pierwszej strony
-    opinie = pobierz_opinie(url)
+    # Dodawanie opinii do produktu
+    produkt.dodaj_opinie(opinie)
 
-    # Inicjowanie licznika stron
-    liczba_stron = 1
-
-    # Iterowanie po stronach do momentu powtórzenia pierwszej strony
-    while opinie:
-        liczba_stron += 1
-        opinie = pobierz_opinie(f"{url}/opinie-{liczba_stron}")
-        if opinie == pobierz_opinie(url):
-            break
-
-    # Iteracja po opiniach z pierwszej strony i wyświetlanie danych
+    # Wyświetlanie danych opinii
     for opinia in opinie:
-        id_opinii = opinia.get("data-entry-id")
-        autor = opinia.find("span", class_="user-post__author-name").text.strip()
-        rekomendacja_element = opinia.find("span", class_="user-post__author-recomendation")
-        rekomendacja = rekomendacja_element.text.strip() if rekomendacja_element is not None else "Brak rekomendacji"
-        gwiazdki = opinia.find("span", class_="user-post__score-count").text.strip()
-        potwierdzony_zakup = "Nie zakupiono"
-        data_wystawienia = opinia.find("time", {"datetime": True})
-        czasy_elementy = opinia.find_all("time", {"datetime": True})
-        pomocna_element = opinia.find("button", class_="vote-yes js_product-review-vote js_vote-yes")
-        pomocna = pomocna_element.text.strip() if pomocna_element is not None else "Brak danych"
-        nie_pomocna_element = opinia.find("button", class_="vote-no js_product-review-vote js_vote-no")
-        nie_pomocna = nie_pomocna_element.text.strip() if nie_pomocna_element is not None else "Brak danych"
-        tresc = opinia.find("div", class_="user-post__text").text.strip()
-        wady_element = opinia.find("div", class_="review-feature__title--negatives")
-        wady = []
-        zalety_element = opinia.find("div", class_="review-feature__title--positives")
-        zalety = []
-
-        # Uwzględnienie braku danych
-        if not id_opinii:
-            id_opinii = "Brak ID"
-        if not autor:
-            autor = "Brak autora"
-        if not rekomendacja:
-            rekomendacja = "Brak rekomendacji"
-        if not gwiazdki:
-            gwiazdki = "Brak gwiazdek"
-        if czasy_elementy:
-            potwierdzony_zakup = "Potwierdzenie zakupu"
-        if not data_wystawienia:
-            data_wystawienia = "Brak daty wystawienia opinii"
-        if len(czasy_elementy) > 1:
-            czas_od_zakupu_element = czasy_elementy[1]
-            czas_od_zakupu = czas_od_zakupu_element.text.strip() if czas_od_zakupu_element else "Brak danych"
-        else:
-            czas_od_zakupu = "Brak danych"
-        if not pomocna:
-            pomocna = "Brak liczby pozytywnych reakcji"
-        if not nie_pomocna:
-            nie_pomocna = "Brak liczby negatywnych reakcji"
-        if not tresc:
-            tresc = "Brak treści"
-        if wady_element:
-            wady = [wada.text.strip() for wada in wady_element.find_next_sibling("div", class_="review-feature__item")]
-        if not wady_element:
-            wady_element = "Brak wad"
-        if zalety_element:
-            zalety = [zaleta.text.strip() for zaleta in zalety_element.find_next_sibling("div", class_="review-feature__item")]
-        if not zalety_element:
-            zalety_element = "Brak zalet"
-
-        # Tworzenie obiektu opinii
-        nowa_opinia = Opinia(id_opinii, autor, rekomendacja, gwiazdki, potwierdzony_zakup, data_wystawienia, czas_od_zakupu, pomocna, nie_pomocna, tresc, wady, zalety)
-        # Dodawanie opinii do produktu
-        produkt.dodaj_opinie([nowa_opinia])
-
-        print(f"ID: {id_opinii}")
-        print(f"Autor: {autor}")
-        print(f"Rekomendacja: {rekomendacja}")
-        print(f"Liczba gwiazdek: {gwiazdki}")
-        print(f"{potwierdzony_zakup}")
-        print(f"Data wystawienia opinii: {data_wystawienia}")
-        print(f"Data zakupu: {czas_od_zakupu}")
-        print(f"Liczba pozytywnych reakcji: {pomocna}")
-        print(f"Liczba neagtywnych reakcji: {nie_pomocna}")
-        print(f"Treść: {tresc}")
-        print(f"Wady: {wady}")
-        print(f"Zalety: {zalety}")
+        print(f"ID: {opinia.id_opinii}")
+        print(f"Autor: {opinia.autor}")
+        print(f"Rekomendacja: {opinia.rekomendacja}")
+        print(f"Liczba gwiazdek: {opinia.gwiazdki}")
+        print(f"{opinia.potwierdzony_zakup}")
+        print(f"Data wystawienia opinii: {opinia.data_wystawienia}")
+        print(f"Data zakupu: {opinia.czas_od_zakupu}")
+        print(f"Liczba pozytywnych reakcji: {opinia.pomocna}")
+        print(f"Liczba neagtywnych reakcji: {opinia.nie_pomocna}")
+        print(f"Treść: {opinia.tresc}")
+        print(f"Wady: {opinia.wady}")
+        print(f"Zalety: {opinia.zalety}")
         print()
 
-    for i in range(2, liczba_stron):
-        opinie += pobierz_opinie(f"{url}/opinie-{i}")
-
-        for opinia in opinie:
-            id_opinii = opinia.get("data-entry-id")
-            autor = opinia.find("span", class_="user-post__author-name").text.strip()
-            rekomendacja_element = opinia.find("span", class_="user-post__author-recomendation")
-            rekomendacja = rekomendacja_element.text.strip() if rekomendacja_element is not None else "Brak rekomendacji"
-            gwiazdki = opinia.find("span", class_="user-post__score-count").text.strip()
-            potwierdzony_zakup = "Nie zakupiono"
-            data_wystawienia = opinia.find("time", {"datetime": True})
-            czasy_elementy = opinia.find_all("time", {"datetime": True})
-            pomocna_element = opinia.find("button", class_="vote-yes js_product-review-vote js_vote-yes")
-            pomocna = pomocna_element.text.strip() if pomocna_element is not None else "Brak danych"
-            nie_pomocna_element = opinia.find("button", class_="vote-no js_product-review-vote js_vote-no")
-            nie_pomocna = nie_pomocna_element.text.strip() if nie_pomocna_element is not None else "Brak danych"
-            tresc = opinia.find("div", class_="user-post__text").text.strip()
-            wady_element = opinia.find("div", class_="review-feature__title--negatives")
-            wady = []
-            zalety_element = opinia.find("div", class_="review-feature__title--positives")
-            zalety = []
-
-            # Uwzględnienie braku danych
-            if not id_opinii:
-                id_opinii = "Brak ID"
-            if not autor:
-                autor = "Brak autora"
-            if not rekomendacja:
-                rekomendacja = "Brak rekomendacji"
-            if not gwiazdki:
-                gwiazdki = "Brak gwiazdek"
-            if czasy_elementy:
-                potwierdzony_zakup = "Potwierdzenie zakupu"
-            if not data_wystawienia:
-                data_wystawienia = "Brak daty wystawienia opinii"
-            if len(czasy_elementy) > 1:
-                czas_od_zakupu_element = czasy_elementy[1]
-                czas_od_zakupu = czas_od_zakupu_element.text.strip() if czas_od_zakupu_element else "Brak danych"
-            else:
-                czas_od_zakupu = "Brak danych"
-            if not pomocna:
-                pomocna = "Brak liczby pozytywnych reakcji"
-            if not nie_pomocna:
-                nie_pomocna = "Brak liczby negatywnych reakcji"
-            if not tresc:
-                tresc = "Brak treści"
-            if wady_element:
-                wady = [wada.text.strip() for wada in wady_element.find_next_sibling("div", class_="review-feature__item")]
-            if not wady_element:
-                wady_element = "Brak wad"
-            if zalety_element:
-                zalety = [zaleta.text.strip() for zaleta in zalety_element.find_next_sibling("div", class_="review-feature__item")]
-            if not zalety_element:
-                zalety_element = "Brak zalet"
-
-            # Tworzenie obiektu opinii
-            nowa_opinia = Opinia(id_opinii, autor, rekomendacja, gwiazdki, potwierdzony_zakup, data_wystawienia, czas_od_zakupu, pomocna, nie_pomocna, tresc, wady, zalety)
-            # Dodawanie opinii do produktu
-            produkt.dodaj_opinie([nowa_opinia])
-
-            print(f"ID: {id_opinii}")
-            print(f"Autor: {autor}")
-            print(f"Rekomendacja: {rekomendacja}")
-            print(f"Liczba gwiazdek: {gwiazdki}")
-            print(f"{potwierdzony_zakup}")
-            print(f"Data wystawienia opinii: {data_wystawienia}")
-            print(f"Data zakupu: {czas_od_zakupu}")
-            print(f"Liczba pozytywnych reakcji: {pomocna}")
-            print(f"Liczba neagtywnych reakcji: {nie_pomocna}")
-            print(f"Treść: {tresc}")
-            print(f"Wady: {wady}")
-            print(f"Zalety: {zalety}")
-            print()
-
     # Zapis opinii do pliku JSON
     zapisz_do_json(opinie, "opinie.json")
 
@@ -463,7 +1042,7 @@ def main():
 
     # Wyświetlenie wykresów
     if "dystrybucja_ocen" in wyniki_statystyczne:
-        wyswietl_wykresy(wyniki_statystyczne["średnia_ocena"], wyniki_statystyczne["dystrybucja_ocen"])
+        zapisz_wykresy_produktu(ean, wyniki_statystyczne["średnia_ocena"], wyniki_statystyczne["dystrybucja_ocen"])
     else:
         print("Brak danych do wyświetlenia wykresów.")
 
@@ -0,0 +1,120 @@
+import argparse
+import hashlib
+import zlib
+import numpy as np
+from wyszukiwanie import rdzenie
+
+# Podpis MinHash ma LICZBA_PERMUTACJI wartości, dzielonych na PASMA pasm po
+# LICZBA_PERMUTACJI // PASMA wartości. Przy 16 pasmach po 8 wartości opinie
+# o podobieństwie Jaccarda 0,8 trafiają do wspólnego kubełka z prawdopodobieństwem
+# ok. 0,94, a o podobieństwie 0,5 - ok. 0,06.
+LICZBA_PERMUTACJI = 128
+PASMA = 16
+# Długość gontu (kolejnych rdzeni słów) i minimalne podobieństwo duplikatu
+DLUGOSC_GONTU = 3
+PROG_PODOBIENSTWA = 0.8
+# Krótsze opinie ("Polecam", "Wszystko OK") powtarzają się naturalnie i nie są sprawdzane
+MIN_SLOW = 8
+
+_LICZBA_PIERWSZA = np.uint64((1 << 61) - 1)
+# Stałe ziarno: podpisy zapisane w bazie muszą być liczone zawsze tymi samymi permutacjami
+_los = np.random.RandomState(2024)
+_A = _los.randint(1, 1 << 32, LICZBA_PERMUTACJI, dtype=np.uint64)
+_B = _los.randint(0, 1 << 32, LICZBA_PERMUTACJI, dtype=np.uint64)
+
+def gonty(opinia):
+    """
+    Zamienia treść, wady i zalety opinii na zbiór gontów słownych.
+
+    Słowa są sprowadzane do rdzeni jak w indeksie pełnotekstowym, więc
+    drobne zmiany odmiany i znaków diakrytycznych nie ukrywają kopii.
+
+    Args:
+        opinia: Obiekt Opinia.
+
+    Returns:
+        Zbiór gontów (napisów) albo None, gdy opinia ma mniej niż MIN_SLOW słów.
+    """
+    slowa = rdzenie(" ".join([opinia.tresc or "", *opinia.wady, *opinia.zalety])).split()
+    if len(slowa) < MIN_SLOW:
+        return None
+    return {" ".join(slowa[i:i + DLUGOSC_GONTU]) for i in range(len(slowa) - DLUGOSC_GONTU + 1)}
+
+def podpis(gonty):
+    """
+    Liczy podpis MinHash zbioru gontów.
+
+    Args:
+        gonty: Niepusty zbiór napisów.
+
+    Returns:
+        Tablica numpy uint64 o długości LICZBA_PERMUTACJI.
+    """
+    skroty = np.fromiter((zlib.crc32(gont.encode()) for gont in gonty), dtype=np.uint64, count=len(gonty))
+    # Iloczyn liczb 32-bitowych mieści się w uint64; przepełnienie po dodaniu _B tylko zmienia permutację
+    return ((_A[:, None] * skroty[None, :] + _B[:, None]) % _LICZBA_PIERWSZA).min(axis=1)
+
+def podpis_opinii(opinia):
+    """
+    Liczy podpis MinHash opinii.
+
+    Args:
+        opinia: Obiekt Opinia.
+
+    Returns:
+        Tablica numpy uint64 albo None dla zbyt krótkiej opinii.
+    """
+    zbior = gonty(opinia)
+    return podpis(zbior) if zbior else None
+
+def klucze_pasm(podpis):
+    """
+    Zwraca klucze kubełków LSH podpisu, po jednym dla każdego pasma.
+
+    Args:
+        podpis: Tablica zwrócona przez podpis().
+
+    Returns:
+        Lista krotek (numer pasma, klucz jako 64-bitowa liczba ze znakiem).
+    """
+    wiersze = LICZBA_PERMUTACJI // PASMA
+    return [
+        (pasmo, int.from_bytes(hashlib.blake2b(podpis[pasmo * wiersze:(pasmo + 1) * wiersze].tobytes(), digest_size=8).digest(),
+                               "little", signed=True))
+        for pasmo in range(PASMA)
+    ]
+
+def podobienstwo(podpis_a, podpis_b):
+    """
+    Szacuje podobieństwo Jaccarda zbiorów gontów na podstawie ich podpisów.
+
+    Returns:
+        Udział równych wartości podpisów (od 0 do 1).
+    """
+    return float(np.count_nonzero(podpis_a == podpis_b)) / LICZBA_PERMUTACJI
+
+def do_bajtow(podpis):
+    return podpis.astype("<u8").tobytes()
+
+def z_bajtow(dane):
+    return np.frombuffer(dane, dtype="<u8")
+
+def main():
+    from magazyn import domyslny_magazyn
+
+    parser = argparse.ArgumentParser(description="Wykrywanie skopiowanych i prawie identycznych opinii.")
+    parser.add_argument("--przebuduj", action="store_true",
+                        help="zbuduj indeks od nowa dla wszystkich zapisanych opinii (np. po aktualizacji bazy)")
+    parser.add_argument("-n", "--limit", type=int, default=20, help="liczba wyświetlanych grup duplikatów")
+    argumenty = parser.parse_args()
+
+    magazyn = domyslny_magazyn()
+    if argumenty.przebuduj:
+        print(f"Zindeksowano opinie: {magazyn.przebuduj_duplikaty()}")
+    grupy = magazyn.grupy_duplikatow()
+    print(f"Grupy duplikatów: {len(grupy)}, oznaczone opinie: {sum(len(kopie) for _, kopie in grupy)}")
+    for oryginal, kopie in grupy[:argumenty.limit]:
+        print(f"{oryginal}: {len(kopie)} kopii ({', '.join(kopie[:5])}{', ...' if len(kopie) > 5 else ''})")
+
+if __name__ == "__main__":
+    main()
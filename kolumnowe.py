@@ -0,0 +1,107 @@
+from itertools import islice
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError as blad:
+    raise ImportError("Zapis do formatów Parquet i Arrow wymaga pakietu pyarrow (pip install pyarrow)") from blad
+from ceneo import _jako_opinia
+
+# Liczba opinii w jednej partii (grupie wierszy) zapisywanej do pliku
+ROZMIAR_PARTII = 10000
+KOMPRESJA = "zstd"
+
+SCHEMAT = pa.schema([
+    ("id", pa.string()),
+    ("autor", pa.string()),
+    ("rekomendacja", pa.string()),
+    ("ocena", pa.float32()),
+    ("data_wystawienia", pa.timestamp("s")),
+    ("data_zakupu", pa.timestamp("s")),
+    ("po_zakupie", pa.duration("s")),
+    ("potwierdzony_zakup", pa.bool_()),
+    ("pomocna", pa.int32()),
+    ("nie_pomocna", pa.int32()),
+    ("tresc", pa.string()),
+    ("wady", pa.list_(pa.string())),
+    ("zalety", pa.list_(pa.string())),
+])
+
+def zapisz_kolumnowo(opinie, nazwa_pliku, format="parquet", kompresja=KOMPRESJA, rozmiar_partii=ROZMIAR_PARTII):
+    """
+    Zapisuje opinie w kolumnach z typami (Parquet albo Arrow IPC).
+
+    Ocena jest liczbą, daty znacznikami czasu, czas od zakupu okresem,
+    głosy liczbami całkowitymi, a wady i zalety listami napisów. Opinie są
+    zapisywane partiami, więc można tu przekazać także generator dowolnej
+    długości.
+
+    Args:
+        opinie: Obiekty Opinia (lub elementy BeautifulSoup, lub słowniki).
+        nazwa_pliku: Nazwa pliku wynikowego.
+        format: "parquet" albo "arrow".
+        kompresja: Kodek kompresji ("zstd", "lz4", a dla Parquet także
+            "snappy", "gzip") albo None.
+        rozmiar_partii: Liczba opinii w jednej partii.
+
+    Returns:
+        Liczba zapisanych opinii.
+    """
+    if format == "parquet":
+        zapisujacy = pa.parquet.ParquetWriter(nazwa_pliku, SCHEMAT, compression=kompresja or "none")
+    elif format == "arrow":
+        opcje = pa.ipc.IpcWriteOptions(compression=kompresja)
+        zapisujacy = pa.ipc.new_file(nazwa_pliku, SCHEMAT, options=opcje)
+    else:
+        raise ValueError(f"Nieznany format kolumnowy: {format}")
+
+    liczba = 0
+    opinie = iter(opinie)
+    with zapisujacy:
+        while True:
+            partia = [_jako_opinia(opinia) for opinia in islice(opinie, rozmiar_partii)]
+            if not partia:
+                break
+            zapisujacy.write_batch(_partia(partia))
+            liczba += len(partia)
+    return liczba
+
+def wczytaj_kolumnowo(nazwa_pliku, kolumny=None):
+    """
+    Wczytuje opinie zapisane przez zapisz_kolumnowo.
+
+    Args:
+        nazwa_pliku: Nazwa pliku .parquet albo .arrow.
+        kolumny: Opcjonalna lista kolumn do wczytania (Parquet czyta z dysku
+            tylko te kolumny).
+
+    Returns:
+        Tabela pyarrow.Table.
+    """
+    if nazwa_pliku.endswith(".parquet"):
+        return pa.parquet.read_table(nazwa_pliku, columns=kolumny)
+    with pa.memory_map(nazwa_pliku) as plik:
+        tabela = pa.ipc.open_file(plik).read_all()
+    return tabela.select(kolumny) if kolumny else tabela
+
+def _partia(opinie):
+    # Kolumny jednej partii w kolejności pól SCHEMAT
+    kolumny = [
+        [opinia.id_opinii for opinia in opinie],
+        [opinia.autor for opinia in opinie],
+        [opinia.rekomendacja for opinia in opinie],
+        [opinia.ocena for opinia in opinie],
+        [opinia.wystawiono for opinia in opinie],
+        [opinia.kupiono for opinia in opinie],
+        [opinia.po_zakupie for opinia in opinie],
+        [opinia.potwierdzony for opinia in opinie],
+        [opinia.pomocne for opinia in opinie],
+        [opinia.niepomocne for opinia in opinie],
+        [opinia.tresc for opinia in opinie],
+        [opinia.wady for opinia in opinie],
+        [opinia.zalety for opinia in opinie],
+    ]
+    return pa.RecordBatch.from_arrays(
+        [pa.array(kolumna, type=pole.type) for kolumna, pole in zip(kolumny, SCHEMAT)],
+        schema=SCHEMAT,
+    )
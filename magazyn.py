@@ -0,0 +1,804 @@
+import base64
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+from ceneo import Opinia
+from wyszukiwanie import rdzenie, wyrazenie_fts
+
+DOMYSLNA_SCIEZKA = os.path.join("dane", "opinie.sqlite")
+# Liczba ostatnio oglądanych produktów, których opinie są trzymane w pamięci
+ROZMIAR_PAMIECI = 16
+
+_SCHEMAT = """
+CREATE TABLE IF NOT EXISTS produkty (
+    ean TEXT PRIMARY KEY,
+    pobrano REAL NOT NULL,
+    najnowsza_data TEXT,
+    liczba_opinii INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS opinie (
+    ean TEXT NOT NULL REFERENCES produkty (ean),
+    id_opinii TEXT NOT NULL,
+    pozycja INTEGER NOT NULL,
+    autor TEXT,
+    rekomendacja TEXT,
+    gwiazdki TEXT,
+    potwierdzony_zakup TEXT,
+    data_wystawienia TEXT,
+    czas_od_zakupu TEXT,
+    pomocna TEXT,
+    nie_pomocna TEXT,
+    tresc TEXT,
+    wady TEXT,
+    zalety TEXT,
+    PRIMARY KEY (ean, id_opinii)
+);
+CREATE TABLE IF NOT EXISTS duplikaty_podpisy (
+    ean TEXT NOT NULL,
+    id_opinii TEXT NOT NULL,
+    podpis BLOB NOT NULL,
+    PRIMARY KEY (ean, id_opinii)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS duplikaty_pasma (
+    pasmo INTEGER NOT NULL,
+    klucz INTEGER NOT NULL,
+    ean TEXT NOT NULL,
+    id_opinii TEXT NOT NULL
+);
+"""
+
+# Zestawienie opinii każdego produktu aktualizowane przy zapisie opinii, dzięki
+# czemu lista produktów nie wymaga przeglądania opinii; rozklad to obiekt JSON
+# {"<ocena>": liczba opinii}, a srednia to suma_ocen / liczba_ocen
+_AGREGATY = """
+CREATE TABLE agregaty (
+    ean TEXT PRIMARY KEY REFERENCES produkty (ean),
+    liczba_opinii INTEGER NOT NULL,
+    liczba_ocen INTEGER NOT NULL,
+    suma_ocen REAL NOT NULL,
+    rozklad TEXT NOT NULL,
+    liczba_wad INTEGER NOT NULL,
+    liczba_zalet INTEGER NOT NULL,
+    pobrano REAL
+)
+"""
+
+# Kolumny dodane po pierwszej wersji schematu, uzupełniane w istniejących bazach
+_NOWE_KOLUMNY = (
+    ("data", "TEXT"),
+    ("data_zakupu", "TEXT"),
+    ("ocena", "REAL"),
+    ("pomocne", "INTEGER NOT NULL DEFAULT 0"),
+    ("niepomocne", "INTEGER NOT NULL DEFAULT 0"),
+    ("potwierdzony", "INTEGER NOT NULL DEFAULT 0"),
+    # "<ean>/<id opinii>" najwcześniejszej opinii, której ta opinia jest (prawie) dokładną kopią
+    ("duplikat", "TEXT"),
+)
+
+# Wyrażenia, po których można sortować opinie; braki danych trafiają na początek
+_SORTOWANIE = {
+    "pozycja": "pozycja",
+    "ocena": "COALESCE(ocena, -1)",
+    "data": "COALESCE(data, '')",
+    "pomocne": "pomocne",
+}
+
+_INDEKSY = """
+CREATE INDEX IF NOT EXISTS opinie_pozycja ON opinie (ean, pozycja);
+CREATE INDEX IF NOT EXISTS opinie_ocena ON opinie (ean, COALESCE(ocena, -1), pozycja);
+CREATE INDEX IF NOT EXISTS opinie_data ON opinie (ean, COALESCE(data, ''), pozycja);
+CREATE INDEX IF NOT EXISTS opinie_pomocne ON opinie (ean, pomocne, pozycja);
+CREATE INDEX IF NOT EXISTS opinie_duplikat ON opinie (duplikat) WHERE duplikat IS NOT NULL;
+CREATE INDEX IF NOT EXISTS duplikaty_pasma_klucz ON duplikaty_pasma (pasmo, klucz);
+CREATE INDEX IF NOT EXISTS duplikaty_pasma_opinia ON duplikaty_pasma (ean, id_opinii);
+"""
+
+# Wyrażenia, po których można sortować listę produktów, i indeksy z tymi wyrażeniami
+_SORTOWANIE_PRODUKTOW = {
+    "pobrano": "COALESCE(pobrano, 0)",
+    "liczba_opinii": "liczba_opinii",
+    "srednia": "COALESCE(suma_ocen / NULLIF(liczba_ocen, 0), -1)",
+    "ean": "ean",
+}
+_INDEKSY_AGREGATOW = """
+CREATE INDEX IF NOT EXISTS agregaty_pobrano ON agregaty (COALESCE(pobrano, 0), ean);
+CREATE INDEX IF NOT EXISTS agregaty_liczba_opinii ON agregaty (liczba_opinii, ean);
+CREATE INDEX IF NOT EXISTS agregaty_srednia ON agregaty (COALESCE(suma_ocen / NULLIF(liczba_ocen, 0), -1), ean);
+"""
+
+# Zmiana zestawienia wnoszona przez wybrane opinie, w podziale na oceny
+_ZMIANA_AGREGATU = """
+SELECT ocena, COUNT(*), COALESCE(SUM(json_array_length(wady)), 0), COALESCE(SUM(json_array_length(zalety)), 0)
+FROM opinie WHERE {warunek} GROUP BY ocena
+"""
+
+# Indeks pełnotekstowy z rdzeniami słów treści, wad i zalet; rowid wiersza
+# indeksu jest równy rowid opinii w tabeli opinie
+_INDEKS_FTS = """
+CREATE VIRTUAL TABLE opinie_fts USING fts5(
+    tresc, wady, zalety,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+# Zapytanie uzupełniające indeks pełnotekstowy o opinie o rowid większym niż podany
+_INDEKSUJ = """
+INSERT INTO opinie_fts (rowid, tresc, wady, zalety)
+SELECT rowid, rdzenie(tresc),
+       rdzenie((SELECT group_concat(value, ' ') FROM json_each(opinie.wady))),
+       rdzenie((SELECT group_concat(value, ' ') FROM json_each(opinie.zalety)))
+FROM opinie WHERE rowid > ?
+"""
+
+_KOLUMNY_ZAPISU = ("id_opinii, autor, rekomendacja, gwiazdki, potwierdzony_zakup, data_wystawienia, czas_od_zakupu, pomocna, "
+                   "nie_pomocna, tresc, wady, zalety, data, data_zakupu, ocena, pomocne, niepomocne, potwierdzony")
+_KOLUMNY = "id_opinii, autor, rekomendacja, gwiazdki, potwierdzony_zakup, data_wystawienia, czas_od_zakupu, pomocna, nie_pomocna, tresc, wady, zalety, data, data_zakupu, duplikat"
+
+# Liczba opinii na stronie wyników zapytania
+ROZMIAR_STRONY = 50
+# Liczba opinii odczytywanych jednym zapytaniem przy przeglądaniu wszystkich opinii
+ROZMIAR_PORCJI = 500
+
+Filtr = namedtuple(
+    "Filtr",
+    ["ocena_od", "ocena_do", "data_od", "data_do", "potwierdzone", "min_pomocnych", "autor", "rekomendacja", "bez_duplikatow"],
+    defaults=(None,) * 9,
+)
+Filtr.__doc__ = """
+Kryteria wyboru opinii; pola równe None nie ograniczają wyniku.
+
+Daty mają postać "RRRR-MM-DD" i obie granice należą do zakresu.
+Pole bez_duplikatow pomija opinie oznaczone jako kopie innych opinii.
+"""
+
+WynikZapytania = namedtuple("WynikZapytania", ["opinie", "liczba", "nastepna"])
+Agregat = namedtuple(
+    "Agregat",
+    ["ean", "liczba_opinii", "liczba_ocen", "srednia_ocena", "rozklad_ocen", "liczba_wad", "liczba_zalet", "pobrano"],
+)
+Agregat.__doc__ = """
+Zestawienie opinii produktu.
+
+Pole rozklad_ocen to słownik {ocena: liczba opinii} od najwyższej oceny,
+srednia_ocena jest None dla produktu bez ocen, a pobrano to czas
+ostatniego pobrania opinii (sekundy od początku epoki).
+"""
+ListaProduktow = namedtuple("ListaProduktow", ["produkty", "liczba"])
+Trafienie = namedtuple("Trafienie", ["ean", "opinia", "trafnosc"])
+
+class Magazyn:
+    """
+    Magazyn opinii w bazie SQLite, z osobnym zestawem opinii dla każdego EAN.
+
+    Zapis opinii produktu odbywa się w jednej transakcji, więc równoległe
+    pobrania różnych produktów nie nadpisują się nawzajem, a czytelnik nigdy
+    nie widzi połowicznie zapisanych danych. Opinie ostatnio oglądanych
+    produktów są trzymane w pamięci i odczytywane ponownie z bazy dopiero,
+    gdy produkt zostanie pobrany na nowo.
+    """
+
+    def __init__(self, sciezka=DOMYSLNA_SCIEZKA, rozmiar_pamieci=ROZMIAR_PAMIECI):
+        self.sciezka = sciezka
+        self.rozmiar_pamieci = rozmiar_pamieci
+        self._lokalne = threading.local()
+        self._pamiec = OrderedDict()
+        self._blokada = threading.Lock()
+
+        katalog = os.path.dirname(sciezka)
+        if katalog:
+            os.makedirs(katalog, exist_ok=True)
+        polaczenie = self._polaczenie()
+        polaczenie.execute("PRAGMA journal_mode=WAL")
+        polaczenie.executescript(_SCHEMAT)
+        istniejace = {wiersz[1] for wiersz in polaczenie.execute("PRAGMA table_info(opinie)")}
+        for nazwa, typ in _NOWE_KOLUMNY:
+            if nazwa not in istniejace:
+                polaczenie.execute(f"ALTER TABLE opinie ADD COLUMN {nazwa} {typ}")
+        if polaczenie.execute("SELECT 1 FROM sqlite_master WHERE name = 'agregaty'").fetchone() is None:
+            # Baza sprzed wprowadzenia zestawień - są liczone od razu dla wszystkich produktów
+            with self._transakcja() as transakcja:
+                transakcja.execute(_AGREGATY)
+                for (ean,) in transakcja.execute("SELECT ean FROM produkty").fetchall():
+                    self._aktualizuj_agregat(transakcja, ean, dodane=_zmiana_agregatu(transakcja, "ean = ?", (ean,)))
+                transakcja.execute("UPDATE agregaty SET pobrano = (SELECT pobrano FROM produkty WHERE produkty.ean = agregaty.ean)")
+        polaczenie.executescript(_INDEKSY)
+        polaczenie.executescript(_INDEKSY_AGREGATOW)
+        if polaczenie.execute("SELECT 1 FROM sqlite_master WHERE name = 'opinie_fts'").fetchone() is None:
+            # Baza sprzed wprowadzenia wyszukiwania - indeks jest budowany od razu dla wszystkich opinii
+            with self._transakcja() as transakcja:
+                transakcja.execute(_INDEKS_FTS)
+                transakcja.execute(_INDEKSUJ, (0,))
+
+    def _polaczenie(self):
+        # Osobne połączenie dla każdego wątku (Flask, zadania w tle, zadania wsadowe)
+        polaczenie = getattr(self._lokalne, "polaczenie", None)
+        if polaczenie is None:
+            polaczenie = sqlite3.connect(self.sciezka, timeout=30, isolation_level=None)
+            polaczenie.create_function("rdzenie", 1, rdzenie, deterministic=True)
+            self._lokalne.polaczenie = polaczenie
+        return polaczenie
+
+    def zapisz_opinie(self, ean, opinie, najnowsza_data=None):
+        """
+        Zastępuje zapisane opinie produktu nowymi.
+
+        Args:
+            ean: Kod EAN produktu.
+            opinie: Lista obiektów Opinia, od najnowszej.
+            najnowsza_data: Najnowsza data opinii produktu.
+        """
+        opinie = _bez_powtorzen(opinie)
+        with self._transakcja() as polaczenie:
+            polaczenie.execute("DELETE FROM opinie_fts WHERE rowid IN (SELECT rowid FROM opinie WHERE ean = ?)", (ean,))
+            polaczenie.execute("DELETE FROM opinie WHERE ean = ?", (ean,))
+            polaczenie.execute("DELETE FROM duplikaty_pasma WHERE ean = ?", (ean,))
+            polaczenie.execute("DELETE FROM duplikaty_podpisy WHERE ean = ?", (ean,))
+            polaczenie.execute("DELETE FROM agregaty WHERE ean = ?", (ean,))
+            self._wstaw(polaczenie, ean, opinie, 0)
+            self._zapisz_produkt(polaczenie, ean, najnowsza_data)
+
+    def dodaj_opinie(self, ean, nowe, najnowsza_data=None):
+        """
+        Dodaje nowe opinie przed zapisanymi wcześniej opiniami produktu.
+
+        Args:
+            ean: Kod EAN produktu.
+            nowe: Lista nowych obiektów Opinia, od najnowszej.
+            najnowsza_data: Najnowsza data opinii produktu.
+        """
+        nowe = _bez_powtorzen(nowe)
+        with self._transakcja() as polaczenie:
+            pierwsza = polaczenie.execute("SELECT MIN(pozycja) FROM opinie WHERE ean = ?", (ean,)).fetchone()[0]
+            self._wstaw(polaczenie, ean, nowe, (pierwsza or 0) - len(nowe))
+            self._zapisz_produkt(polaczenie, ean, najnowsza_data)
+
+    def _wstaw(self, polaczenie, ean, opinie, pierwsza_pozycja):
+        # Zastępowane opinie dostają nowe rowid, więc ich stare wpisy w indeksie są usuwane,
+        # a po wstawieniu indeksowane są wszystkie wiersze o rowid większym niż dotychczasowe
+        zastepowane = ("ean = ? AND id_opinii IN (SELECT value FROM json_each(?))",
+                       (ean, json.dumps([opinia.id_opinii for opinia in opinie])))
+        polaczenie.execute(f"DELETE FROM opinie_fts WHERE rowid IN (SELECT rowid FROM opinie WHERE {zastepowane[0]})",
+                           zastepowane[1])
+        usuniete = _zmiana_agregatu(polaczenie, *zastepowane)
+        ostatni = polaczenie.execute("SELECT COALESCE(MAX(rowid), 0) FROM opinie").fetchone()[0]
+        polaczenie.executemany(
+            f"INSERT OR REPLACE INTO opinie (ean, pozycja, {_KOLUMNY_ZAPISU}) VALUES ({', '.join('?' * 20)})",
+            (
+                (ean, pozycja, opinia.id_opinii, opinia.autor, opinia.rekomendacja, opinia.gwiazdki,
+                 opinia.potwierdzony_zakup, opinia.data_wystawienia, opinia.czas_od_zakupu, opinia.pomocna,
+                 opinia.nie_pomocna, opinia.tresc, json.dumps(opinia.wady), json.dumps(opinia.zalety),
+                 opinia.data, opinia.data_zakupu, opinia.ocena, opinia.pomocne, opinia.niepomocne,
+                 opinia.potwierdzony)
+                for pozycja, opinia in enumerate(opinie, start=pierwsza_pozycja)
+            ),
+        )
+        polaczenie.execute(_INDEKSUJ, (ostatni,))
+        self._aktualizuj_agregat(polaczenie, ean, _zmiana_agregatu(polaczenie, "rowid > ?", (ostatni,)), usuniete)
+        self._oznacz_duplikaty(polaczenie, ean, opinie)
+
+    def _aktualizuj_agregat(self, polaczenie, ean, dodane=(), usuniete=()):
+        """
+        Dodaje do zestawienia produktu opinie dodane i odejmuje usunięte.
+
+        Args:
+            polaczenie: Połączenie w trakcie transakcji zapisu.
+            ean: Kod EAN produktu.
+            dodane: Wiersze zwrócone przez _zmiana_agregatu() dla dodanych opinii.
+            usuniete: Wiersze zwrócone przez _zmiana_agregatu() dla usuniętych opinii.
+        """
+        wiersz = polaczenie.execute(
+            "SELECT liczba_opinii, liczba_ocen, suma_ocen, rozklad, liczba_wad, liczba_zalet FROM agregaty WHERE ean = ?", (ean,)
+        ).fetchone()
+        liczba_opinii, liczba_ocen, suma_ocen, rozklad, liczba_wad, liczba_zalet = wiersz or (0, 0, 0.0, "{}", 0, 0)
+        rozklad = Counter(json.loads(rozklad))
+        for znak, wiersze in ((1, dodane), (-1, usuniete)):
+            for ocena, liczba, wady, zalety in wiersze:
+                liczba_opinii += znak * liczba
+                liczba_wad += znak * wady
+                liczba_zalet += znak * zalety
+                if ocena is not None:
+                    liczba_ocen += znak * liczba
+                    suma_ocen += znak * ocena * liczba
+                    rozklad[f"{ocena:g}"] += znak * liczba
+        rozklad = {ocena: liczba for ocena, liczba in sorted(rozklad.items(), key=lambda para: -float(para[0])) if liczba}
+        polaczenie.execute(
+            "INSERT INTO agregaty (ean, liczba_opinii, liczba_ocen, suma_ocen, rozklad, liczba_wad, liczba_zalet) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (ean) DO UPDATE SET liczba_opinii = excluded.liczba_opinii, "
+            "liczba_ocen = excluded.liczba_ocen, suma_ocen = excluded.suma_ocen, rozklad = excluded.rozklad, "
+            "liczba_wad = excluded.liczba_wad, liczba_zalet = excluded.liczba_zalet",
+            (ean, liczba_opinii, liczba_ocen, suma_ocen, json.dumps(rozklad), liczba_wad, liczba_zalet),
+        )
+
+    def _oznacz_duplikaty(self, polaczenie, ean, opinie):
+        """
+        Dodaje opinie do indeksu LSH i oznacza te, które są kopiami innych.
+
+        Kandydaci są wybierani z kubełków LSH (koszt nie zależy od liczby
+        wszystkich opinii), a potwierdzani przez porównanie podpisów MinHash.
+        Grupa podobnych opinii wskazuje w kolumnie duplikat najwcześniej
+        wystawioną opinię grupy, więc nowa, starsza opinia przejmuje rolę
+        oryginału, a łączone grupy dostają wspólny oryginał.
+        """
+        # Import na miejscu, bo numpy wczytuje się długo, a magazyn jest importowany przy starcie aplikacji
+        from duplikaty import podpis_opinii, klucze_pasm, podobienstwo, do_bajtow, z_bajtow, PROG_PODOBIENSTWA
+
+        identyfikatory = json.dumps([opinia.id_opinii for opinia in opinie])
+        for tabela in ("duplikaty_pasma", "duplikaty_podpisy"):
+            polaczenie.execute(
+                f"DELETE FROM {tabela} WHERE ean = ? AND id_opinii IN (SELECT value FROM json_each(?))", (ean, identyfikatory)
+            )
+        zmienione = set()
+        for opinia in opinie:
+            podpis = podpis_opinii(opinia)
+            if podpis is None:
+                continue
+            klucze = klucze_pasm(podpis)
+            kandydaci = polaczenie.execute(
+                f"SELECT DISTINCT s.ean, s.id_opinii, s.podpis FROM ({_wartosci(klucze)}) AS klucze "
+                "JOIN duplikaty_pasma AS p ON p.pasmo = klucze.column1 AND p.klucz = klucze.column2 "
+                "JOIN duplikaty_podpisy AS s ON s.ean = p.ean AND s.id_opinii = p.id_opinii",
+                [wartosc for klucz in klucze for wartosc in klucz],
+            ).fetchall()
+            podobne = [(e, i) for e, i, dane in kandydaci if podobienstwo(podpis, z_bajtow(dane)) >= PROG_PODOBIENSTWA]
+            if podobne:
+                zmienione |= self._polacz_duplikaty(polaczenie, (ean, opinia.id_opinii), podobne)
+            polaczenie.execute("INSERT INTO duplikaty_podpisy VALUES (?, ?, ?)", (ean, opinia.id_opinii, do_bajtow(podpis)))
+            polaczenie.executemany("INSERT INTO duplikaty_pasma VALUES (?, ?, ?, ?)",
+                                   [(pasmo, klucz, ean, opinia.id_opinii) for pasmo, klucz in klucze])
+        # Oznaczenia opinii innych produktów mogły się zmienić, więc ich opinie są usuwane z pamięci
+        with self._blokada:
+            for zmieniony in zmienione:
+                self._pamiec.pop(zmieniony, None)
+
+    def _polacz_duplikaty(self, polaczenie, nowa, podobne):
+        # Oryginały grup, do których należą podobne opinie, razem z nową opinią
+        wiersze = polaczenie.execute(
+            f"SELECT duplikat, ean, id_opinii FROM ({_wartosci(podobne)}) AS klucze "
+            "JOIN opinie ON opinie.ean = klucze.column1 AND opinie.id_opinii = klucze.column2",
+            [wartosc for klucz in podobne for wartosc in klucz],
+        ).fetchall()
+        oryginaly = {tuple(duplikat.split("/", 1)) if duplikat else (e, i) for duplikat, e, i in wiersze} | {nowa}
+        # Oryginałem połączonej grupy jest najwcześniej wystawiona opinia (opinie bez daty na końcu)
+        daty = {(e, i): data for e, i, data in polaczenie.execute(
+            f"SELECT ean, id_opinii, data FROM ({_wartosci(oryginaly)}) AS klucze "
+            "JOIN opinie ON opinie.ean = klucze.column1 AND opinie.id_opinii = klucze.column2",
+            [wartosc for klucz in oryginaly for wartosc in klucz],
+        )}
+        oryginal = min(oryginaly, key=lambda klucz: (daty.get(klucz) is None, daty.get(klucz) or "", klucz))
+        zmienione = set()
+        for poprzedni in oryginaly - {oryginal}:
+            kursor = polaczenie.execute(
+                "UPDATE opinie SET duplikat = ? WHERE duplikat = ? OR (ean = ? AND id_opinii = ?) RETURNING ean",
+                ("/".join(oryginal), "/".join(poprzedni), *poprzedni),
+            )
+            zmienione.update(wiersz[0] for wiersz in kursor)
+        return zmienione
+
+    def _zapisz_produkt(self, polaczenie, ean, najnowsza_data):
+        # Liczba opinii pochodzi z zestawienia zaktualizowanego przez _wstaw()
+        liczba_opinii = polaczenie.execute("SELECT liczba_opinii FROM agregaty WHERE ean = ?", (ean,)).fetchone()[0]
+        pobrano = time.time()
+        polaczenie.execute(
+            "INSERT INTO produkty (ean, pobrano, najnowsza_data, liczba_opinii) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (ean) DO UPDATE SET pobrano = excluded.pobrano, "
+            "najnowsza_data = COALESCE(excluded.najnowsza_data, produkty.najnowsza_data), "
+            "liczba_opinii = excluded.liczba_opinii",
+            (ean, pobrano, najnowsza_data, liczba_opinii),
+        )
+        polaczenie.execute("UPDATE agregaty SET pobrano = ? WHERE ean = ?", (pobrano, ean))
+        with self._blokada:
+            self._pamiec.pop(ean, None)
+
+    def _transakcja(self):
+        return _Transakcja(self._polaczenie())
+
+    def produkt(self, ean):
+        """
+        Zwraca informacje o zapisanym produkcie.
+
+        Args:
+            ean: Kod EAN produktu.
+
+        Returns:
+            Słownik z polami ean, pobrano, najnowsza_data i liczba_opinii
+            albo None, gdy produktu nie ma w magazynie.
+        """
+        wiersz = self._polaczenie().execute(
+            "SELECT ean, pobrano, najnowsza_data, liczba_opinii FROM produkty WHERE ean = ?", (ean,)
+        ).fetchone()
+        if wiersz is None:
+            return None
+        return dict(zip(("ean", "pobrano", "najnowsza_data", "liczba_opinii"), wiersz))
+
+    def lista_produktow(self, sortuj="pobrano", malejaco=True, limit=ROZMIAR_STRONY, przesuniecie=0):
+        """
+        Wybiera stronę listy zapisanych produktów z zestawieniami ich opinii.
+
+        Zestawienia są utrzymywane przy każdym zapisie opinii, więc koszt
+        nie zależy od liczby opinii, a sortowanie korzysta z indeksów.
+
+        Args:
+            sortuj: "pobrano", "liczba_opinii", "srednia" albo "ean".
+            malejaco: Czy sortować malejąco.
+            limit: Maksymalna liczba produktów na stronie.
+            przesuniecie: Liczba pominiętych produktów.
+
+        Returns:
+            Obiekt ListaProduktow z listą obiektów Agregat i liczbą wszystkich produktów.
+
+        Raises:
+            ValueError: Przy nieznanym sortowaniu.
+        """
+        if sortuj not in _SORTOWANIE_PRODUKTOW:
+            raise ValueError(f"Nieznane sortowanie: {sortuj}")
+        kierunek = "DESC" if malejaco else "ASC"
+        # Kod EAN rozstrzyga remisy, tak jak w indeksach zestawień
+        kolejnosc = ", ".join(f"{klucz} {kierunek}" for klucz in dict.fromkeys((_SORTOWANIE_PRODUKTOW[sortuj], "ean")))
+        polaczenie = self._polaczenie()
+        wiersze = polaczenie.execute(
+            "SELECT ean, liczba_opinii, liczba_ocen, suma_ocen, rozklad, liczba_wad, liczba_zalet, pobrano FROM agregaty "
+            f"ORDER BY {kolejnosc} LIMIT ? OFFSET ?",
+            (limit, przesuniecie),
+        ).fetchall()
+        liczba = polaczenie.execute("SELECT COUNT(*) FROM agregaty").fetchone()[0]
+        return ListaProduktow([_agregat(wiersz) for wiersz in wiersze], liczba)
+
+    def stan(self, ean):
+        """
+        Zwraca dane potrzebne do przyrostowego pobierania opinii produktu.
+
+        Args:
+            ean: Kod EAN produktu.
+
+        Returns:
+            Krotka (zbiór identyfikatorów zapisanych opinii, najnowsza data albo None).
+        """
+        polaczenie = self._polaczenie()
+        znane = {wiersz[0] for wiersz in polaczenie.execute("SELECT id_opinii FROM opinie WHERE ean = ?", (ean,))}
+        produkt = self.produkt(ean)
+        return znane, produkt["najnowsza_data"] if produkt else None
+
+    def opinie(self, ean):
+        """
+        Zwraca zapisane opinie produktu, od najnowszej.
+
+        Args:
+            ean: Kod EAN produktu.
+
+        Returns:
+            Lista obiektów Opinia (pusta, gdy produktu nie ma w magazynie).
+        """
+        produkt = self.produkt(ean)
+        if produkt is None:
+            return []
+        with self._blokada:
+            wpis = self._pamiec.get(ean)
+            if wpis is not None and wpis[0] == produkt["pobrano"]:
+                self._pamiec.move_to_end(ean)
+                return wpis[1]
+
+        kursor = self._polaczenie().execute(f"SELECT {_KOLUMNY} FROM opinie WHERE ean = ? ORDER BY pozycja", (ean,))
+        opinie = [_opinia(wiersz) for wiersz in kursor]
+        with self._blokada:
+            self._pamiec[ean] = (produkt["pobrano"], opinie)
+            self._pamiec.move_to_end(ean)
+            while len(self._pamiec) > self.rozmiar_pamieci:
+                self._pamiec.popitem(last=False)
+        return opinie
+
+    def wiersze_statystyk(self, eany=None, bez_duplikatow=False):
+        """
+        Zwraca kolumny potrzebne do analizy statystycznej opinii.
+
+        Args:
+            eany: Lista kodów EAN; domyślnie wszystkie produkty.
+            bez_duplikatow: Czy pominąć opinie oznaczone jako kopie innych opinii.
+
+        Returns:
+            Lista krotek (ean, ocena, data, pomocne, niepomocne, potwierdzony).
+        """
+        warunki = []
+        parametry = ()
+        if eany is not None:
+            warunki.append("ean IN (SELECT value FROM json_each(?))")
+            parametry = (json.dumps(list(eany)),)
+        if bez_duplikatow:
+            warunki.append("duplikat IS NULL")
+        zapytanie = "SELECT ean, ocena, data, pomocne, niepomocne, potwierdzony FROM opinie"
+        if warunki:
+            zapytanie += " WHERE " + " AND ".join(warunki)
+        return self._polaczenie().execute(zapytanie + " ORDER BY ean, pozycja", parametry).fetchall()
+
+    def przebuduj_duplikaty(self):
+        """
+        Buduje od nowa indeks duplikatów i oznaczenia wszystkich opinii,
+        np. dla bazy utworzonej przed wprowadzeniem wykrywania duplikatów.
+
+        Opinie są indeksowane od najwcześniej wystawionej, więc oryginałem
+        każdej grupy od razu zostaje jej najstarsza opinia.
+
+        Returns:
+            Liczba zindeksowanych opinii.
+        """
+        with self._transakcja() as polaczenie:
+            wiersze = polaczenie.execute(f"SELECT ean, {_KOLUMNY} FROM opinie ORDER BY data IS NULL, data, ean, pozycja").fetchall()
+            polaczenie.execute("DELETE FROM duplikaty_pasma")
+            polaczenie.execute("DELETE FROM duplikaty_podpisy")
+            polaczenie.execute("UPDATE opinie SET duplikat = NULL WHERE duplikat IS NOT NULL")
+            for wiersz in wiersze:
+                self._oznacz_duplikaty(polaczenie, wiersz[0], [_opinia(wiersz[1:])])
+        with self._blokada:
+            self._pamiec.clear()
+        return len(wiersze)
+
+    def grupy_duplikatow(self, ean=None):
+        """
+        Zwraca grupy opinii oznaczonych jako kopie, od najliczniejszej.
+
+        Args:
+            ean: Opcjonalny kod EAN; zwracane są wtedy grupy z kopiami
+                w opiniach tego produktu.
+
+        Returns:
+            Lista krotek ("<ean>/<id oryginału>", lista "<ean>/<id kopii>").
+        """
+        zapytanie = "SELECT duplikat, ean || '/' || id_opinii FROM opinie WHERE duplikat IS NOT NULL"
+        parametry = ()
+        if ean is not None:
+            zapytanie = ("SELECT duplikat, ean || '/' || id_opinii FROM opinie WHERE duplikat IN "
+                         "(SELECT duplikat FROM opinie WHERE ean = ? AND duplikat IS NOT NULL)")
+            parametry = (ean,)
+        grupy = {}
+        for oryginal, kopia in self._polaczenie().execute(zapytanie + " ORDER BY duplikat, ean, pozycja", parametry):
+            grupy.setdefault(oryginal, []).append(kopia)
+        return sorted(grupy.items(), key=lambda grupa: -len(grupa[1]))
+
+    def zapytanie(self, ean, filtr=None, sortuj="pozycja", malejaco=False, limit=ROZMIAR_STRONY, po=None, przesuniecie=0):
+        """
+        Wybiera stronę opinii produktu spełniających kryteria filtra.
+
+        Filtrowanie i sortowanie odbywa się w bazie, z użyciem indeksów
+        (ean, kolumna sortowania, pozycja). Kolejne strony najlepiej pobierać
+        przez znacznik "po" (stronicowanie po kluczu), którego koszt nie
+        rośnie z numerem strony, w przeciwieństwie do przesunięcia.
+
+        Args:
+            ean: Kod EAN produktu.
+            filtr: Obiekt Filtr; domyślnie bez ograniczeń.
+            sortuj: "pozycja" (od najnowszej), "ocena", "data" albo "pomocne".
+            malejaco: Czy sortować malejąco.
+            limit: Maksymalna liczba opinii na stronie.
+            po: Znacznik "nastepna" z poprzedniej strony wyników.
+            przesuniecie: Liczba pominiętych opinii, gdy nie podano znacznika.
+
+        Returns:
+            Obiekt WynikZapytania z listą obiektów Opinia, liczbą wszystkich
+            pasujących opinii i znacznikiem następnej strony (None na końcu).
+        """
+        if sortuj not in _SORTOWANIE:
+            raise ValueError(f"Nieznane sortowanie: {sortuj}")
+        klucz = _SORTOWANIE[sortuj]
+        warunki, parametry = _warunki(ean, filtr or Filtr())
+        polaczenie = self._polaczenie()
+        liczba = polaczenie.execute(f"SELECT COUNT(*) FROM opinie WHERE {' AND '.join(warunki)}", parametry).fetchone()[0]
+
+        if po is not None:
+            po = _odczytaj_znacznik(po)
+            przesuniecie = 0
+        wiersze = _strona(polaczenie, warunki, parametry, klucz, malejaco, limit + 1, po, przesuniecie)
+
+        nastepna = None
+        if len(wiersze) > limit:
+            wiersze = wiersze[:limit]
+            nastepna = _zapisz_znacznik(wiersze[-1][-2], wiersze[-1][-1])
+        return WynikZapytania([_opinia(wiersz[:-2]) for wiersz in wiersze], liczba, nastepna)
+
+    def strumien(self, ean, filtr=None, sortuj="pozycja", malejaco=False, porcja=ROZMIAR_PORCJI):
+        """
+        Przegląda wszystkie opinie produktu spełniające kryteria filtra.
+
+        Opinie są odczytywane porcjami, stronicowaniem po kluczu jak
+        w zapytanie(), więc w pamięci jest naraz tylko jedna porcja, a między
+        porcjami nie jest utrzymywana otwarta transakcja odczytu.
+
+        Args:
+            ean: Kod EAN produktu.
+            filtr: Obiekt Filtr; domyślnie bez ograniczeń.
+            sortuj: "pozycja" (od najnowszej), "ocena", "data" albo "pomocne".
+            malejaco: Czy sortować malejąco.
+            porcja: Liczba opinii odczytywanych jednym zapytaniem.
+
+        Returns:
+            Generator obiektów Opinia.
+
+        Raises:
+            ValueError: Przy nieznanym sortowaniu (od razu, a nie przy przeglądaniu).
+        """
+        if sortuj not in _SORTOWANIE:
+            raise ValueError(f"Nieznane sortowanie: {sortuj}")
+        return self._strumien(ean, filtr or Filtr(), _SORTOWANIE[sortuj], malejaco, porcja)
+
+    def _strumien(self, ean, filtr, klucz, malejaco, porcja):
+        po = None
+        while True:
+            warunki, parametry = _warunki(ean, filtr)
+            wiersze = _strona(self._polaczenie(), warunki, parametry, klucz, malejaco, porcja, po)
+            for wiersz in wiersze:
+                yield _opinia(wiersz[:-2])
+            if len(wiersze) < porcja:
+                return
+            po = wiersze[-1][-2], wiersze[-1][-1]
+
+    def szukaj(self, fraza, ean=None, pola=None, limit=20):
+        """
+        Wyszukuje opinie zawierające wszystkie słowa frazy, w dowolnej odmianie.
+
+        Wyniki są uporządkowane według trafności (BM25) i pochodzą
+        z indeksu pełnotekstowego aktualizowanego przy każdym zapisie opinii.
+
+        Args:
+            fraza: Szukane słowa; słowo zakończone "*" jest przedrostkiem.
+            ean: Opcjonalny kod EAN, do którego opinii zawęzić wyszukiwanie.
+            pola: Opcjonalna lista pól ("tresc", "wady", "zalety").
+            limit: Maksymalna liczba wyników.
+
+        Returns:
+            Lista obiektów Trafienie, od najbardziej trafnego.
+        """
+        wyrazenie = wyrazenie_fts(fraza, pola)
+        if wyrazenie is None:
+            return []
+        warunki = ["opinie_fts MATCH ?"]
+        parametry = [wyrazenie]
+        if ean is not None:
+            warunki.append("opinie.ean = ?")
+            parametry.append(ean)
+        kolumny = ", ".join(f"opinie.{kolumna.strip()}" for kolumna in _KOLUMNY.split(","))
+        wiersze = self._polaczenie().execute(
+            f"SELECT opinie.ean, opinie_fts.rank, {kolumny} FROM opinie_fts "
+            f"JOIN opinie ON opinie.rowid = opinie_fts.rowid WHERE {' AND '.join(warunki)} "
+            f"ORDER BY opinie_fts.rank LIMIT ?",
+            parametry + [limit],
+        )
+        return [Trafienie(wiersz[0], _opinia(wiersz[2:]), -wiersz[1]) for wiersz in wiersze]
+
+def _warunki(ean, filtr):
+    """
+    Zamienia filtr na warunki SQL z parametrami.
+
+    Warunki na ocenę i datę używają tych samych wyrażeń co indeksy.
+    """
+    warunki = ["ean = ?"]
+    parametry = [ean]
+    if filtr.ocena_od is not None:
+        warunki.append("COALESCE(ocena, -1) >= ?")
+        parametry.append(filtr.ocena_od)
+    if filtr.ocena_do is not None:
+        warunki.append("COALESCE(ocena, -1) <= ? AND ocena IS NOT NULL")
+        parametry.append(filtr.ocena_do)
+    if filtr.data_od is not None:
+        warunki.append("COALESCE(data, '') >= ?")
+        parametry.append(filtr.data_od)
+    if filtr.data_do is not None:
+        # Daty zawierają godzinę, więc górną granicą jest początek następnego dnia
+        warunki.append("COALESCE(data, '') < ? AND data IS NOT NULL")
+        parametry.append((datetime.date.fromisoformat(filtr.data_do) + datetime.timedelta(days=1)).isoformat())
+    if filtr.potwierdzone is not None:
+        warunki.append("potwierdzony = ?")
+        parametry.append(bool(filtr.potwierdzone))
+    if filtr.min_pomocnych is not None:
+        warunki.append("pomocne >= ?")
+        parametry.append(filtr.min_pomocnych)
+    if filtr.autor is not None:
+        warunki.append("autor = ? COLLATE NOCASE")
+        parametry.append(filtr.autor)
+    if filtr.rekomendacja is not None:
+        warunki.append("rekomendacja = ? COLLATE NOCASE")
+        parametry.append(filtr.rekomendacja)
+    if filtr.bez_duplikatow:
+        warunki.append("duplikat IS NULL")
+    return warunki, parametry
+
+def _bez_powtorzen(opinie):
+    """
+    Usuwa z listy opinie o powtórzonym identyfikatorze, np. opinię, która
+    przy równoległym pobieraniu przesunęła się na następną stronę.
+
+    Zostaje ostatnie wystąpienie, na jego miejscu, tak jak przy
+    INSERT OR REPLACE kolejnych wierszy.
+    """
+    ostatnie = {opinia.id_opinii: indeks for indeks, opinia in enumerate(opinie)}
+    if len(ostatnie) == len(opinie):
+        return opinie
+    return [opinia for indeks, opinia in enumerate(opinie) if ostatnie[opinia.id_opinii] == indeks]
+
+def _strona(polaczenie, warunki, parametry, klucz, malejaco, limit, po=None, przesuniecie=0):
+    """
+    Wybiera wiersze opinii spełniające warunki, z kolumnami _KOLUMNY oraz
+    wartością klucza sortowania i pozycją na końcu.
+
+    Args:
+        po: Krotka (wartość klucza, pozycja) ostatniego wiersza poprzedniej
+            strony albo None dla pierwszej strony.
+    """
+    kierunek = "DESC" if malejaco else "ASC"
+    if po is not None:
+        warunki = warunki + [f"({klucz}, pozycja) {'<' if malejaco else '>'} (?, ?)"]
+        parametry = parametry + list(po)
+    return polaczenie.execute(
+        f"SELECT {_KOLUMNY}, {klucz}, pozycja FROM opinie WHERE {' AND '.join(warunki)} "
+        f"ORDER BY {klucz} {kierunek}, pozycja {kierunek} LIMIT ? OFFSET ?",
+        parametry + [limit, przesuniecie],
+    ).fetchall()
+
+def _zmiana_agregatu(polaczenie, warunek, parametry):
+    # Wiersze (ocena, liczba opinii, liczba wad, liczba zalet) opinii spełniających warunek
+    return polaczenie.execute(_ZMIANA_AGREGATU.format(warunek=warunek), parametry).fetchall()
+
+def _agregat(wiersz):
+    ean, liczba_opinii, liczba_ocen, suma_ocen, rozklad, liczba_wad, liczba_zalet, pobrano = wiersz
+    return Agregat(ean, liczba_opinii, liczba_ocen, suma_ocen / liczba_ocen if liczba_ocen else None,
+                   {float(ocena): liczba for ocena, liczba in json.loads(rozklad).items()},
+                   liczba_wad, liczba_zalet, pobrano)
+
+def _wartosci(pary):
+    # Tabela VALUES z parametrami par (kolumny column1 i column2); złączenie z nią korzysta
+    # z indeksów, w przeciwieństwie do warunku (a, b) IN (VALUES ...)
+    return "VALUES " + ", ".join(["(?, ?)"] * len(pary))
+
+def _zapisz_znacznik(wartosc, pozycja):
+    return base64.urlsafe_b64encode(json.dumps([wartosc, pozycja]).encode()).decode()
+
+def _odczytaj_znacznik(znacznik):
+    try:
+        wartosc, pozycja = json.loads(base64.urlsafe_b64decode(znacznik.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Nieprawidłowy znacznik strony")
+    return wartosc, pozycja
+
+def _opinia(wiersz):
+    """
+    Tworzy obiekt Opinia z wiersza z kolumnami _KOLUMNY.
+    """
+    (id_opinii, autor, rekomendacja, gwiazdki, potwierdzony_zakup, data_wystawienia, czas_od_zakupu,
+     pomocna, nie_pomocna, tresc, wady, zalety, data, data_zakupu, duplikat) = wiersz
+    return Opinia(id_opinii, autor, rekomendacja, gwiazdki, potwierdzony_zakup, data_wystawienia, czas_od_zakupu,
+                  pomocna, nie_pomocna, tresc, json.loads(wady), json.loads(zalety), data, data_zakupu, duplikat)
+
+class _Transakcja:
+    """
+    Menedżer kontekstu wykonujący blok w transakcji BEGIN IMMEDIATE.
+    """
+
+    def __init__(self, polaczenie):
+        self.polaczenie = polaczenie
+
+    def __enter__(self):
+        self.polaczenie.execute("BEGIN IMMEDIATE")
+        return self.polaczenie
+
+    def __exit__(self, typ, wartosc, slad):
+        self.polaczenie.execute("COMMIT" if typ is None else "ROLLBACK")
+        return False
+
+_domyslny_magazyn = None
+_blokada_domyslnego = threading.Lock()
+
+def domyslny_magazyn():
+    """
+    Zwraca współdzielony magazyn, tworząc go przy pierwszym użyciu.
+
+    Zmienna środowiskowa CENEO_MAGAZYN pozwala wskazać inny plik bazy.
+
+    Returns:
+        Obiekt Magazyn.
+    """
+    global _domyslny_magazyn
+    with _blokada_domyslnego:
+        if _domyslny_magazyn is None:
+            _domyslny_magazyn = Magazyn(os.environ.get("CENEO_MAGAZYN", DOMYSLNA_SCIEZKA))
+        return _domyslny_magazyn
@@ -0,0 +1,229 @@
+import functools
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+# Domyślne granice przedziałów histogramów czasu (w sekundach)
+PRZEDZIALY = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Odstęp między próbkami profilera, najkrótszy dozwolony odstęp i najdłuższy dozwolony czas profilowania
+ODSTEP_PROBEK = 0.005
+MIN_ODSTEP_PROBEK = 0.001
+MAKS_CZAS_PROFILOWANIA = 60
+
+class Licznik:
+    """
+    Licznik rosnący, osobny dla każdego zestawu wartości etykiet.
+    """
+
+    typ = "counter"
+
+    def __init__(self, nazwa, opis, etykiety=()):
+        self.nazwa = nazwa
+        self.opis = opis
+        self.etykiety = etykiety
+        self._wartosci = defaultdict(float)
+        self._blokada = threading.Lock()
+
+    def zwieksz(self, wartosc=1, **etykiety):
+        klucz = tuple(etykiety.get(nazwa, "") for nazwa in self.etykiety)
+        with self._blokada:
+            self._wartosci[klucz] += wartosc
+
+    def wartosc(self, **etykiety):
+        klucz = tuple(etykiety.get(nazwa, "") for nazwa in self.etykiety)
+        with self._blokada:
+            return self._wartosci.get(klucz, 0.0)
+
+    def probki(self):
+        with self._blokada:
+            wartosci = dict(self._wartosci)
+        for klucz, wartosc in sorted(wartosci.items()):
+            yield self.nazwa, dict(zip(self.etykiety, klucz)), wartosc
+
+class Histogram:
+    """
+    Histogram obserwacji (np. czasów), osobny dla każdego zestawu wartości etykiet.
+    """
+
+    typ = "histogram"
+
+    def __init__(self, nazwa, opis, etykiety=(), przedzialy=PRZEDZIALY):
+        self.nazwa = nazwa
+        self.opis = opis
+        self.etykiety = etykiety
+        self.przedzialy = tuple(przedzialy)
+        # Dla każdego klucza: liczby obserwacji w przedziałach, suma i liczba obserwacji
+        self._serie = {}
+        self._blokada = threading.Lock()
+
+    def obserwuj(self, wartosc, **etykiety):
+        klucz = tuple(etykiety.get(nazwa, "") for nazwa in self.etykiety)
+        with self._blokada:
+            seria = self._serie.get(klucz)
+            if seria is None:
+                seria = self._serie[klucz] = [[0] * len(self.przedzialy), 0.0, 0]
+            for indeks, granica in enumerate(self.przedzialy):
+                if wartosc <= granica:
+                    seria[0][indeks] += 1
+                    break
+            seria[1] += wartosc
+            seria[2] += 1
+
+    def probki(self):
+        with self._blokada:
+            serie = {klucz: (list(seria[0]), seria[1], seria[2]) for klucz, seria in self._serie.items()}
+        for klucz, (liczby, suma, liczba) in sorted(serie.items()):
+            etykiety = dict(zip(self.etykiety, klucz))
+            skumulowana = 0
+            for granica, ile in zip(self.przedzialy, liczby):
+                skumulowana += ile
+                yield f"{self.nazwa}_bucket", dict(etykiety, le=f"{granica:g}"), skumulowana
+            yield f"{self.nazwa}_bucket", dict(etykiety, le="+Inf"), liczba
+            yield f"{self.nazwa}_sum", etykiety, suma
+            yield f"{self.nazwa}_count", etykiety, liczba
+
+class Wskaznik:
+    """
+    Wartość bieżąca wyliczana przez funkcję w chwili odczytu metryk.
+    """
+
+    typ = "gauge"
+
+    def __init__(self, nazwa, opis, funkcja):
+        self.nazwa = nazwa
+        self.opis = opis
+        self.funkcja = funkcja
+
+    def probki(self):
+        wartosc = self.funkcja()
+        if wartosc is not None:
+            yield self.nazwa, {}, wartosc
+
+class Rejestr:
+    """
+    Zbiór metryk udostępnianych w formacie tekstowym Prometheusa.
+    """
+
+    def __init__(self):
+        self._metryki = {}
+        self._blokada = threading.Lock()
+
+    def _dodaj(self, metryka):
+        with self._blokada:
+            # Ponowna rejestracja (np. po przeładowaniu modułu) zwraca istniejącą metrykę
+            return self._metryki.setdefault(metryka.nazwa, metryka)
+
+    def licznik(self, nazwa, opis, etykiety=()):
+        return self._dodaj(Licznik(nazwa, opis, etykiety))
+
+    def histogram(self, nazwa, opis, etykiety=(), przedzialy=PRZEDZIALY):
+        return self._dodaj(Histogram(nazwa, opis, etykiety, przedzialy))
+
+    def wskaznik(self, nazwa, opis, funkcja):
+        return self._dodaj(Wskaznik(nazwa, opis, funkcja))
+
+    def tekst(self):
+        """
+        Zwraca wszystkie metryki w formacie tekstowym Prometheusa (wersja 0.0.4).
+        """
+        with self._blokada:
+            metryki = sorted(self._metryki.values(), key=lambda metryka: metryka.nazwa)
+        wiersze = []
+        for metryka in metryki:
+            wiersze.append(f"# HELP {metryka.nazwa} {metryka.opis}")
+            wiersze.append(f"# TYPE {metryka.nazwa} {metryka.typ}")
+            for nazwa, etykiety, wartosc in metryka.probki():
+                wiersze.append(f"{nazwa}{_etykiety(etykiety)} {_wartosc(wartosc)}")
+        return "\n".join(wiersze) + "\n"
+
+def _wartosc(wartosc):
+    # Pełna wartość: zapis "%g" ma tylko 6 cyfr znaczących, przez co duże liczniki stoją w miejscu
+    wartosc = float(wartosc)
+    return str(int(wartosc)) if wartosc.is_integer() else repr(wartosc)
+
+def _etykiety(etykiety):
+    if not etykiety:
+        return ""
+    pary = ",".join(
+        f'{nazwa}="{str(wartosc).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34)).replace(chr(10), " ")}"'
+        for nazwa, wartosc in etykiety.items()
+    )
+    return "{" + pary + "}"
+
+rejestr = Rejestr()
+
+CZAS_ETAPU = rejestr.histogram("ceneo_etap_sekundy", "Czas etapów pobierania i przetwarzania opinii.", ("etap",))
+BLEDY = rejestr.licznik("ceneo_bledy_total", "Liczba wyjątków zgłoszonych w etapach.", ("etap",))
+
+class _PomiarEtapu:
+    """
+    Menedżer kontekstu i dekorator mierzący czas etapu i liczący jego błędy.
+    """
+
+    def __init__(self, etap):
+        self.etap = etap
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, typ, wartosc, slad):
+        CZAS_ETAPU.obserwuj(time.perf_counter() - self._start, etap=self.etap)
+        if typ is not None:
+            BLEDY.zwieksz(etap=self.etap)
+        return False
+
+    def __call__(self, funkcja):
+        @functools.wraps(funkcja)
+        def opakowana(*args, **kwargs):
+            with _PomiarEtapu(self.etap):
+                return funkcja(*args, **kwargs)
+        return opakowana
+
+def etap(nazwa):
+    """
+    Mierzy czas etapu i liczy zgłoszone w nim wyjątki.
+
+    Można go użyć jako menedżera kontekstu (with etap("parsowanie"): ...)
+    albo dekoratora funkcji (@etap("zapis_json")).
+
+    Args:
+        nazwa: Nazwa etapu, używana jako etykieta metryk.
+    """
+    return _PomiarEtapu(nazwa)
+
+def profiluj(sekundy, odstep=ODSTEP_PROBEK, pomin_watek=None):
+    """
+    Profiler próbkujący: co odstep sekund zapisuje stosy wywołań wszystkich
+    wątków, nie spowalniając samego kodu tak jak profiler deterministyczny.
+
+    Args:
+        sekundy: Czas profilowania (co najwyżej MAKS_CZAS_PROFILOWANIA).
+        odstep: Odstęp między próbkami w sekundach (co najmniej
+            MIN_ODSTEP_PROBEK).
+        pomin_watek: Identyfikator wątku pomijanego w próbkach; domyślnie
+            wątek wywołujący.
+
+    Returns:
+        Tekst w formacie "złożonych stosów" (funkcje oddzielone średnikami
+        i liczba próbek), który można przekazać np. do flamegraph.pl
+        albo speedscope.
+    """
+    pomin_watek = threading.get_ident() if pomin_watek is None else pomin_watek
+    # Krótszy odstęp zamieniłby profilowanie w aktywne czekanie zajmujące cały rdzeń
+    odstep = max(odstep, MIN_ODSTEP_PROBEK)
+    stosy = Counter()
+    koniec = time.monotonic() + min(sekundy, MAKS_CZAS_PROFILOWANIA)
+    while time.monotonic() < koniec:
+        for id_watku, ramka in sys._current_frames().items():
+            if id_watku == pomin_watek:
+                continue
+            stos = []
+            while ramka is not None:
+                kod = ramka.f_code
+                stos.append(f"{kod.co_name} ({kod.co_filename.rsplit('/', 1)[-1]}:{kod.co_firstlineno})")
+                ramka = ramka.f_back
+            stosy[";".join(reversed(stos))] += 1
+        time.sleep(odstep)
+    return "".join(f"{stos} {liczba}\n" for stos, liczba in stosy.most_common())
@@ -0,0 +1,146 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+DOMYSLNA_SCIEZKA = os.path.join(".pamiec", "strony.sqlite")
+# Czas, przez który strona jest zwracana z pamięci bez pytania serwera
+DOMYSLNY_TTL = 600
+# Po przekroczeniu tego rozmiaru (po kompresji) usuwane są najdawniej używane strony
+DOMYSLNY_MAKS_ROZMIAR = 256 * 1024 * 1024
+
+Wpis = namedtuple("Wpis", ["tresc", "etag", "ostatnia_modyfikacja", "swiezy"])
+
+class PamiecHttp:
+    """
+    Trwała pamięć podręczna odpowiedzi HTTP w bazie SQLite.
+
+    Treść stron jest przechowywana po kompresji zlib, kluczem jest adres URL.
+    Strony starsze niż TTL są rewalidowane zapytaniem warunkowym (ETag,
+    Last-Modified), a po przekroczeniu limitu rozmiaru usuwane są strony
+    najdawniej używane (LRU).
+    """
+
+    def __init__(self, sciezka=DOMYSLNA_SCIEZKA, ttl=DOMYSLNY_TTL, maks_rozmiar=DOMYSLNY_MAKS_ROZMIAR):
+        self.sciezka = sciezka
+        self.ttl = ttl
+        self.maks_rozmiar = maks_rozmiar
+        self.trafienia = 0
+        self.rewalidacje = 0
+        self.chybienia = 0
+        self._blokada = threading.Lock()
+
+        katalog = os.path.dirname(sciezka)
+        if katalog:
+            os.makedirs(katalog, exist_ok=True)
+        self._polaczenie = sqlite3.connect(sciezka, check_same_thread=False, isolation_level=None)
+        self._polaczenie.execute("PRAGMA journal_mode=WAL")
+        self._polaczenie.execute(
+            "CREATE TABLE IF NOT EXISTS odpowiedzi ("
+            " url TEXT PRIMARY KEY,"
+            " tresc BLOB NOT NULL,"
+            " etag TEXT,"
+            " ostatnia_modyfikacja TEXT,"
+            " zapisano REAL NOT NULL,"
+            " uzyto REAL NOT NULL,"
+            " rozmiar INTEGER NOT NULL)"
+        )
+        self._polaczenie.execute("CREATE INDEX IF NOT EXISTS odpowiedzi_uzyto ON odpowiedzi (uzyto)")
+        self._rozmiar = self._polaczenie.execute("SELECT COALESCE(SUM(rozmiar), 0) FROM odpowiedzi").fetchone()[0]
+
+    def odczytaj(self, url):
+        """
+        Odczytuje stronę z pamięci.
+
+        Args:
+            url: Adres URL strony.
+
+        Returns:
+            Obiekt Wpis albo None, gdy strony nie ma w pamięci.
+        """
+        teraz = time.time()
+        with self._blokada:
+            wiersz = self._polaczenie.execute(
+                "SELECT tresc, etag, ostatnia_modyfikacja, zapisano FROM odpowiedzi WHERE url = ?", (url,)
+            ).fetchone()
+            if wiersz is None:
+                return None
+            self._polaczenie.execute("UPDATE odpowiedzi SET uzyto = ? WHERE url = ?", (teraz, url))
+            swiezy = teraz - wiersz[3] < self.ttl
+            if swiezy:
+                self.trafienia += 1
+        return Wpis(zlib.decompress(wiersz[0]), wiersz[1], wiersz[2], swiezy)
+
+    def zapisz(self, url, tresc, etag=None, ostatnia_modyfikacja=None):
+        """
+        Zapisuje pobraną stronę w pamięci.
+
+        Args:
+            url: Adres URL strony.
+            tresc: Treść strony w postaci bajtów.
+            etag: Wartość nagłówka ETag odpowiedzi.
+            ostatnia_modyfikacja: Wartość nagłówka Last-Modified odpowiedzi.
+        """
+        skompresowana = zlib.compress(tresc)
+        teraz = time.time()
+        with self._blokada:
+            self.chybienia += 1
+            poprzedni = self._polaczenie.execute("SELECT rozmiar FROM odpowiedzi WHERE url = ?", (url,)).fetchone()
+            self._polaczenie.execute(
+                "INSERT OR REPLACE INTO odpowiedzi VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, skompresowana, etag, ostatnia_modyfikacja, teraz, teraz, len(skompresowana)),
+            )
+            self._rozmiar += len(skompresowana) - (poprzedni[0] if poprzedni else 0)
+            if self._rozmiar > self.maks_rozmiar:
+                self._usun_najdawniej_uzyte()
+
+    def odswiez(self, url):
+        """
+        Oznacza stronę jako świeżą po odpowiedzi 304 Not Modified.
+
+        Args:
+            url: Adres URL strony.
+        """
+        teraz = time.time()
+        with self._blokada:
+            self.rewalidacje += 1
+            self._polaczenie.execute("UPDATE odpowiedzi SET zapisano = ?, uzyto = ? WHERE url = ?", (teraz, teraz, url))
+
+    def _usun_najdawniej_uzyte(self):
+        # Usuwanie do 90% limitu, żeby nie czyścić pamięci przy każdym zapisie
+        docelowy = self.maks_rozmiar * 0.9
+        kursor = self._polaczenie.execute("SELECT url, rozmiar FROM odpowiedzi ORDER BY uzyto")
+        do_usuniecia = []
+        for url, rozmiar in kursor:
+            if self._rozmiar <= docelowy:
+                break
+            do_usuniecia.append((url,))
+            self._rozmiar -= rozmiar
+        kursor.close()
+        self._polaczenie.executemany("DELETE FROM odpowiedzi WHERE url = ?", do_usuniecia)
+
+    def statystyki(self):
+        """
+        Zwraca liczniki trafień i chybień pamięci.
+
+        Returns:
+            Słownik z licznikami, współczynnikiem trafień i rozmiarem pamięci.
+        """
+        with self._blokada:
+            zapytania = self.trafienia + self.rewalidacje + self.chybienia
+            return {
+                "trafienia": self.trafienia,
+                "rewalidacje": self.rewalidacje,
+                "chybienia": self.chybienia,
+                "wspolczynnik_trafien": (self.trafienia + self.rewalidacje) / zapytania if zapytania else 0.0,
+                "rozmiar": self._rozmiar,
+            }
+
+    def zamknij(self):
+        """
+        Zamyka połączenie z bazą pamięci.
+        """
+        with self._blokada:
+            self._polaczenie.close()
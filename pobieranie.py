@@ -0,0 +1,348 @@
+import email.utils
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from pamiec_podreczna import PamiecHttp, DOMYSLNA_SCIEZKA
+from metryki import etap, rejestr
+
+# Domyślne ograniczenia, dobrane tak, żeby nie przeciążać serwisu Ceneo
+MAKS_POLACZEN = 8
+ZAPYTAN_NA_SEKUNDE = 5.0
+# Limity czasu nawiązania połączenia i odczytu odpowiedzi (w sekundach)
+LIMIT_CZASU = (5.0, 30.0)
+# Ponowienia zapytania po błędzie sieci, przeciążeniu lub odmowie serwisu
+PONOWIENIA = 4
+OPOZNIENIE_POCZATKOWE = 0.5
+MAKS_OPOZNIENIE = 60.0
+# Kody odpowiedzi, po których zapytanie jest ponawiane; oznaczają też przeciążenie serwisu
+KODY_PONAWIANE = frozenset((429, 500, 502, 503, 504))
+
+NAGLOWKI = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) Projekt_Ceneo",
+    "Accept-Language": "pl-PL,pl;q=0.9",
+}
+
+ZAPYTANIA = rejestr.licznik("ceneo_zapytania_http_total", "Liczba zapytań HTTP do serwisu według kodu odpowiedzi.", ("kod",))
+POBRANE_BAJTY = rejestr.licznik("ceneo_pobrane_bajty_total", "Liczba bajtów treści pobranych z sieci.")
+PAMIEC = rejestr.licznik("ceneo_pamiec_stron_total", "Odczyty stron według wyniku w pamięci podręcznej.", ("wynik",))
+PONOWIONE = rejestr.licznik("ceneo_ponowienia_total", "Liczba ponowionych zapytań według przyczyny.", ("przyczyna",))
+
+def _wspolczynnik_trafien():
+    # Trafieniem jest każda strona, której treść nie musiała zostać pobrana ponownie
+    trafienia = PAMIEC.wartosc(wynik="swieza") + PAMIEC.wartosc(wynik="niezmieniona")
+    wszystkie = trafienia + PAMIEC.wartosc(wynik="chybienie") + PAMIEC.wartosc(wynik="zmieniona")
+    return trafienia / wszystkie if wszystkie else None
+
+rejestr.wskaznik("ceneo_pamiec_stron_wspolczynnik_trafien",
+                 "Udział stron odczytanych z pamięci podręcznej bez ponownego pobierania treści.", _wspolczynnik_trafien)
+
+class OgranicznikTempa:
+    """
+    Ogranicza liczbę zapytań na sekundę, osobno dla każdego hosta.
+    """
+
+    def __init__(self, zapytan_na_sekunde):
+        self.odstep = 1.0 / zapytan_na_sekunde if zapytan_na_sekunde else 0.0
+        self._nastepny_termin = {}
+        self._blokada = threading.Lock()
+
+    def czekaj(self, url):
+        """
+        Wstrzymuje wątek do chwili, w której wolno wysłać zapytanie do hosta.
+
+        Args:
+            url: Adres URL, pod który zostanie wysłane zapytanie.
+        """
+        host = urlsplit(url).netloc
+        with self._blokada:
+            teraz = time.monotonic()
+            termin = max(teraz, self._nastepny_termin.get(host, teraz))
+            if self.odstep:
+                self._nastepny_termin[host] = termin + self.odstep
+        if termin > teraz:
+            time.sleep(termin - teraz)
+
+    def wstrzymaj(self, url, sekundy):
+        """
+        Wstrzymuje wszystkie zapytania do hosta na podany czas (np. według
+        nagłówka Retry-After).
+
+        Args:
+            url: Adres URL, którego host zostanie wstrzymany.
+            sekundy: Czas wstrzymania w sekundach.
+        """
+        host = urlsplit(url).netloc
+        with self._blokada:
+            termin = time.monotonic() + sekundy
+            self._nastepny_termin[host] = max(termin, self._nastepny_termin.get(host, termin))
+
+class RegulatorWspolbieznosci:
+    """
+    Dostosowuje liczbę równoległych zapytań metodą AIMD: po każdej poprawnej
+    odpowiedzi limit rośnie o 1/limit (czyli o jedno zapytanie na każdą
+    pełną turę), a po oznace przeciążenia spada o połowę.
+
+    Oznaki przeciążenia z zapytań wysłanych przed ostatnim zmniejszeniem
+    limitu są pomijane, bo dotyczą jeszcze poprzedniego, większego limitu.
+    """
+
+    def __init__(self, maks):
+        self.maks = maks
+        self.limit = float(maks)
+        self._w_toku = 0
+        self._numer = 0
+        self._ostatnie_zmniejszenie = 0
+        self._warunek = threading.Condition()
+
+    def zajmij(self):
+        """
+        Czeka, aż liczba zapytań w toku spadnie poniżej bieżącego limitu.
+
+        Returns:
+            Numer zapytania, który trzeba przekazać do zwolnij().
+        """
+        with self._warunek:
+            while self._w_toku >= int(self.limit):
+                self._warunek.wait()
+            self._w_toku += 1
+            self._numer += 1
+            return self._numer
+
+    def zwolnij(self, numer, przeciazenie=False):
+        """
+        Zwalnia miejsce zajęte przez zakończone zapytanie i koryguje limit.
+
+        Args:
+            numer: Numer zapytania zwrócony przez zajmij().
+            przeciazenie: Czy odpowiedź wskazywała na przeciążenie serwisu
+                (odmowa, błąd serwera, przekroczony czas, zerwane połączenie).
+        """
+        with self._warunek:
+            self._w_toku -= 1
+            if przeciazenie:
+                if numer > self._ostatnie_zmniejszenie:
+                    self.limit = max(1.0, self.limit / 2)
+                    self._ostatnie_zmniejszenie = self._numer
+            else:
+                self.limit = min(float(self.maks), self.limit + 1 / self.limit)
+            self._warunek.notify_all()
+
+class Pobieracz:
+    """
+    Pobiera strony przez wspólną sesję HTTP (keep-alive) z ograniczoną
+    liczbą równoległych połączeń i limitem zapytań na host.
+
+    Opcjonalna pamięć podręczna (PamiecHttp) pozwala pominąć sieć dla stron
+    pobranych niedawno, a starsze strony rewaliduje zapytaniem warunkowym.
+    Opcjonalne archiwum (Archiwum) zachowuje każdą pobraną stronę z opiniami
+    do późniejszego ponownego wyodrębnienia bez dostępu do sieci.
+
+    Zapytania mają limit czasu. Po błędzie sieci albo odpowiedzi z kodem
+    z KODY_PONAWIANE są ponawiane po losowo rozrzuconym, wykładniczo rosnącym
+    opóźnieniu, a nagłówek Retry-After wstrzymuje zapytania do całego hosta.
+    Liczba równoległych zapytań maleje przy oznakach przeciążenia i wraca
+    do maks_polaczen, gdy serwis odpowiada poprawnie.
+    """
+
+    def __init__(self, maks_polaczen=MAKS_POLACZEN, zapytan_na_sekunde=ZAPYTAN_NA_SEKUNDE, pamiec=None,
+                 limit_czasu=LIMIT_CZASU, ponowienia=PONOWIENIA, opoznienie=OPOZNIENIE_POCZATKOWE, archiwum=None):
+        self.maks_polaczen = maks_polaczen
+        self.pamiec = pamiec
+        self.archiwum = archiwum
+        self.limit_czasu = limit_czasu
+        self.ponowienia = ponowienia
+        self.opoznienie = opoznienie
+        self.ogranicznik = OgranicznikTempa(zapytan_na_sekunde)
+        self.regulator = RegulatorWspolbieznosci(maks_polaczen)
+        self.sesja = requests.Session()
+        self.sesja.headers.update(NAGLOWKI)
+        adapter = HTTPAdapter(pool_connections=maks_polaczen, pool_maxsize=maks_polaczen)
+        self.sesja.mount("https://", adapter)
+        self.sesja.mount("http://", adapter)
+        self._wykonawca = None
+        self._blokada = threading.Lock()
+
+    def pobierz(self, url):
+        """
+        Pobiera pojedynczą stronę.
+
+        Args:
+            url: Adres URL strony.
+
+        Returns:
+            Treść odpowiedzi w postaci bajtów.
+
+        Raises:
+            requests.HTTPError: Gdy serwis odpowiada kodem błędu spoza
+                KODY_PONAWIANE albo wciąż odpowiada kodem z KODY_PONAWIANE
+                po wyczerpaniu ponowień.
+            requests.RequestException: Gdy po wyczerpaniu ponowień nadal nie
+                udaje się połączyć albo przekroczono limit czasu.
+        """
+        with etap("pobieranie"):
+            tresc, poprawna = self._pobierz(url)
+        if poprawna and self.archiwum:
+            with etap("archiwizacja"):
+                self.archiwum.zapisz(url, tresc)
+        return tresc
+
+    def _pobierz(self, url):
+        wpis = self.pamiec.odczytaj(url) if self.pamiec else None
+        if wpis is not None and wpis.swiezy:
+            PAMIEC.zwieksz(wynik="swieza")
+            return wpis.tresc, True
+
+        naglowki = {}
+        if wpis is not None:
+            if wpis.etag:
+                naglowki["If-None-Match"] = wpis.etag
+            if wpis.ostatnia_modyfikacja:
+                naglowki["If-Modified-Since"] = wpis.ostatnia_modyfikacja
+
+        response = self._zapytanie(url, naglowki)
+        POBRANE_BAJTY.zwieksz(len(response.content))
+        if response.status_code == 304 and wpis is not None:
+            PAMIEC.zwieksz(wynik="niezmieniona")
+            self.pamiec.odswiez(url)
+            return wpis.tresc, True
+        # Strona błędu (np. 403 albo 404) nie jest ponawiana, ale nie może też trafić do parsera jako pusta strona opinii
+        response.raise_for_status()
+        if self.pamiec:
+            PAMIEC.zwieksz(wynik="zmieniona" if wpis is not None else "chybienie")
+            if response.status_code == 200:
+                self.pamiec.zapisz(url, response.content, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return response.content, response.status_code == 200
+
+    def _zapytanie(self, url, naglowki):
+        for proba in range(self.ponowienia + 1):
+            with etap("limit_tempa"):
+                self.ogranicznik.czekaj(url)
+            numer = self.regulator.zajmij()
+            przeciazenie = True
+            try:
+                response = self.sesja.get(url, headers=naglowki, timeout=self.limit_czasu)
+                przeciazenie = response.status_code in KODY_PONAWIANE
+            except (requests.ConnectionError, requests.Timeout) as blad:
+                if proba == self.ponowienia:
+                    raise
+                PONOWIONE.zwieksz(przyczyna="limit_czasu" if isinstance(blad, requests.Timeout) else "polaczenie")
+                time.sleep(self._opoznienie(proba))
+                continue
+            finally:
+                self.regulator.zwolnij(numer, przeciazenie)
+
+            ZAPYTANIA.zwieksz(kod=str(response.status_code))
+            if not przeciazenie:
+                return response
+            if proba == self.ponowienia:
+                response.raise_for_status()
+            PONOWIONE.zwieksz(przyczyna=str(response.status_code))
+            czekaj = _retry_after(response.headers.get("Retry-After"))
+            if czekaj is not None:
+                # Serwis sam podał czas przerwy; dotyczy ona wszystkich wątków pytających ten host
+                self.ogranicznik.wstrzymaj(url, min(czekaj, MAKS_OPOZNIENIE))
+            else:
+                time.sleep(self._opoznienie(proba))
+
+    def _opoznienie(self, proba):
+        # Pełny rozrzut losowy, żeby ponowienia wielu wątków nie trafiały do serwisu jednocześnie
+        return random.uniform(0, min(MAKS_OPOZNIENIE, self.opoznienie * 2 ** proba))
+
+    def pobierz_wiele(self, adresy):
+        """
+        Pobiera wiele stron równolegle, zachowując kolejność adresów.
+
+        W danej chwili w toku jest co najwyżej dwukrotność limitu połączeń,
+        więc pobrane, a jeszcze nieprzetworzone strony nie gromadzą się w pamięci.
+
+        Args:
+            adresy: Iterowalna kolekcja adresów URL.
+
+        Yields:
+            Krotki (url, treść) w kolejności adresów.
+        """
+        wykonawca = self._pobierz_wykonawce()
+        okno = deque()
+        for url in adresy:
+            okno.append((url, wykonawca.submit(self.pobierz, url)))
+            if len(okno) >= 2 * self.maks_polaczen:
+                url_gotowy, przyszlosc = okno.popleft()
+                yield url_gotowy, przyszlosc.result()
+        while okno:
+            url_gotowy, przyszlosc = okno.popleft()
+            yield url_gotowy, przyszlosc.result()
+
+    def _pobierz_wykonawce(self):
+        with self._blokada:
+            if self._wykonawca is None:
+                self._wykonawca = ThreadPoolExecutor(max_workers=self.maks_polaczen, thread_name_prefix="pobieracz")
+            return self._wykonawca
+
+    def zamknij(self):
+        """
+        Zamyka pulę wątków i połączenia sesji.
+        """
+        with self._blokada:
+            if self._wykonawca is not None:
+                self._wykonawca.shutdown(wait=True)
+                self._wykonawca = None
+        self.sesja.close()
+        if self.pamiec:
+            self.pamiec.zamknij()
+        if self.archiwum:
+            self.archiwum.zamknij()
+
+def _retry_after(wartosc):
+    """
+    Odczytuje nagłówek Retry-After (liczbę sekund albo datę HTTP).
+
+    Args:
+        wartosc: Wartość nagłówka albo None.
+
+    Returns:
+        Liczba sekund do odczekania albo None, gdy nagłówka brak lub jest niepoprawny.
+    """
+    if not wartosc:
+        return None
+    wartosc = wartosc.strip()
+    if wartosc.isdigit():
+        return float(wartosc)
+    try:
+        termin = email.utils.parsedate_to_datetime(wartosc)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, termin.timestamp() - time.time())
+
+_domyslny_pobieracz = None
+_blokada_domyslnego = threading.Lock()
+
+def domyslny_pobieracz():
+    """
+    Zwraca współdzielony pobieracz, tworząc go przy pierwszym użyciu.
+
+    Pamięć podręczna stron jest domyślnie włączona; zmienna środowiskowa
+    CENEO_PAMIEC wskazuje plik bazy, a pusta wartość ją wyłącza. Archiwum
+    stron jest domyślnie wyłączone; włącza je zmienna CENEO_ARCHIWUM
+    wskazująca katalog archiwum.
+
+    Returns:
+        Obiekt Pobieracz z domyślnymi ustawieniami.
+    """
+    global _domyslny_pobieracz
+    with _blokada_domyslnego:
+        if _domyslny_pobieracz is None:
+            sciezka = os.environ.get("CENEO_PAMIEC", DOMYSLNA_SCIEZKA)
+            katalog_archiwum = os.environ.get("CENEO_ARCHIWUM")
+            archiwum = None
+            if katalog_archiwum:
+                # Import na miejscu, bo archiwum korzysta z modułu ceneo, który importuje ten moduł
+                from archiwum import Archiwum
+                archiwum = Archiwum(katalog_archiwum)
+            _domyslny_pobieracz = Pobieracz(pamiec=PamiecHttp(sciezka) if sciezka else None, archiwum=archiwum)
+        return _domyslny_pobieracz
@@ -0,0 +1,256 @@
+import argparse
+import json
+import numpy as np
+
+# Domyślne percentyle ocen i szerokość okna średniej kroczącej (w dniach)
+PERCENTYLE = (10, 25, 50, 75, 90)
+OKNO_DNI = 30
+# Szerokość przedziału histogramu ocen (oceny na Ceneo mają krok 0,5)
+KROK_HISTOGRAMU = 0.5
+
+class TabelaOpinii:
+    """
+    Kolumnowa reprezentacja opinii jednego lub wielu produktów.
+
+    Każde pole jest tablicą NumPy o długości równej liczbie opinii:
+    ean (kod produktu), ocena (float, NaN gdy brak), data (datetime64,
+    NaT gdy brak), pomocne i niepomocne (int) oraz potwierdzony (bool).
+    """
+
+    def __init__(self, ean, ocena, data, pomocne, niepomocne, potwierdzony):
+        self.ean = np.asarray(ean, dtype=object)
+        self.ocena = np.asarray(ocena, dtype=float)
+        self.data = np.asarray(data, dtype="datetime64[s]")
+        self.pomocne = np.asarray(pomocne, dtype=np.int64)
+        self.niepomocne = np.asarray(niepomocne, dtype=np.int64)
+        self.potwierdzony = np.asarray(potwierdzony, dtype=bool)
+
+    def __len__(self):
+        return len(self.ocena)
+
+    @classmethod
+    def z_wierszy(cls, wiersze):
+        """
+        Tworzy tabelę z krotek (ean, ocena, data, pomocne, niepomocne, potwierdzony),
+        np. z Magazyn.wiersze_statystyk.
+
+        Args:
+            wiersze: Iterowalna kolekcja krotek.
+
+        Returns:
+            Obiekt TabelaOpinii.
+        """
+        kolumny = list(zip(*wiersze)) or [()] * 6
+        ean, ocena, data, pomocne, niepomocne, potwierdzony = kolumny
+        ocena = [np.nan if wartosc is None else wartosc for wartosc in ocena]
+        return cls(ean, ocena, data, pomocne, niepomocne, potwierdzony)
+
+    @classmethod
+    def z_opinii(cls, opinie, ean=None):
+        """
+        Tworzy tabelę z obiektów Opinia jednego produktu.
+
+        Args:
+            opinie: Iterowalna kolekcja obiektów Opinia.
+            ean: Kod EAN produktu.
+
+        Returns:
+            Obiekt TabelaOpinii.
+        """
+        return cls.z_wierszy(
+            (ean, opinia.ocena, opinia.wystawiono, opinia.pomocne, opinia.niepomocne, opinia.potwierdzony)
+            for opinia in opinie
+        )
+
+def analiza(tabela, percentyle=PERCENTYLE, okno_dni=OKNO_DNI):
+    """
+    Wylicza statystyki opinii z tabeli kolumnowej.
+
+    Opinie bez oceny są pomijane w statystykach ocen, a opinie bez daty
+    w szeregu czasowym.
+
+    Args:
+        tabela: Obiekt TabelaOpinii.
+        percentyle: Percentyle ocen do wyliczenia.
+        okno_dni: Szerokość okna średniej kroczącej w dniach.
+
+    Returns:
+        Słownik z wynikami analizy (typy wbudowane, gotowe do zapisu w JSON).
+    """
+    oceny = tabela.ocena[~np.isnan(tabela.ocena)]
+    wynik = {
+        "liczba_opinii": len(tabela),
+        "liczba_ocen": int(oceny.size),
+        "srednia": None,
+        "mediana": None,
+        "wariancja": None,
+        "odchylenie_standardowe": None,
+        "percentyle": {},
+        "histogram": {},
+    }
+    if oceny.size:
+        wynik.update(
+            srednia=float(oceny.mean()),
+            mediana=float(np.median(oceny)),
+            wariancja=float(oceny.var()),
+            odchylenie_standardowe=float(oceny.std()),
+            percentyle={str(p): float(w) for p, w in zip(percentyle, np.percentile(oceny, percentyle))},
+            histogram=_histogram(oceny),
+        )
+    wynik["pomocnosc"] = _pomocnosc(tabela.pomocne, tabela.niepomocne)
+    wynik["potwierdzone"] = _podsumowanie(tabela, tabela.potwierdzony)
+    wynik["niepotwierdzone"] = _podsumowanie(tabela, ~tabela.potwierdzony)
+    wynik["szereg_czasowy"] = szereg_czasowy(tabela, okno_dni)
+    return wynik
+
+def statystyki_produktow(tabela):
+    """
+    Wylicza podstawowe statystyki osobno dla każdego produktu w tabeli,
+    grupując wszystkie opinie naraz zamiast w pętli po produktach.
+
+    Args:
+        tabela: Obiekt TabelaOpinii z opiniami wielu produktów.
+
+    Returns:
+        Słownik {ean: słownik ze statystykami produktu}.
+    """
+    if not len(tabela):
+        return {}
+    eany, grupy = np.unique(tabela.ean.astype(str), return_inverse=True)
+    liczba_grup = len(eany)
+    ma_ocene = ~np.isnan(tabela.ocena)
+    oceny = np.where(ma_ocene, tabela.ocena, 0.0)
+
+    liczba_opinii = np.bincount(grupy, minlength=liczba_grup)
+    liczba_ocen = np.bincount(grupy, weights=ma_ocene, minlength=liczba_grup)
+    suma = np.bincount(grupy, weights=oceny, minlength=liczba_grup)
+    suma_kwadratow = np.bincount(grupy, weights=oceny ** 2, minlength=liczba_grup)
+    pomocne = np.bincount(grupy, weights=tabela.pomocne, minlength=liczba_grup)
+    niepomocne = np.bincount(grupy, weights=tabela.niepomocne, minlength=liczba_grup)
+    potwierdzone = np.bincount(grupy, weights=tabela.potwierdzony, minlength=liczba_grup)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        srednia = suma / liczba_ocen
+        wariancja = suma_kwadratow / liczba_ocen - srednia ** 2
+        pomocnosc = pomocne / (pomocne + niepomocne)
+    mediana = _mediany_grup(grupy[ma_ocene], tabela.ocena[ma_ocene], liczba_grup)
+
+    return {
+        str(ean): {
+            "liczba_opinii": int(liczba_opinii[i]),
+            "liczba_ocen": int(liczba_ocen[i]),
+            "srednia": _float(srednia[i]),
+            "mediana": _float(mediana[i]),
+            "wariancja": _float(max(wariancja[i], 0.0)),
+            "wspolczynnik_pomocnosci": _float(pomocnosc[i]),
+            "udzial_potwierdzonych": float(potwierdzone[i] / liczba_opinii[i]),
+        }
+        for i, ean in enumerate(eany)
+    }
+
+def szereg_czasowy(tabela, okno_dni=OKNO_DNI):
+    """
+    Wylicza dzienne średnie ocen oraz średnią kroczącą z ostatnich okno_dni dni.
+
+    Args:
+        tabela: Obiekt TabelaOpinii.
+        okno_dni: Szerokość okna średniej kroczącej w dniach.
+
+    Returns:
+        Lista słowników z polami data, liczba, srednia i srednia_kroczaca,
+        po jednym dla każdego dnia z ocenionymi opiniami, od najstarszego.
+    """
+    wybrane = ~np.isnan(tabela.ocena) & ~np.isnat(tabela.data)
+    if not wybrane.any():
+        return []
+    dni = tabela.data[wybrane].astype("datetime64[D]")
+    pierwszy = dni.min()
+    numery = (dni - pierwszy).astype(np.int64)
+    liczba_dni = int(numery.max()) + 1
+    liczba = np.bincount(numery, minlength=liczba_dni)
+    suma = np.bincount(numery, weights=tabela.ocena[wybrane], minlength=liczba_dni)
+
+    # Sumy w oknie jako różnice sum skumulowanych
+    liczba_skumulowana = np.concatenate(([0], np.cumsum(liczba)))
+    suma_skumulowana = np.concatenate(([0.0], np.cumsum(suma)))
+    koniec = np.arange(1, liczba_dni + 1)
+    poczatek = np.maximum(koniec - okno_dni, 0)
+    liczba_w_oknie = liczba_skumulowana[koniec] - liczba_skumulowana[poczatek]
+    suma_w_oknie = suma_skumulowana[koniec] - suma_skumulowana[poczatek]
+
+    dni_z_opiniami = np.flatnonzero(liczba)
+    return [
+        {
+            "data": str(pierwszy + dzien),
+            "liczba": int(liczba[dzien]),
+            "srednia": float(suma[dzien] / liczba[dzien]),
+            "srednia_kroczaca": float(suma_w_oknie[dzien] / liczba_w_oknie[dzien]),
+        }
+        for dzien in dni_z_opiniami
+    ]
+
+def _histogram(oceny):
+    # Liczba opinii dla każdej oceny, w przedziałach o szerokości KROK_HISTOGRAMU
+    przedzialy = np.round(oceny / KROK_HISTOGRAMU).astype(np.int64)
+    wartosci, liczby = np.unique(przedzialy, return_counts=True)
+    return {float(wartosc * KROK_HISTOGRAMU): int(liczba) for wartosc, liczba in zip(wartosci, liczby)}
+
+def _pomocnosc(pomocne, niepomocne):
+    glosy = pomocne + niepomocne
+    suma_pomocnych = int(pomocne.sum())
+    suma_glosow = int(glosy.sum())
+    return {
+        "pomocne": suma_pomocnych,
+        "niepomocne": suma_glosow - suma_pomocnych,
+        "wspolczynnik": suma_pomocnych / suma_glosow if suma_glosow else None,
+        # Średnia z udziałów pomocnych głosów w opiniach, które dostały jakikolwiek głos
+        "sredni_udzial": float((pomocne[glosy > 0] / glosy[glosy > 0]).mean()) if suma_glosow else None,
+    }
+
+def _podsumowanie(tabela, maska):
+    oceny = tabela.ocena[maska]
+    oceny = oceny[~np.isnan(oceny)]
+    return {
+        "liczba_opinii": int(maska.sum()),
+        "srednia": float(oceny.mean()) if oceny.size else None,
+        "pomocnosc": _pomocnosc(tabela.pomocne[maska], tabela.niepomocne[maska]),
+    }
+
+def _mediany_grup(grupy, wartosci, liczba_grup):
+    # Mediany wszystkich grup naraz: po posortowaniu według (grupa, wartość)
+    # mediana każdej grupy leży w środku jej ciągłego fragmentu
+    mediany = np.full(liczba_grup, np.nan)
+    if not wartosci.size:
+        return mediany
+    kolejnosc = np.lexsort((wartosci, grupy))
+    posortowane = wartosci[kolejnosc]
+    liczby = np.bincount(grupy, minlength=liczba_grup)
+    poczatki = np.concatenate(([0], np.cumsum(liczby)[:-1]))
+    niepuste = liczby > 0
+    dolne = poczatki + (liczby - 1) // 2
+    gorne = poczatki + liczby // 2
+    mediany[niepuste] = (posortowane[dolne[niepuste]] + posortowane[gorne[niepuste]]) / 2
+    return mediany
+
+def _float(wartosc):
+    return None if np.isnan(wartosc) else float(wartosc)
+
+def main():
+    from magazyn import domyslny_magazyn
+
+    parser = argparse.ArgumentParser(description="Statystyki opinii zapisanych w magazynie.")
+    parser.add_argument("ean", nargs="*", help="kody EAN produktów (domyślnie wszystkie)")
+    parser.add_argument("--szczegoly", action="store_true", help="pełna analiza zamiast podsumowania produktów")
+    parser.add_argument("--okno", type=int, default=OKNO_DNI, help="okno średniej kroczącej w dniach")
+    parser.add_argument("--bez-duplikatow", action="store_true", help="pomiń opinie oznaczone jako kopie innych opinii")
+    argumenty = parser.parse_args()
+
+    tabela = TabelaOpinii.z_wierszy(domyslny_magazyn().wiersze_statystyk(argumenty.ean or None, argumenty.bez_duplikatow))
+    if argumenty.szczegoly:
+        wynik = analiza(tabela, okno_dni=argumenty.okno)
+    else:
+        wynik = statystyki_produktow(tabela)
+    print(json.dumps(wynik, indent=4, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+# Moduły projektu leżą w katalogu głównym, a nie w pakiecie
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ceneo import Opinia
+from magazyn import Magazyn
+
+def opinia(id_opinii, tresc="Bardzo dobry produkt, bateria trzyma długo, ekran jasny i czytelny", autor="Jan",
+           gwiazdki="4,5/5", data="2024-01-15 10:00:00", wady=(), zalety=()):
+    """
+    Tworzy opinię z domyślnymi wartościami pól nieistotnych w teście.
+    """
+    return Opinia(id_opinii, autor, "Polecam", gwiazdki, "Potwierdzone zakupem", "styczeń 2024", "3 dni",
+                  "2", "0", tresc, list(wady), list(zalety), data, None)
+
+@pytest.fixture
+def magazyn(tmp_path):
+    return Magazyn(str(tmp_path / "opinie.sqlite"))
+
+class SerwerTestowy:
+    """
+    Lokalny serwer HTTP odpowiadający według funkcji ustawionej w teście.
+
+    Funkcja obsluga(sciezka, naglowki) zwraca krotkę (kod, nagłówki, treść)
+    i może wstrzymać odpowiedź, żeby wywołać przekroczenie limitu czasu.
+
+    Attributes:
+        zapytania: Lista krotek (ścieżka, nagłówki) otrzymanych zapytań.
+    """
+
+    def __init__(self):
+        self.zapytania = []
+        self.obsluga = lambda sciezka, naglowki: (200, {}, b"strona")
+        serwer = self
+
+        class Obsluga(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *argumenty):
+                pass
+
+            def do_GET(self):
+                serwer.zapytania.append((self.path, dict(self.headers)))
+                kod, naglowki, tresc = serwer.obsluga(self.path, self.headers)
+                try:
+                    self.send_response(kod)
+                    for nazwa, wartosc in naglowki.items():
+                        self.send_header(nazwa, wartosc)
+                    self.send_header("Content-Length", str(len(tresc)))
+                    self.end_headers()
+                    self.wfile.write(tresc)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Klient zrezygnował po przekroczeniu limitu czasu
+                    pass
+
+        self._serwer = ThreadingHTTPServer(("127.0.0.1", 0), Obsluga)
+        self._serwer.daemon_threads = True
+        self.adres = f"http://127.0.0.1:{self._serwer.server_address[1]}"
+        threading.Thread(target=self._serwer.serve_forever, args=(0.05,), daemon=True).start()
+
+    def zamknij(self):
+        self._serwer.shutdown()
+        self._serwer.server_close()
+
+@pytest.fixture
+def serwer():
+    serwer = SerwerTestowy()
+    yield serwer
+    serwer.zamknij()
@@ -0,0 +1,32 @@
+import pytest
+
+from app import app
+
+@pytest.fixture
+def klient():
+    app.config["TESTING"] = True
+    return app.test_client()
+
+def test_profiler_domyslnie_wylaczony(klient, monkeypatch):
+    monkeypatch.setitem(app.config, "PROFILER", False)
+    assert klient.get("/metrics/profil?sekundy=0.1").status_code == 404
+
+def test_profiler_ogranicza_odstep_probek(klient, monkeypatch):
+    import metryki
+    odstepy = []
+    monkeypatch.setitem(app.config, "PROFILER", True)
+    monkeypatch.setattr(metryki.time, "sleep", odstepy.append)
+    odpowiedz = klient.get("/metrics/profil?sekundy=0.05&odstep=1e-9")
+    assert odpowiedz.status_code == 200
+    assert odstepy and min(odstepy) == metryki.MIN_ODSTEP_PROBEK
+
+def test_nieprawidlowa_liczba_gwiazdek_nie_jest_pomijana(klient):
+    odpowiedz = klient.post("/ekstrakcja_opinii", data={"ean": "e1", "filtr": "liczba_gwiazdek", "wartosc_filtru": "dużo"})
+    assert odpowiedz.status_code == 302
+    assert odpowiedz.headers["Location"] == "/ekstrakcja_opinii?ean=e1"
+    with klient.session_transaction() as sesja:
+        assert sesja["_flashes"] == [("error", "Nieprawidłowe parametry filtrowania!")]
+
+def test_liczba_gwiazdek_zamieniana_na_zakres_ocen(klient):
+    odpowiedz = klient.post("/ekstrakcja_opinii", data={"ean": "e1", "filtr": "liczba_gwiazdek", "wartosc_filtru": "4,5/5"})
+    assert odpowiedz.headers["Location"] == "/ekstrakcja_opinii?ean=e1&ocena_od=4.5&ocena_do=4.5"
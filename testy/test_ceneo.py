@@ -0,0 +1,73 @@
+import json
+import os
+
+import pytest
+import requests
+
+from ceneo import opinie_ze_strony, zapisz_do_json, zapisz_do_jsonl
+
+def strona(*opinie):
+    elementy = "".join(
+        f'<div class="user-post user-post__card js_product-review"{f" data-entry-id={chr(34)}{id_opinii}{chr(34)}" if id_opinii else ""}>'
+        f'<span class="user-post__author-name">{autor}</span><span class="user-post__score-count">4/5</span>'
+        f'<time datetime="2024-01-15 10:00:00">rok temu</time><div class="user-post__text">{tresc}</div></div>'
+        for id_opinii, autor, tresc in opinie
+    )
+    return f'<html><body><div class="js_product-reviews">{elementy}</div></body></html>'.encode()
+
+def test_opinie_bez_identyfikatora_maja_rozne_stale_identyfikatory(magazyn):
+    html = strona((None, "Jan", "Dobry"), (None, "Ewa", "Słaby"), ("123", "Ola", "Dobry"))
+    opinie = opinie_ze_strony(html)
+    identyfikatory = [opinia.id_opinii for opinia in opinie]
+    assert identyfikatory[2] == "123"
+    assert len(set(identyfikatory)) == 3
+    assert [opinia.id_opinii for opinia in opinie_ze_strony(html)] == identyfikatory
+    magazyn.zapisz_opinie("e1", opinie)
+    assert len(magazyn.opinie("e1")) == 3
+
+def test_eksport_json_zachowuje_dotychczasowe_klucze(tmp_path):
+    opinie = opinie_ze_strony(strona(("1", "Jan", "Dobry")))
+    zapisz_do_json(opinie, str(tmp_path / "opinie.json"))
+    zapisz_do_jsonl(opinie, str(tmp_path / "opinie.jsonl"))
+    klucze = ["id", "autor", "rekomendacja", "gwiazdki", "data_wystawienia", "czas_od_zakupu", "potwierdzony_zakup",
+              "pomocna", "nie_pomocna", "tresc", "wady", "zalety"]
+    with open(tmp_path / "opinie.json", encoding="utf-8") as f:
+        assert list(json.load(f)[0]) == klucze
+    with open(tmp_path / "opinie.jsonl", encoding="utf-8") as f:
+        assert list(json.loads(f.readline())) == klucze
+
+def test_blad_pobierania_nie_obcina_zapisanych_opinii(serwer, magazyn, monkeypatch):
+    import ceneo
+    from pobieranie import Pobieracz
+
+    def strona_produktu(numer):
+        pager = "".join(f'<a href="/e1/opinie-{n}">{n}</a>' for n in range(2, 4))
+        html = strona(*((f"{numer}-{i}", "Jan", f"Opinia {numer}-{i}") for i in range(20)))
+        return html.replace(b"</body>", pager.encode() + b"</body>")
+
+    def obsluga(sciezka, naglowki):
+        numer = int(sciezka.rsplit("-", 1)[1]) if "opinie-" in sciezka else 1
+        if numer == 3 and zablokowana:
+            return 403, {}, b"<html>Brak dostepu</html>"
+        return 200, {}, strona_produktu(numer)
+    serwer.obsluga = obsluga
+    monkeypatch.setattr(ceneo, "ADRES_CENEO", serwer.adres)
+    p = Pobieracz(zapytan_na_sekunde=0, opoznienie=0)
+
+    zablokowana = False
+    assert len(ceneo.aktualizuj_opinie("e1", p, tylko_nowe=False, magazyn=magazyn)) == 60
+    zablokowana = True
+    with pytest.raises(requests.HTTPError):
+        ceneo.aktualizuj_opinie("e1", p, tylko_nowe=False, magazyn=magazyn)
+    assert len(magazyn.opinie("e1")) == 60
+    p.zamknij()
+
+def test_wykresy_produktow_w_osobnych_plikach(tmp_path):
+    from ceneo import zapisz_wykresy_produktu
+    pierwsze = zapisz_wykresy_produktu("e1", 4.5, {4.5: 2}, str(tmp_path))
+    drugie = zapisz_wykresy_produktu("e2", 1.0, {1.0: 3}, str(tmp_path))
+    assert set(pierwsze).isdisjoint(drugie)
+    assert sorted(os.listdir(tmp_path)) == ["e1-dystrybucja_ocen.jpg", "e1-srednia_ocena.jpg",
+                                           "e2-dystrybucja_ocen.jpg", "e2-srednia_ocena.jpg"]
+    with open(pierwsze[0], "rb") as f:
+        assert f.read(2) == b"\xff\xd8"
@@ -0,0 +1,15 @@
+from conftest import opinia
+
+def test_powtorzony_identyfikator_w_jednym_zapisie(magazyn):
+    magazyn.zapisz_opinie("e1", [opinia("1", tresc="pierwsza wersja opinii o produkcie, zupełnie inna niż reszta"),
+                                 opinia("2"), opinia("1")])
+    opinie = magazyn.opinie("e1")
+    # Zostaje ostatnie wystąpienie, jak przy INSERT OR REPLACE
+    assert [o.id_opinii for o in opinie] == ["2", "1"]
+    assert opinie[1].tresc == opinia("1").tresc
+    assert magazyn.lista_produktow().produkty[0].liczba_opinii == 2
+
+def test_powtorzony_identyfikator_przy_dodawaniu(magazyn):
+    magazyn.zapisz_opinie("e1", [opinia("1")])
+    magazyn.dodaj_opinie("e1", [opinia("2"), opinia("2")])
+    assert [o.id_opinii for o in magazyn.opinie("e1")] == ["2", "1"]
@@ -0,0 +1,13 @@
+from metryki import Rejestr
+
+def test_duze_wartosci_bez_zaokraglania():
+    rejestr = Rejestr()
+    licznik = rejestr.licznik("bajty_total", "Bajty.")
+    histogram = rejestr.histogram("czas_sekundy", "Czas.", przedzialy=(0.5,))
+    licznik.zwieksz(123456789)
+    histogram.obserwuj(0.1)
+    histogram.obserwuj(0.2)
+    tekst = rejestr.tekst()
+    assert "bajty_total 123456789\n" in tekst
+    assert 'czas_sekundy_bucket{le="0.5"} 2\n' in tekst
+    assert f"czas_sekundy_sum {0.1 + 0.2!r}\n" in tekst
@@ -0,0 +1,69 @@
+import os
+import time
+
+from pamiec_podreczna import PamiecHttp
+from pobieranie import Pobieracz
+
+def pobieracz(tmp_path, **opcje):
+    return Pobieracz(zapytan_na_sekunde=0, pamiec=PamiecHttp(str(tmp_path / "strony.sqlite"), **opcje))
+
+def test_swieza_strona_bez_zapytania(tmp_path, serwer):
+    p = pobieracz(tmp_path, ttl=600)
+    assert p.pobierz(serwer.adres + "/1") == b"strona"
+    assert p.pobierz(serwer.adres + "/1") == b"strona"
+    assert len(serwer.zapytania) == 1
+    assert p.pamiec.statystyki()["trafienia"] == 1
+    p.zamknij()
+
+def test_rewalidacja_etag(tmp_path, serwer):
+    def obsluga(sciezka, naglowki):
+        if naglowki.get("If-None-Match") == '"w1"':
+            return 304, {"ETag": '"w1"'}, b""
+        return 200, {"ETag": '"w1"'}, b"tresc"
+    serwer.obsluga = obsluga
+    p = pobieracz(tmp_path, ttl=0)
+    assert p.pobierz(serwer.adres + "/1") == b"tresc"
+    assert p.pobierz(serwer.adres + "/1") == b"tresc"
+    assert serwer.zapytania[1][1]["If-None-Match"] == '"w1"'
+    statystyki = p.pamiec.statystyki()
+    assert (statystyki["chybienia"], statystyki["rewalidacje"]) == (1, 1)
+    p.zamknij()
+
+def test_rewalidacja_last_modified(tmp_path, serwer):
+    data = "Mon, 15 Jan 2024 10:00:00 GMT"
+
+    def obsluga(sciezka, naglowki):
+        if naglowki.get("If-Modified-Since") == data:
+            return 304, {}, b""
+        return 200, {"Last-Modified": data}, b"tresc"
+    serwer.obsluga = obsluga
+    p = pobieracz(tmp_path, ttl=0)
+    p.pobierz(serwer.adres + "/1")
+    assert p.pobierz(serwer.adres + "/1") == b"tresc"
+    assert "If-None-Match" not in serwer.zapytania[1][1]
+    assert p.pamiec.statystyki()["rewalidacje"] == 1
+    p.zamknij()
+
+def test_zmieniona_strona_zastepuje_wpis(tmp_path, serwer):
+    wersje = iter([b"stara", b"nowa"])
+    serwer.obsluga = lambda sciezka, naglowki: (200, {"ETag": '"x"'} if "If-None-Match" not in naglowki else {}, next(wersje))
+    p = pobieracz(tmp_path, ttl=0)
+    assert p.pobierz(serwer.adres + "/1") == b"stara"
+    assert p.pobierz(serwer.adres + "/1") == b"nowa"
+    assert p.pamiec.odczytaj(serwer.adres + "/1").tresc == b"nowa"
+    p.zamknij()
+
+def test_usuwanie_najdawniej_uzytych(tmp_path):
+    # Losowe bajty prawie się nie kompresują, więc każdy wpis zajmuje ok. 1000 bajtów
+    pamiec = PamiecHttp(str(tmp_path / "strony.sqlite"), maks_rozmiar=2500)
+    pamiec.zapisz("a", os.urandom(1000))
+    time.sleep(0.01)
+    pamiec.zapisz("b", os.urandom(1000))
+    time.sleep(0.01)
+    assert pamiec.odczytaj("a") is not None
+    time.sleep(0.01)
+    pamiec.zapisz("c", os.urandom(1000))
+    assert pamiec.odczytaj("b") is None
+    assert pamiec.odczytaj("a") is not None and pamiec.odczytaj("c") is not None
+    assert pamiec.statystyki()["rozmiar"] <= 2500 * 0.9
+    pamiec.zamknij()
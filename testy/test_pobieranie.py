@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from pobieranie import Pobieracz, RegulatorWspolbieznosci
+
+def pobieracz(**opcje):
+    return Pobieracz(zapytan_na_sekunde=0, opoznienie=0, **opcje)
+
+def kolejne(*odpowiedzi):
+    # Odpowiedzi kolejnych zapytań; ostatnia powtarza się do końca testu
+    odpowiedzi = list(odpowiedzi)
+    return lambda sciezka, naglowki: odpowiedzi.pop(0) if len(odpowiedzi) > 1 else odpowiedzi[0]
+
+def test_ponowienie_po_bledzie_serwera(serwer):
+    serwer.obsluga = kolejne((503, {}, b""), (500, {}, b""), (200, {}, b"strona"))
+    p = pobieracz()
+    assert p.pobierz(serwer.adres + "/1") == b"strona"
+    assert len(serwer.zapytania) == 3
+    p.zamknij()
+
+def test_retry_after_wstrzymuje_zapytania(serwer):
+    serwer.obsluga = kolejne((429, {"Retry-After": "1"}, b""), (200, {}, b"strona"))
+    p = pobieracz()
+    start = time.monotonic()
+    assert p.pobierz(serwer.adres + "/1") == b"strona"
+    assert time.monotonic() - start >= 0.9
+    assert len(serwer.zapytania) == 2
+    p.zamknij()
+
+def test_rezygnacja_po_wyczerpaniu_ponowien(serwer):
+    serwer.obsluga = kolejne((500, {}, b""))
+    p = pobieracz(ponowienia=2)
+    with pytest.raises(requests.HTTPError):
+        p.pobierz(serwer.adres + "/1")
+    assert len(serwer.zapytania) == 3
+    p.zamknij()
+
+def test_blad_klienta_nie_jest_ponawiany(serwer):
+    serwer.obsluga = kolejne((404, {}, b""))
+    p = pobieracz()
+    with pytest.raises(requests.HTTPError):
+        p.pobierz(serwer.adres + "/1")
+    assert len(serwer.zapytania) == 1
+    p.zamknij()
+
+def test_ponowienie_po_przekroczeniu_limitu_czasu(serwer):
+    proby = []
+
+    def obsluga(sciezka, naglowki):
+        proby.append(sciezka)
+        if len(proby) == 1:
+            time.sleep(0.5)
+        return 200, {}, b"strona"
+    serwer.obsluga = obsluga
+    p = pobieracz(limit_czasu=0.2)
+    assert p.pobierz(serwer.adres + "/1") == b"strona"
+    assert len(proby) == 2
+    p.zamknij()
+
+def test_limit_czasu_po_wyczerpaniu_ponowien(serwer):
+    def obsluga(sciezka, naglowki):
+        time.sleep(0.3)
+        return 200, {}, b"strona"
+    serwer.obsluga = obsluga
+    p = pobieracz(limit_czasu=0.1, ponowienia=1)
+    with pytest.raises(requests.Timeout):
+        p.pobierz(serwer.adres + "/1")
+    p.zamknij()
+
+def test_przeciazenie_zmniejsza_liczbe_polaczen(serwer):
+    serwer.obsluga = kolejne((503, {}, b""), (200, {}, b"strona"))
+    p = pobieracz(maks_polaczen=8)
+    p.pobierz(serwer.adres + "/1")
+    # Spadek do 4 po odpowiedzi 503 i wzrost o 1/4 po poprawnej odpowiedzi
+    assert p.regulator.limit == pytest.approx(4.25)
+    p.zamknij()
+
+def test_aimd_zmniejsza_o_polowe_raz_na_ture():
+    regulator = RegulatorWspolbieznosci(8)
+    numery = [regulator.zajmij() for _ in range(4)]
+    regulator.zwolnij(numery[0], przeciazenie=True)
+    assert regulator.limit == 4
+    # Kolejne odmowy z zapytań wysłanych przy poprzednim limicie nie zmniejszają go ponownie
+    regulator.zwolnij(numery[1], przeciazenie=True)
+    assert regulator.limit == 4
+    regulator.zwolnij(regulator.zajmij(), przeciazenie=True)
+    assert regulator.limit == 2
+    for numer in numery[2:]:
+        regulator.zwolnij(numer)
+    assert regulator.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)
+
+def test_aimd_granice():
+    regulator = RegulatorWspolbieznosci(2)
+    for _ in range(5):
+        regulator.zwolnij(regulator.zajmij())
+    assert regulator.limit == 2
+    for _ in range(5):
+        regulator.zwolnij(regulator.zajmij(), przeciazenie=True)
+    assert regulator.limit == 1
+
+def test_zajmij_czeka_na_wolne_miejsce():
+    regulator = RegulatorWspolbieznosci(1)
+    numer = regulator.zajmij()
+    zajete = threading.Event()
+    watek = threading.Thread(target=lambda: (regulator.zajmij(), zajete.set()))
+    watek.start()
+    assert not zajete.wait(0.1)
+    regulator.zwolnij(numer)
+    assert zajete.wait(1)
+    watek.join()
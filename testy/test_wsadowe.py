@@ -0,0 +1,24 @@
+import os
+
+import wsadowe
+from conftest import opinia
+
+def test_produkt_bez_opinii_jest_bledem(tmp_path, monkeypatch):
+    monkeypatch.setattr(wsadowe, "aktualizuj_opinie",
+                        lambda ean, *args, **kwargs: [opinia("1")] if ean == "jest" else [])
+    zadanie = wsadowe.ZadanieWsadowe(str(tmp_path), "jsonl", procesy=0)
+    wynik = zadanie.uruchom(["jest", "nie-istnieje"])
+    assert (wynik["produkty"], wynik["bledy"], wynik["opinie"]) == (1, 1, 1)
+    assert zadanie.punkt_kontrolny.gotowe == {"jest"}
+    assert sorted(os.listdir(tmp_path)) == ["jest.jsonl", "postep.txt"]
+
+def test_opinie_z_procesow_puli_trafiaja_do_metryk(tmp_path, monkeypatch):
+    from ceneo import WYODREBNIONE
+    sciezka = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarki", "nagrane", "sluchawki", "1.html")
+    with open(sciezka, "rb") as f:
+        html = f.read()
+    monkeypatch.setattr(wsadowe, "aktualizuj_opinie", lambda ean, *args, parsuj, **kwargs: parsuj(html))
+    przed = WYODREBNIONE.wartosc()
+    zadanie = wsadowe.ZadanieWsadowe(str(tmp_path), "jsonl", procesy=1)
+    assert zadanie.uruchom(["jest"])["opinie"] == 10
+    assert WYODREBNIONE.wartosc() - przed == 10
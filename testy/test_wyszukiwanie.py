@@ -0,0 +1,11 @@
+from conftest import opinia
+from wyszukiwanie import wyrazenie_fts
+
+def test_przedrostek_sprowadzany_do_rdzenia():
+    assert wyrazenie_fts("bateri*") == '"bater"*'
+    assert wyrazenie_fts("głośn*") == '"glosn"*'
+
+def test_wyszukiwanie_przedrostkiem(magazyn):
+    magazyn.zapisz_opinie("e1", [opinia("1", tresc="Bateria wystarcza na dwa dni"), opinia("2", tresc="Ekran jest za ciemny")])
+    for fraza in ("bateria", "bateri*", "bat*", "baterią"):
+        assert [t.opinia.id_opinii for t in magazyn.szukaj(fraza, pola=["tresc"])] == ["1"], fraza
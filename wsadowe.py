@@ -0,0 +1,186 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from ceneo import aktualizuj_opinie, opinie_ze_strony, ZAPIS, WYODREBNIONE
+from pobieranie import Pobieracz, MAKS_POLACZEN, ZAPYTAN_NA_SEKUNDE
+from archiwum import Archiwum
+
+def wczytaj_eany(nazwa_pliku):
+    """
+    Wczytuje kody EAN z pliku tekstowego (jeden kod w wierszu).
+
+    Puste wiersze i wiersze zaczynające się od "#" są pomijane, a powtórzone
+    kody są brane pod uwagę tylko raz.
+
+    Args:
+        nazwa_pliku: Nazwa pliku z kodami EAN.
+
+    Returns:
+        Lista kodów EAN w kolejności z pliku.
+    """
+    with open(nazwa_pliku, "r", encoding="utf-8") as f:
+        eany = (wiersz.strip() for wiersz in f)
+        return list(dict.fromkeys(ean for ean in eany if ean and not ean.startswith("#")))
+
+class PunktKontrolny:
+    """
+    Plik z kodami EAN przetworzonymi w całości, pozwalający wznowić
+    przerwane zadanie wsadowe bez ponownego pobierania tych produktów.
+    """
+
+    def __init__(self, nazwa_pliku):
+        self.nazwa_pliku = nazwa_pliku
+        self._blokada = threading.Lock()
+        try:
+            with open(nazwa_pliku, "r", encoding="utf-8") as f:
+                self.gotowe = {wiersz.strip() for wiersz in f if wiersz.strip()}
+        except FileNotFoundError:
+            self.gotowe = set()
+
+    def oznacz(self, ean):
+        """
+        Zapisuje kod EAN jako przetworzony.
+
+        Args:
+            ean: Kod EAN produktu.
+        """
+        with self._blokada:
+            with open(self.nazwa_pliku, "a", encoding="utf-8") as f:
+                f.write(f"{ean}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.gotowe.add(ean)
+
+class ZadanieWsadowe:
+    """
+    Pobiera opinie wielu produktów naraz.
+
+    Strony są pobierane przez wspólny pobieracz (wątki, jedna sesja HTTP),
+    a parsowanie odbywa się w puli procesów, więc nie blokuje go GIL.
+    """
+
+    def __init__(self, katalog_wyjsciowy, format="jsonl", produkty_naraz=4, procesy=None,
+                 maks_polaczen=MAKS_POLACZEN, zapytan_na_sekunde=ZAPYTAN_NA_SEKUNDE, przyrostowo=False, archiwum=None,
+                 bez_duplikatow=False):
+        self.katalog_wyjsciowy = katalog_wyjsciowy
+        self.format = format
+        self.produkty_naraz = produkty_naraz
+        self.procesy = os.cpu_count() if procesy is None else procesy
+        self.przyrostowo = przyrostowo
+        self.bez_duplikatow = bez_duplikatow
+        self.pobieracz = Pobieracz(maks_polaczen, zapytan_na_sekunde, archiwum=Archiwum(archiwum) if archiwum else None)
+        self.punkt_kontrolny = PunktKontrolny(os.path.join(katalog_wyjsciowy, "postep.txt"))
+        self._pula_procesow = None
+        self._blokada = threading.Lock()
+        self.strony = 0
+        self.opinie = 0
+
+    def uruchom(self, eany):
+        """
+        Przetwarza podane produkty, pomijając zapisane w punkcie kontrolnym.
+
+        Args:
+            eany: Lista kodów EAN.
+
+        Returns:
+            Słownik z podsumowaniem: liczbą produktów, stron, opinii, błędów
+            i przepustowością.
+        """
+        os.makedirs(self.katalog_wyjsciowy, exist_ok=True)
+        do_zrobienia = [ean for ean in eany if ean not in self.punkt_kontrolny.gotowe]
+        pominiete = len(eany) - len(do_zrobienia)
+        if pominiete:
+            print(f"Pominięto {pominiete} produktów przetworzonych wcześniej.")
+
+        bledy = 0
+        start = time.perf_counter()
+        if self.procesy:
+            # Procesy uruchamiane od nowa, a nie przez fork: pula startuje przy pierwszym zadaniu, gdy działają
+            # już wątki produktów i pobieracza, a potomek skopiowałby zajęte przez nie blokady (metryki,
+            # limit tempa) i zawiesił się na nich
+            self._pula_procesow = ProcessPoolExecutor(max_workers=self.procesy, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            with ThreadPoolExecutor(max_workers=self.produkty_naraz) as wykonawca:
+                przyszlosci = {wykonawca.submit(self._przetworz, ean): ean for ean in do_zrobienia}
+                for numer, przyszlosc in enumerate(as_completed(przyszlosci), start=1):
+                    ean = przyszlosci[przyszlosc]
+                    try:
+                        liczba_opinii, liczba_stron = przyszlosc.result()
+                    except Exception as blad:
+                        bledy += 1
+                        print(f"[{numer}/{len(do_zrobienia)}] {ean}: błąd - {blad}", file=sys.stderr)
+                    else:
+                        print(f"[{numer}/{len(do_zrobienia)}] {ean}: {liczba_opinii} opinii, {liczba_stron} stron")
+        finally:
+            if self._pula_procesow is not None:
+                self._pula_procesow.shutdown()
+                self._pula_procesow = None
+            self.pobieracz.zamknij()
+
+        czas = time.perf_counter() - start
+        produkty = len(do_zrobienia) - bledy
+        return {
+            "produkty": produkty,
+            "bledy": bledy,
+            "strony": self.strony,
+            "opinie": self.opinie,
+            "czas": czas,
+            "produktow_na_minute": produkty / czas * 60 if czas else 0.0,
+            "stron_na_sekunde": self.strony / czas if czas else 0.0,
+        }
+
+    def _przetworz(self, ean):
+        strony = 0
+
+        def parsuj(html):
+            nonlocal strony
+            strony += 1
+            if self._pula_procesow is None:
+                return opinie_ze_strony(html)
+            opinie_strony = self._pula_procesow.submit(opinie_ze_strony, html).result()
+            # Licznik zwiększony w procesie puli zostaje w jego rejestrze
+            WYODREBNIONE.zwieksz(len(opinie_strony))
+            return opinie_strony
+
+        opinie = aktualizuj_opinie(ean, self.pobieracz, tylko_nowe=self.przyrostowo, parsuj=parsuj)
+        if not opinie:
+            # Nieistniejący produkt wygląda tak samo jak produkt bez opinii; nie trafia do punktu
+            # kontrolnego ani do pliku, więc wznowione zadanie spróbuje go pobrać ponownie
+            raise ValueError("brak opinii (nieistniejący produkt albo nieudane pobieranie)")
+        if self.bez_duplikatow:
+            opinie = [opinia for opinia in opinie if opinia.duplikat is None]
+        ZAPIS[self.format](opinie, os.path.join(self.katalog_wyjsciowy, f"{ean}.{self.format}"))
+        self.punkt_kontrolny.oznacz(ean)
+        with self._blokada:
+            self.strony += strony
+            self.opinie += len(opinie)
+        return len(opinie), strony
+
+def main():
+    parser = argparse.ArgumentParser(description="Pobieranie opinii wielu produktów z pliku z kodami EAN.")
+    parser.add_argument("plik", help="plik z kodami EAN, jeden w wierszu")
+    parser.add_argument("-o", "--wyjscie", default="wyniki", help="katalog na pliki z opiniami i punkt kontrolny")
+    parser.add_argument("-f", "--format", choices=sorted(ZAPIS), default="jsonl")
+    parser.add_argument("--produkty", type=int, default=4, help="liczba produktów przetwarzanych naraz")
+    parser.add_argument("--procesy", type=int, default=None, help="liczba procesów parsujących (0 - parsowanie w wątkach)")
+    parser.add_argument("--polaczenia", type=int, default=MAKS_POLACZEN, help="limit równoczesnych połączeń HTTP")
+    parser.add_argument("--zapytan-na-sekunde", type=float, default=ZAPYTAN_NA_SEKUNDE, help="limit zapytań na sekundę do hosta")
+    parser.add_argument("--przyrostowo", action="store_true", help="pobieraj tylko opinie nowsze niż przy poprzednim pobraniu")
+    parser.add_argument("--archiwum", help="katalog archiwum, w którym zostaną zapisane pobrane strony")
+    parser.add_argument("--bez-duplikatow", action="store_true", help="nie zapisuj opinii oznaczonych jako kopie innych opinii")
+    argumenty = parser.parse_args()
+
+    zadanie = ZadanieWsadowe(argumenty.wyjscie, argumenty.format, argumenty.produkty, argumenty.procesy,
+                             argumenty.polaczenia, argumenty.zapytan_na_sekunde, argumenty.przyrostowo, argumenty.archiwum,
+                             argumenty.bez_duplikatow)
+    wynik = zadanie.uruchom(wczytaj_eany(argumenty.plik))
+
+    print(f"Produkty: {wynik['produkty']} (błędy: {wynik['bledy']}), strony: {wynik['strony']}, opinie: {wynik['opinie']}")
+    print(f"Czas: {wynik['czas']:.1f} s, {wynik['produktow_na_minute']:.1f} produktów/min, {wynik['stron_na_sekunde']:.1f} stron/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from magazyn import domyslny_magazyn
+
+# Rodzaje wykresów i formaty, w jakich można je pobrać
+RODZAJE = ("srednia_ocena", "dystrybucja_ocen")
+FORMATY = {
+    "svg": "image/svg+xml",
+    "png": "image/png",
+    "jpg": "image/jpeg",
+}
+# Liczba wyrenderowanych wykresów i zestawów danych trzymanych w pamięci
+ROZMIAR_PAMIECI = 64
+
+class UslugaWykresow:
+    """
+    Rysuje wykresy opinii produktu na żądanie i pamięta wyniki.
+
+    Dane wykresów są wyliczane z magazynu i pamiętane do ponownego pobrania
+    produktu, a gotowe wykresy są pamiętane pod skrótem tych danych, więc
+    niezmienione dane nie są rysowane drugi raz, a różni użytkownicy nie
+    nadpisują sobie nawzajem plików.
+    """
+
+    def __init__(self, magazyn, rozmiar_pamieci=ROZMIAR_PAMIECI):
+        self.magazyn = magazyn
+        self.rozmiar_pamieci = rozmiar_pamieci
+        self._dane = OrderedDict()
+        self._wykresy = OrderedDict()
+        self._blokada = threading.Lock()
+
+    def dane(self, ean):
+        """
+        Zwraca dane wykresów produktu wraz z ich skrótem.
+
+        Args:
+            ean: Kod EAN produktu.
+
+        Returns:
+            Krotka (słownik z polami srednia, liczba_ocen, histogram
+            i szereg_czasowy, skrót danych) albo None, gdy produkt nie ma ocen.
+        """
+        produkt = self.magazyn.produkt(ean)
+        if produkt is None:
+            return None
+        klucz = (ean, produkt["pobrano"])
+        with self._blokada:
+            if klucz in self._dane:
+                self._dane.move_to_end(klucz)
+                return self._dane[klucz]
+
+        # Import na miejscu, bo NumPy wczytuje się długo, a wykresy są potrzebne rzadko
+        from statystyki import TabelaOpinii, analiza
+
+        wynik = analiza(TabelaOpinii.z_wierszy(self.magazyn.wiersze_statystyk([ean])))
+        if wynik["liczba_ocen"]:
+            dane = {
+                "srednia": wynik["srednia"],
+                "liczba_ocen": wynik["liczba_ocen"],
+                "histogram": wynik["histogram"],
+                "szereg_czasowy": wynik["szereg_czasowy"],
+            }
+            skrot = hashlib.sha1(json.dumps(dane, sort_keys=True).encode()).hexdigest()
+            wpis = (dane, skrot)
+        else:
+            wpis = None
+        with self._blokada:
+            _wstaw(self._dane, klucz, wpis, self.rozmiar_pamieci)
+        return wpis
+
+    def wykres(self, ean, rodzaj, format="svg"):
+        """
+        Zwraca wykres produktu, rysując go tylko wtedy, gdy nie ma go w pamięci.
+
+        Args:
+            ean: Kod EAN produktu.
+            rodzaj: Jeden z RODZAJE.
+            format: Jeden z kluczy FORMATY.
+
+        Returns:
+            Krotka (treść obrazu w bajtach, skrót danych) albo None, gdy
+            produkt nie ma ocen.
+        """
+        if rodzaj not in RODZAJE or format not in FORMATY:
+            raise ValueError(f"Nieznany wykres: {rodzaj}.{format}")
+        wpis = self.dane(ean)
+        if wpis is None:
+            return None
+        dane, skrot = wpis
+        klucz = (rodzaj, format, skrot)
+        with self._blokada:
+            if klucz in self._wykresy:
+                self._wykresy.move_to_end(klucz)
+                return self._wykresy[klucz], skrot
+        obraz = narysuj(rodzaj, dane, format)
+        with self._blokada:
+            _wstaw(self._wykresy, klucz, obraz, self.rozmiar_pamieci)
+        return obraz, skrot
+
+def dane_kompaktowe(dane):
+    """
+    Zamienia dane wykresów na zwięzłą postać wysyłaną do przeglądarki.
+
+    Args:
+        dane: Słownik zwrócony przez UslugaWykresow.dane.
+
+    Returns:
+        Słownik z polami srednia, liczba_ocen, histogram (lista par
+        [ocena, liczba opinii]) i szereg (lista trójek [data, średnia
+        dzienna, średnia krocząca]), z wartościami zaokrąglonymi do setnych.
+    """
+    return {
+        "srednia": round(dane["srednia"], 2),
+        "liczba_ocen": dane["liczba_ocen"],
+        "histogram": [[float(ocena), liczba] for ocena, liczba in dane["histogram"].items()],
+        "szereg": [
+            [punkt["data"], round(punkt["srednia"], 2), round(punkt["srednia_kroczaca"], 2)]
+            for punkt in dane["szereg_czasowy"]
+        ],
+    }
+
+def narysuj(rodzaj, dane, format="svg"):
+    """
+    Rysuje wykres przez obiektowe API matplotlib (bez pyplot i jego stanu
+    globalnego), więc można go wywoływać z wielu wątków naraz.
+
+    Args:
+        rodzaj: "srednia_ocena" albo "dystrybucja_ocen".
+        dane: Słownik z polami srednia i histogram ({ocena: liczba opinii}).
+        format: Format obrazu, np. "svg", "png" albo "jpg".
+
+    Returns:
+        Treść obrazu w bajtach.
+    """
+    # Import na miejscu, bo matplotlib wczytuje się długo, a wykresy są potrzebne rzadko
+    from matplotlib.figure import Figure
+
+    figura = Figure(figsize=(8, 6))
+    osie = figura.subplots()
+    if rodzaj == "srednia_ocena":
+        srednia = dane["srednia"]
+        osie.pie([srednia, max(5 - srednia, 0)], labels=["Średnia ocena", ""], colors=["skyblue", "whitesmoke"], startangle=90)
+        osie.set_title(f"Średnia ocena: {srednia:.2f} / 5")
+        osie.axis("equal")
+    elif rodzaj == "dystrybucja_ocen":
+        oceny = [float(ocena) for ocena in dane["histogram"]]
+        osie.bar(oceny, list(dane["histogram"].values()), width=0.4, color="lightgreen")
+        osie.set_title("Dystrybucja ocen")
+        osie.set_xlabel("Ocena")
+        osie.set_ylabel("Ilość opinii")
+        osie.set_xticks(range(1, 6))
+        osie.grid(axis="y", linestyle="--", alpha=0.7)
+    else:
+        raise ValueError(f"Nieznany wykres: {rodzaj}")
+
+    bufor = io.BytesIO()
+    figura.savefig(bufor, format=format)
+    return bufor.getvalue()
+
+def _wstaw(pamiec, klucz, wartosc, rozmiar):
+    pamiec[klucz] = wartosc
+    pamiec.move_to_end(klucz)
+    while len(pamiec) > rozmiar:
+        pamiec.popitem(last=False)
+
+_domyslna_usluga = None
+_blokada_domyslnej = threading.Lock()
+
+def domyslna_usluga():
+    """
+    Zwraca współdzieloną usługę wykresów opartą na domyślnym magazynie.
+
+    Returns:
+        Obiekt UslugaWykresow.
+    """
+    global _domyslna_usluga
+    with _blokada_domyslnej:
+        if _domyslna_usluga is None:
+            _domyslna_usluga = UslugaWykresow(domyslny_magazyn())
+        return _domyslna_usluga
@@ -0,0 +1,112 @@
+import argparse
+import re
+from functools import lru_cache
+
+# Polskie litery zastępowane literami bez znaków diakrytycznych, żeby zapytania
+# wpisane bez polskich znaków ("glosny") znajdowały te same słowa co "głośny"
+_BEZ_DIAKRYTYKOW = str.maketrans("ąćęłńóśźż", "acelnoszz")
+
+# Końcówki fleksyjne (bez znaków diakrytycznych) usuwane przy sprowadzaniu
+# słowa do rdzenia, od najdłuższej
+_KONCOWKI = sorted({koncowka.translate(_BEZ_DIAKRYTYKOW) for koncowka in (
+    "owaniami", "owaniach", "owania", "owanie", "owaniu", "owaniem",
+    "iejszego", "iejszych", "iejszej", "iejsza", "iejsze", "iejszy", "ejszy", "ejsza", "ejsze",
+    "ściami", "ściach", "ścią", "ści", "ść",
+    "owego", "owych", "owymi", "owej", "owa", "owe", "owy", "ową",
+    "iego", "iemu", "ymi", "imi", "ych", "ich", "ego", "emu", "ami", "ach", "iach", "iami",
+    "ować", "ował", "owała", "owało", "owały", "uje", "ują", "ujemy", "ają",
+    "ej", "ym", "im", "om", "ów", "ie", "ii", "ia", "ią", "ię", "iu", "ać", "eć", "ić", "yć",
+    "ą", "ę", "a", "e", "i", "y", "o", "u",
+)}, key=len, reverse=True)
+
+# Najkrótszy rdzeń, jaki może zostać po usunięciu końcówki
+MIN_DLUGOSC_RDZENIA = 3
+
+_WZORZEC_SLOWA = re.compile(r"\w+")
+
+@lru_cache(maxsize=65536)
+def rdzen(slowo):
+    """
+    Sprowadza polskie słowo do przybliżonego rdzenia bez znaków
+    diakrytycznych, usuwając jedną końcówkę fleksyjną, np. "baterii",
+    "baterią" i "bateria" dają "bater".
+
+    Args:
+        slowo: Słowo zapisane małymi literami.
+
+    Returns:
+        Rdzeń słowa (samo słowo, gdy jest za krótkie albo jest liczbą).
+    """
+    slowo = slowo.translate(_BEZ_DIAKRYTYKOW)
+    if slowo.isdigit():
+        return slowo
+    for koncowka in _KONCOWKI:
+        if slowo.endswith(koncowka) and len(slowo) - len(koncowka) >= MIN_DLUGOSC_RDZENIA:
+            return slowo[:-len(koncowka)]
+    return slowo
+
+def rdzenie(tekst):
+    """
+    Zamienia tekst na ciąg rdzeni słów oddzielonych spacjami, w postaci
+    zapisywanej w indeksie pełnotekstowym.
+
+    Args:
+        tekst: Dowolny tekst albo None.
+
+    Returns:
+        Tekst złożony z rdzeni słów.
+    """
+    if not tekst:
+        return ""
+    return " ".join(rdzen(slowo) for slowo in _WZORZEC_SLOWA.findall(tekst.lower()))
+
+def wyrazenie_fts(fraza, pola=None):
+    """
+    Tworzy wyrażenie MATCH dla SQLite FTS5 z frazy wpisanej przez użytkownika.
+
+    Każde słowo frazy musi wystąpić w opinii (w dowolnej odmianie), a słowo
+    zakończone gwiazdką jest traktowane jako przedrostek.
+
+    Args:
+        fraza: Szukane słowa, np. "głośny wentylator".
+        pola: Opcjonalna lista pól ("tresc", "wady", "zalety"), do których
+            zawęzić wyszukiwanie.
+
+    Returns:
+        Wyrażenie MATCH albo None, gdy fraza nie zawiera żadnego słowa.
+    """
+    wyrazy = []
+    for slowo, gwiazdka in re.findall(r"(\w+)(\*?)", fraza.lower()):
+        # Indeks zawiera rdzenie, więc także przedrostek jest skracany do rdzenia ("bateri*" -> "bater*");
+        # rdzeń jest zawsze początkiem słowa, więc przedrostek pasuje co najwyżej do większej liczby słów
+        wyrazy.append(f'"{rdzen(slowo)}"{gwiazdka}')
+    if not wyrazy:
+        return None
+    wyrazenie = " ".join(wyrazy)
+    if pola:
+        wyrazenie = f"{{{' '.join(pola)}}} : ({wyrazenie})"
+    return wyrazenie
+
+def main():
+    from magazyn import domyslny_magazyn
+
+    parser = argparse.ArgumentParser(description="Wyszukiwanie pełnotekstowe w zapisanych opiniach.")
+    parser.add_argument("fraza", help="szukane słowa, np. \"bateria głośny\"")
+    parser.add_argument("--ean", help="szukaj tylko w opiniach jednego produktu")
+    parser.add_argument("--pole", action="append", choices=("tresc", "wady", "zalety"), help="szukaj tylko w podanym polu (można powtórzyć)")
+    parser.add_argument("-n", "--limit", type=int, default=20, help="maksymalna liczba wyników")
+    argumenty = parser.parse_args()
+
+    trafienia = domyslny_magazyn().szukaj(argumenty.fraza, argumenty.ean, argumenty.pole, argumenty.limit)
+    for trafienie in trafienia:
+        opinia = trafienie.opinia
+        print(f"{trafienie.ean}  {opinia.id_opinii}  {opinia.gwiazdki}  {opinia.autor}")
+        print(f"    {opinia.tresc[:200]}")
+        if opinia.wady:
+            print(f"    Wady: {', '.join(opinia.wady)}")
+        if opinia.zalety:
+            print(f"    Zalety: {', '.join(opinia.zalety)}")
+    print(f"Znaleziono: {len(trafienia)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from ceneo import ekstrakcja_opinii_po_ean
+
+# Liczba zadań wykonywanych naraz i liczba zadań pamiętanych po zakończeniu
+MAKS_ROWNOCZESNYCH_ZADAN = 2
+MAKS_PAMIETANYCH_ZADAN = 100
+
+class Zadanie:
+    """
+    Zadanie pobrania opinii produktu wykonywane w tle.
+    """
+
+    OCZEKUJE = "oczekuje"
+    W_TOKU = "w_toku"
+    GOTOWE = "gotowe"
+    BRAK_OPINII = "brak_opinii"
+    BLAD = "blad"
+
+    def __init__(self, ean):
+        self.id = uuid.uuid4().hex
+        self.ean = ean
+        self.status = Zadanie.OCZEKUJE
+        self.strony = 0
+        self.opinie = 0
+        self.blad = None
+        self.utworzono = time.time()
+        self.zakonczono = None
+
+    @property
+    def zakonczone(self):
+        return self.status in (Zadanie.GOTOWE, Zadanie.BRAK_OPINII, Zadanie.BLAD)
+
+    def do_slownika(self):
+        """
+        Zwraca stan zadania jako słownik do odpowiedzi JSON.
+        """
+        return {
+            "id": self.id,
+            "ean": self.ean,
+            "status": self.status,
+            "strony": self.strony,
+            "opinie": self.opinie,
+            "blad": self.blad,
+            "zakonczone": self.zakonczone,
+        }
+
+class KolejkaZadan:
+    """
+    Kolejka zadań pobierania opinii wykonywanych w puli wątków, dzięki czemu
+    żądanie HTTP zlecające pobranie kończy się od razu.
+    """
+
+    def __init__(self, maks_rownoczesnych=MAKS_ROWNOCZESNYCH_ZADAN, maks_pamietanych=MAKS_PAMIETANYCH_ZADAN):
+        self.maks_pamietanych = maks_pamietanych
+        self._wykonawca = ThreadPoolExecutor(max_workers=maks_rownoczesnych, thread_name_prefix="zadanie")
+        self._zadania = OrderedDict()
+        self._blokada = threading.Lock()
+
+    def zglos(self, ean):
+        """
+        Dodaje do kolejki zadanie pobrania opinii produktu.
+
+        Wykresy nie są zapisywane przy pobieraniu; aplikacja rysuje je na
+        żądanie pod adresem /wykresy/<ean>/<rodzaj>.<format>.
+
+        Args:
+            ean: Kod EAN produktu.
+
+        Returns:
+            Obiekt Zadanie.
+        """
+        zadanie = Zadanie(ean)
+        with self._blokada:
+            self._zadania[zadanie.id] = zadanie
+            self._usun_stare()
+        self._wykonawca.submit(self._wykonaj, zadanie)
+        return zadanie
+
+    def pobierz(self, id_zadania):
+        """
+        Zwraca zadanie o podanym identyfikatorze.
+
+        Args:
+            id_zadania: Identyfikator zadania.
+
+        Returns:
+            Obiekt Zadanie albo None, gdy zadania nie ma w kolejce.
+        """
+        with self._blokada:
+            return self._zadania.get(id_zadania)
+
+    def _wykonaj(self, zadanie):
+        zadanie.status = Zadanie.W_TOKU
+
+        def postep(strony, opinie):
+            zadanie.strony = strony
+            zadanie.opinie = opinie
+
+        try:
+            opinie = ekstrakcja_opinii_po_ean(zadanie.ean, postep=postep)
+        except Exception as blad:
+            zadanie.blad = str(blad)
+            zadanie.status = Zadanie.BLAD
+        else:
+            zadanie.opinie = len(opinie) if opinie else 0
+            zadanie.status = Zadanie.GOTOWE if opinie else Zadanie.BRAK_OPINII
+        zadanie.zakonczono = time.time()
+
+    def _usun_stare(self):
+        # Zapominane są najstarsze zakończone zadania
+        nadmiar = len(self._zadania) - self.maks_pamietanych
+        for id_zadania in [id_zadania for id_zadania, zadanie in self._zadania.items() if zadanie.zakonczone][:max(nadmiar, 0)]:
+            del self._zadania[id_zadania]
+
+kolejka = KolejkaZadan()